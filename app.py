@@ -5,19 +5,34 @@ Amazon競合分析ツール for フィットネス機器
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from dotenv import load_dotenv
 import os
+import time
+import uuid
 
 # カスタムモジュール
-from modules.keepa_analyzer_simple import KeepaAnalyzerSimple
+from modules.keepa_analyzer_simple import SEARCH_SORT_ORDERS
+from modules.keepa_token_scheduler import get_token_scheduler, KeepaTokenBudgetError
 from modules.review_collector import ReviewCollector
-from modules.claude_analyzer import ClaudeAnalyzer
-from modules.progress_tracker import ProgressTracker
+from modules.review_prefetcher import get_review_prefetcher
+from modules.deadline import DeadlineExceeded
+from modules.job_runner import get_job_runner, STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED
+from modules.jobs import search_job, review_job, analysis_job, watchlist_job, REVIEW_TIMEOUT_SEC
+from modules.progress_tracker import ProgressTracker, get_stage_metrics_store
+from modules.history_charts import CHART_SERIES, ZOOM_LEVELS, get_product_chart_levels
+from modules.timeseries_store import from_keepa_minutes
+from modules.watchlist import get_watchlist
+from modules.alerts import get_alert_engine
 from data.sample_data import get_sample_data
 
 # 環境変数読み込み
 load_dotenv()
 
+# 実行中ジョブの状態パネルを再描画する間隔（秒）
+JOB_POLL_INTERVAL = 1.0
+
 # ページ設定
 st.set_page_config(
     page_title="Amazon競合分析ツール",
@@ -43,6 +58,56 @@ def get_api_key(key_name):
     # 環境変数から取得
     return os.getenv(key_name, '')
 
+def measured_duration(kind, fallback):
+    """
+    過去の実測（中央値〜p95）から所要時間の目安を返す
+
+    Args:
+        kind (str): 計測の種類（'search', 'reviews', 'analysis'）
+        fallback (str): 実測が無い場合の表示
+
+    Returns:
+        str: 表示用の所要時間
+    """
+    total = get_stage_metrics_store().summary(kind, top_level=True).get('total')
+    if not total or total['count'] < 3:
+        return fallback
+    return f"{int(total['p50'])}-{int(total['p95']) + 1}秒（直近{total['count']}回の実測）"
+
+
+def history_figure(charts, level):
+    """
+    間引き済みの履歴から価格・ランキング・月間販売数・レビュー数のグラフを作成
+
+    Args:
+        charts (dict): get_product_chart_levels() の戻り値
+        level (str): 表示期間（ZOOM_LEVELS のキー）
+
+    Returns:
+        plotly Figure
+    """
+    series_names = [name for name in CHART_SERIES if name in charts]
+    rows = (len(series_names) + 1) // 2
+    fig = make_subplots(rows=rows, cols=2, subplot_titles=[CHART_SERIES[name]['label'] for name in series_names],
+                        vertical_spacing=0.15)
+    for i, name in enumerate(series_names):
+        points = charts[name][level]
+        fig.add_trace(
+            go.Scatter(
+                x=from_keepa_minutes(points['t']),
+                y=points['v'],
+                mode='lines',
+                line_shape='hv' if CHART_SERIES[name]['step'] else 'linear',
+                name=CHART_SERIES[name]['label'],
+                connectgaps=False
+            ),
+            row=i // 2 + 1, col=i % 2 + 1
+        )
+        if name == 'SALES':
+            fig.update_yaxes(autorange='reversed', row=i // 2 + 1, col=i % 2 + 1)  # 1位を上に表示
+    fig.update_layout(height=260 * rows, showlegend=False, margin=dict(t=30, l=10, r=10, b=10))
+    return fig
+
 # セッション状態初期化
 if 'search_results' not in st.session_state:
     st.session_state.search_results = None
@@ -59,6 +124,16 @@ if 'show_sample_mode' not in st.session_state:
 if 'sample_data_loaded' not in st.session_state:
     st.session_state.sample_data_loaded = False
 
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # ジョブの所有者識別用
+if 'search_job_id' not in st.session_state:
+    st.session_state.search_job_id = None
+    st.session_state.search_job_handled = True
+if 'review_jobs' not in st.session_state:
+    st.session_state.review_jobs = {}  # ASIN → レビュー収集ジョブID
+if 'analysis_job_id' not in st.session_state:
+    st.session_state.analysis_job_id = None
+
 # サイドバー：API設定
 with st.sidebar:
     st.title("⚙️ 設定")
@@ -95,6 +170,83 @@ with st.sidebar:
     st.metric("取得済みレビュー", f"{total_reviews:,}件")
     st.metric("分析済み商品", f"{len(st.session_state.collected_reviews)}個")
 
+    # Keepaトークン残高（全セッション・バッチ共通の推定値）
+    if keepa_key:
+        token_state = get_token_scheduler(keepa_key).snapshot()
+        if token_state['tokens_left'] is not None:
+            st.metric(
+                "Keepaトークン残高（推定）",
+                f"{int(token_state['tokens_left']):,}",
+                help=f"回復: {token_state['refill_rate']:.0f}トークン/分"
+            )
+
+    # 処理時間の内訳（ステージ計測の実績）
+    search_timing = get_stage_metrics_store().summary('search')
+    if search_timing:
+        with st.expander("⏱️ 検索の処理時間内訳"):
+            st.dataframe(
+                pd.DataFrame([
+                    {'ステージ': name, '回数': t['count'], '中央値(秒)': round(t['p50'], 2), 'p95(秒)': round(t['p95'], 2)}
+                    for name, t in sorted(search_timing.items(), key=lambda item: -item[1]['p50'])
+                ]),
+                hide_index=True,
+                use_container_width=True
+            )
+
+    # プロファイル記録（遅い検索の原因調査用。結果は「profiles」ページで確認）
+    st.toggle(
+        "🔬 プロファイルを記録",
+        key="profile_requests",
+        help="検索・レビュー収集・AI分析の各ステージをcProfileとスタックのサンプリングで計測して保存します（処理が少し遅くなります）"
+    )
+
+    # レビュー先読みの効果（Kの調整用）
+    if st.session_state.get('prefetch_reviews'):
+        prefetch_stats = get_review_prefetcher().stats()
+        if prefetch_stats['hit_rate'] is not None:
+            st.metric(
+                "レビュー先読みヒット率",
+                f"{prefetch_stats['hit_rate']:.0%}",
+                help=(
+                    f"先読み: {prefetch_stats['prefetched']}件 / 使用: {prefetch_stats['hits']}件 / "
+                    f"未使用で期限切れ: {prefetch_stats['wasted']}件（{prefetch_stats['wasted_credits']}クレジット）"
+                )
+            )
+
+    # ウォッチリスト（変化の大きい商品ほど短い間隔で再取得。常駐は python watchlist.py run）
+    watch_summary = get_watchlist().summary()
+    if watch_summary['asins']:
+        st.divider()
+        st.markdown("### 👁️ ウォッチリスト")
+        st.metric(
+            "追跡中の商品",
+            f"{watch_summary['asins']:,}件",
+            help=f"取得待ち: {watch_summary['due']}件 / キーワード: {watch_summary['keywords']}件"
+        )
+        if keepa_key and st.button("🔄 取得待ちを今すぐ更新", disabled=watch_summary['due'] == 0,
+                                   use_container_width=True):
+            get_job_runner().submit(
+                'watchlist',
+                watchlist_job,
+                keepa_key,
+                rainforest_key or None,
+                owner=st.session_state.session_id,
+                label=f"{watch_summary['due']}件"
+            )
+            st.toast("ウォッチリストの更新を開始しました")
+
+        # しきい値アラート（ルールは python watchlist.py rule-add で追加）
+        alert_engine = get_alert_engine()
+        unread_alerts = alert_engine.outbox(unread_only=True, limit=20)
+        if unread_alerts:
+            with st.expander(f"🔔 アラート {alert_engine.unread_count()}件", expanded=True):
+                for alert in unread_alerts:
+                    created = time.strftime('%m/%d %H:%M', time.localtime(alert['created_at']))
+                    st.caption(f"{created}  {alert['message']}")
+                if st.button("確認済みにする", key="ack_alerts", use_container_width=True):
+                    alert_engine.acknowledge([alert['id'] for alert in unread_alerts])
+                    st.rerun()
+
 # メインエリア
 st.title("🎯 Amazon商品参入判定ツール")
 st.caption("Keepa・RainforestAPI・Claude AIで競合の弱点を発見し、改良版商品を提案")
@@ -132,12 +284,16 @@ if not st.session_state.onboarding_completed and st.session_state.show_onboardin
 
             ### ⏱️ 所要時間
 
-            - 検索: 30-60秒
-            - レビュー収集: 15-30秒/商品
-            - AI分析: 20-40秒
+            - 検索: {search_time}
+            - レビュー収集: {review_time}/商品
+            - AI分析: {analysis_time}
 
             **合計**: 1商品あたり約2-3分で完了！
-            """)
+            """.format(
+                search_time=measured_duration('search', "30-60秒"),
+                review_time=measured_duration('reviews', "15-30秒"),
+                analysis_time=measured_duration('analysis', "20-40秒")
+            ))
 
         with tabs[1]:
             st.markdown("""
@@ -344,6 +500,74 @@ with st.expander("🔧 詳細検索（オプション）"):
         help="競合が少ない商品を探す"
     )
 
+    # 検索の深さ（RainforestAPI）
+    st.markdown("##### 🔎 検索の深さ")
+    search_pages = st.slider(
+        "検索ページ数",
+        min_value=1,
+        max_value=5,
+        value=1,
+        key="search_pages",
+        help="並び順ごとに取得するページ数。ページごとにRainforestAPIのクレジットを消費します"
+    )
+    search_sort_orders = st.multiselect(
+        "並び順",
+        options=list(SEARCH_SORT_ORDERS.keys()),
+        format_func=lambda key: SEARCH_SORT_ORDERS[key],
+        key="search_sort_orders",
+        help="複数選択すると並び順ごとに検索し、重複を除いて統合します（未選択はAmazonの既定順）"
+    )
+
+    # 検索の持ち時間
+    search_timeout = st.slider(
+        "検索の持ち時間（秒）",
+        min_value=30,
+        max_value=600,
+        value=120,
+        step=30,
+        key="search_timeout",
+        help="この時間を超えた場合は、それまでに取得できた商品のみを表示します"
+    )
+
+    # レビュー先読み（RainforestAPI）
+    st.markdown("##### ⚡ レビュー先読み")
+    prefetch_reviews = st.checkbox(
+        "スコアの高い商品のレビューを検索中に先読みする",
+        key="prefetch_reviews",
+        help="閾値以上の商品はレビュー収集をバックグラウンドで開始します（下の件数・クレジット上限の範囲内）"
+    )
+    prefetch_threshold = st.slider(
+        "先読みするスコアの閾値",
+        min_value=0,
+        max_value=100,
+        value=60,
+        step=5,
+        key="prefetch_threshold",
+        disabled=not prefetch_reviews
+    )
+    prefetch_col1, prefetch_col2 = st.columns(2)
+    with prefetch_col1:
+        prefetch_top_k = st.slider(
+            "1回の検索で先読みする最大件数",
+            min_value=0,
+            max_value=5,
+            value=3,
+            key="prefetch_top_k",
+            disabled=not prefetch_reviews,
+            help="検索中（閾値以上）と検索完了後（TOP候補）の先読みを合わせた件数です（0で無効）"
+        )
+    with prefetch_col2:
+        prefetch_credit_budget = st.number_input(
+            "1回の検索で先読みに使うクレジット上限",
+            min_value=0,
+            max_value=100,
+            value=15,
+            step=5,
+            key="prefetch_credit_budget",
+            disabled=not prefetch_reviews,
+            help="1商品あたり最大5クレジット（50件取得時）"
+        )
+
 # フィルタ条件を辞書に格納
 filters = {
     'price': price_range,
@@ -358,135 +582,169 @@ filters = {
     'seller_max': seller_max,
 }
 
-# 検索実行
+# 検索実行（バックグラウンドジョブとして登録し、結果は下のジョブ表示で受け取る）
 if search_button and search_term:
     if not keepa_key:
         st.error("❌ Keepa APIキーを入力してください")
     else:
-        # プログレストラッカー初期化
-        tracker = ProgressTracker()
-        progress_container = st.container()
-
-        with progress_container:
-            tracker.start(total_steps=4)
-
-            try:
-                # STEP 1: RainforestAPIでASIN検索
-                tracker.update("RainforestAPIでキーワード検索中...")
-                analyzer = KeepaAnalyzerSimple(keepa_key, rainforest_api_key=rainforest_key)
-
-                # STEP 2: Keepa APIで商品データ取得
-                tracker.update("Keepa APIで商品データ取得中...")
-                results = analyzer.search_products(search_term)
-
-                # STEP 3: スコア計算
-                tracker.update("商品スコアを計算中...")
-
-                # フィルタリング処理（ベクトル化で高速化）
-                # 価格フィルタ
-                price_mask = (results['price'] >= filters['price'][0]) & (results['price'] <= filters['price'][1])
-
-                # 月間販売数フィルタ
-                monthly_mask = (results['monthly_sold_current'] >= filters['monthly_current'][0]) & \
-                              (results['monthly_sold_current'] <= filters['monthly_current'][1])
+        job_runner = get_job_runner()
+
+        # 同じセッションで実行中の検索は新しい検索で置き換える
+        if st.session_state.search_job_id:
+            job_runner.cancel(st.session_state.search_job_id)
+
+        st.session_state.search_job_id = job_runner.submit(
+            'search',
+            search_job,
+            search_term,
+            keepa_key,
+            rainforest_key,
+            filters,
+            owner=st.session_state.session_id,
+            label=search_term,
+            search_pages=search_pages,
+            search_sort_orders=search_sort_orders,
+            search_timeout=search_timeout,
+            prefetch_threshold=prefetch_threshold if prefetch_reviews else None,
+            prefetch_top_k=prefetch_top_k if prefetch_reviews else 0,
+            prefetch_credit_budget=prefetch_credit_budget,
+            profile=st.session_state.get('profile_requests', False)
+        )
+        st.session_state.search_job_handled = False
 
-                # 成長トレンドフィルタ
-                growth_mask = pd.Series([True] * len(results), index=results.index)
 
-                if filters['growth_3m']:
-                    growth_mask &= (results['monthly_sold_3m_ago'] > 0) & \
-                                  (results['monthly_sold_current'] > results['monthly_sold_3m_ago'])
+def show_search_error(tracker, e):
+    """検索ジョブの失敗内容に応じたメッセージを表示"""
+    if isinstance(e, KeepaTokenBudgetError):
+        tracker.error("Keepa APIのトークンが不足しています")
+        st.error("❌ **Keepa APIのトークンが不足しています**")
+        st.warning(f"""
+        **トークン残高が回復するまで約{max(1, int(e.wait_seconds // 60))}分かかる見込みです。**
 
-                if filters['growth_6m']:
-                    growth_mask &= (results['monthly_sold_6m_ago'] > 0) & \
-                                  (results['monthly_sold_current'] > results['monthly_sold_6m_ago'])
+        - 他のセッションやバッチ処理とトークンを共有しています
+        - 時間をおいて再度検索するか、Keepa APIの有料プランへのアップグレードをご検討ください
+        """)
+    else:
+        tracker.error(f"エラーが発生しました: {str(e)}")
+        error_msg = str(e)
+
+        # Keepa APIのタイムアウトエラー
+        if "Read timed out" in error_msg or "timeout" in error_msg.lower():
+            st.error("❌ **Keepa APIへの接続がタイムアウトしました**")
+            st.info("""
+            **考えられる原因：**
+            - Keepa APIのサーバーが混雑している
+            - ネットワーク接続が不安定
+
+            **対処方法：**
+            - 数分待ってから再度検索してください
+            - それでも解決しない場合は、Keepa APIの状態を確認してください
+            """)
 
-                if filters['growth_12m']:
-                    growth_mask &= (results['monthly_sold_12m_ago'] > 0) & \
-                                  (results['monthly_sold_current'] > results['monthly_sold_12m_ago'])
+        # Keepa APIのトークン制限エラー
+        elif "token" in error_msg.lower() or "waiting" in error_msg.lower():
+            st.error("❌ **Keepa APIのトークン制限に達しました**")
+            st.warning("""
+            **Keepa API無料プランの制限：**
+            - 1トークン/分の制限があります
+            - 連続して検索すると、次のトークンが回復するまで待機が必要です
+
+            **対処方法：**
+            - 約30分後に再度検索してください
+            - または、Keepa APIの有料プランへのアップグレードをご検討ください
+            """)
 
-                if filters['growth_24m']:
-                    growth_mask &= (results['monthly_sold_24m_ago'] > 0) & \
-                                  (results['monthly_sold_current'] > results['monthly_sold_24m_ago'])
+        # その他のエラー
+        else:
+            st.error(f"❌ エラーが発生しました: {error_msg}")
+            st.info("""
+            **トラブルシューティング：**
+            - APIキーが正しく設定されているか確認してください
+            - インターネット接続を確認してください
+            - 数分待ってから再試行してください
+            """)
 
-                # BSRフィルタ
-                bsr_mask = ((results['current_rank'] >= filters['bsr'][0]) & \
-                           (results['current_rank'] <= filters['bsr'][1])) | \
-                          (results['current_rank'] == 0)
 
-                # 評価フィルタ
-                rating_mask = (results['rating'] >= filters['rating'][0]) & \
-                             (results['rating'] <= filters['rating'][1])
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def search_job_panel(job_id):
+    """実行中の検索ジョブの進捗・途中結果（この部分だけ一定間隔で再描画し、終了したらページ全体を再実行）"""
+    job_runner = get_job_runner()
+    job = job_runner.get(job_id)
+    if job is None or not job['active']:
+        st.rerun()
+
+    tracker = ProgressTracker()
+    tracker.start(total_steps=4)
+    tracker.show(job['progress'], f"「{job['label']}」{job['message'] or '検索待機中...'}（{int(job['elapsed'])}秒経過）")
+
+    col_partial, col_cancel = st.columns([4, 1])
+    with col_cancel:
+        if st.button("⏹️ 中断", key="cancel_search", use_container_width=True):
+            job_runner.cancel(job['id'])
+
+    # スコアリング済みの途中結果を表示
+    partial_df = job_runner.partial(job['id'])
+    if partial_df is not None and len(partial_df) > 0:
+        with col_partial:
+            st.caption(f"⏳ 取得中... {len(partial_df)}件をスコアリング済み（暫定順位）")
+            st.dataframe(
+                partial_df[['title', 'product_score', 'price', 'monthly_sold_current']].head(10),
+                use_container_width=True
+            )
 
-                # レビュー数フィルタ
-                review_mask = results['review_count'] >= filters['review_min']
 
-                # 出品者数フィルタ
-                seller_mask = results['seller_count'] <= filters['seller_max']
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress_panel(job_id, waiting_message):
+    """実行中のレビュー収集・分析ジョブの進捗（この部分だけ一定間隔で再描画し、終了したらページ全体を再実行）"""
+    job = get_job_runner().get(job_id)
+    if job is None or not job['active']:
+        st.rerun()
 
-                # 全フィルタを結合
-                final_mask = price_mask & monthly_mask & growth_mask & bsr_mask & rating_mask & review_mask & seller_mask
+    tracker = ProgressTracker()
+    tracker.start(total_steps=1)
+    tracker.show(job['progress'], f"{job['message'] or waiting_message}（{int(job['elapsed'])}秒経過）")
 
-                # フィルタリング実行
-                filtered_results = results[final_mask].copy()
 
-                # STEP 4: 結果を整形
-                tracker.update("検索結果を整形中...")
+# 検索ジョブの状態表示
+if st.session_state.search_job_id and not st.session_state.search_job_handled:
+    job_runner = get_job_runner()
+    job = job_runner.get(st.session_state.search_job_id)
 
-                if len(filtered_results) > 0:
-                    # スコア順にソート
-                    filtered_results = filtered_results.sort_values('product_score', ascending=False).reset_index(drop=True)
-                    st.session_state.search_results = filtered_results
+    if job is None:
+        st.session_state.search_job_id = None
+    elif job['active']:
+        search_job_panel(job['id'])
+    else:
+        st.session_state.search_job_handled = True
+        tracker = ProgressTracker()
+        tracker.start(total_steps=4)
 
-                    # 完了
-                    tracker.complete(f"✅ 完了！{len(filtered_results)}件の商品を発見しました")
-                    st.success(f"✅ {len(filtered_results)}件の参入候補商品を発見しました！（商品選定スコア順に表示）")
-                    if len(results) > len(filtered_results):
-                        st.info(f"💡 詳細検索フィルタにより、{len(results) - len(filtered_results)}件の商品が除外されました")
-                else:
-                    tracker.complete("⚠️ 条件に合う商品が見つかりませんでした")
-                    st.warning("⚠️ 条件に合う商品が見つかりませんでした。キーワードやフィルタ条件を変えてみてください。")
-                    if len(results) > 0:
-                        st.info(f"💡 {len(results)}件の商品が見つかりましたが、詳細検索フィルタの条件を満たしませんでした")
-            except Exception as e:
-                tracker.error(f"エラーが発生しました: {str(e)}")
-                error_msg = str(e)
-
-                # Keepa APIのタイムアウトエラー
-                if "Read timed out" in error_msg or "timeout" in error_msg.lower():
-                    st.error("❌ **Keepa APIへの接続がタイムアウトしました**")
-                    st.info("""
-                    **考えられる原因：**
-                    - Keepa APIのサーバーが混雑している
-                    - ネットワーク接続が不安定
-
-                    **対処方法：**
-                    - 数分待ってから再度検索してください
-                    - それでも解決しない場合は、Keepa APIの状態を確認してください
-                    """)
-
-                # Keepa APIのトークン制限エラー
-                elif "token" in error_msg.lower() or "waiting" in error_msg.lower():
-                    st.error("❌ **Keepa APIのトークン制限に達しました**")
-                    st.warning("""
-                    **Keepa API無料プランの制限：**
-                    - 1トークン/分の制限があります
-                    - 連続して検索すると、次のトークンが回復するまで待機が必要です
-
-                    **対処方法：**
-                    - 約30分後に再度検索してください
-                    - または、Keepa APIの有料プランへのアップグレードをご検討ください
-                    """)
-
-                # その他のエラー
-                else:
-                    st.error(f"❌ エラーが発生しました: {error_msg}")
-                    st.info("""
-                    **トラブルシューティング：**
-                    - APIキーが正しく設定されているか確認してください
-                    - インターネット接続を確認してください
-                    - 数分待ってから再試行してください
-                    """)
+        if job['status'] == STATUS_CANCELLED:
+            tracker.error("検索が中断されました")
+        elif job['status'] == STATUS_FAILED:
+            show_search_error(tracker, job_runner.result(job['id']) or Exception(job['error']))
+        else:
+            search_output = job_runner.result(job['id'])
+            results = search_output['results']
+            filtered_results = search_output['filtered']
+
+            # 持ち時間切れの場合は途中結果を表示
+            if search_output['partial_reason']:
+                st.warning(f"⏱️ {search_output['partial_reason']}（詳細検索の「検索の持ち時間」で延長できます）")
+
+            if len(filtered_results) > 0:
+                st.session_state.search_results = filtered_results
+
+                # 完了
+                tracker.complete(f"✅ 完了！{len(filtered_results)}件の商品を発見しました（{int(job['elapsed'])}秒）")
+                st.success(f"✅ {len(filtered_results)}件の参入候補商品を発見しました！（商品選定スコア順に表示）")
+                if len(results) > len(filtered_results):
+                    st.info(f"💡 詳細検索フィルタにより、{len(results) - len(filtered_results)}件の商品が除外されました")
+            else:
+                tracker.complete("⚠️ 条件に合う商品が見つかりませんでした")
+                st.warning("⚠️ 条件に合う商品が見つかりませんでした。キーワードやフィルタ条件を変えてみてください。")
+                if len(results) > 0:
+                    st.info(f"💡 {len(results)}件の商品が見つかりましたが、詳細検索フィルタの条件を満たしませんでした")
 
 # 結果表示
 if st.session_state.search_results is not None and len(st.session_state.search_results) > 0:
@@ -598,6 +856,9 @@ if st.session_state.search_results is not None and len(st.session_state.search_r
     # 各商品の詳細を展開可能に
     st.markdown("### 📋 商品詳細（総合評価の内訳）")
 
+    watchlist = get_watchlist()
+    watched_asins = {watch['asin'] for watch in watchlist.list_asins()}
+
     for idx, (_, row) in enumerate(top5_results.iterrows(), 1):
         title = row['title'] if row['title'] else "商品名取得中..."
         score = row.get('product_score', 0)
@@ -617,6 +878,21 @@ if st.session_state.search_results is not None and len(st.session_state.search_r
             amazon_url = f"https://www.amazon.co.jp/dp/{row['asin']}"
             st.markdown(f"🔗 [Amazonで商品を見る]({amazon_url}) | ASIN: `{row['asin']}` | {recommendation}")
 
+            # ウォッチリスト（定期的に再取得してスコアの推移を記録）
+            if row['asin'] in watched_asins:
+                score_history = watchlist.score_history(row['asin'], limit=52)
+                if len(score_history) >= 2:
+                    st.caption(f"👁️ 追跡中: スコア {score_history[0]['product_score']:.0f} → "
+                               f"{score_history[-1]['product_score']:.0f}点（{len(score_history)}回取得）")
+                else:
+                    st.caption("👁️ 追跡中（定期的に再取得してスコアの推移を記録します）")
+                if st.button("ウォッチリストから外す", key=f"unwatch_{row['asin']}"):
+                    watchlist.remove_asins([row['asin']])
+                    st.rerun()
+            elif st.button("👁️ ウォッチリストに追加", key=f"watch_{row['asin']}"):
+                watchlist.add_asins([row['asin']], label=title)
+                st.rerun()
+
             st.divider()
 
             # 総合評価の内訳（v2.0 新スコアリング）
@@ -692,6 +968,15 @@ if st.session_state.search_results is not None and len(st.session_state.search_r
                     st.caption(f"現在: {current_sold:,}個")
                     st.caption(f"6ヶ月前: {row.get('monthly_sold_6m_ago', 0):,}個")
 
+            # 価格・ランキング等の推移（保存済みのKeepa履歴を間引いて表示）
+            charts = get_product_chart_levels(row['asin'])
+            if charts:
+                st.markdown("##### 📈 価格・ランキングの推移")
+                level = st.radio("表示期間", list(ZOOM_LEVELS), index=1, horizontal=True,
+                                 key=f"history_level_{row['asin']}", label_visibility="collapsed")
+                st.plotly_chart(history_figure(charts, level), use_container_width=True,
+                                key=f"history_chart_{row['asin']}")
+
             st.divider()
 
             # レビュー収集セクション
@@ -744,26 +1029,31 @@ if st.session_state.search_results is not None and len(st.session_state.search_r
                                 st.markdown("---")
 
                 else:
-                    if st.button("📝 レビューを収集（最新50件）", key=f"review_{row['asin']}", use_container_width=True, type="secondary"):
-                        with st.spinner("収集中...（reviewsエンドポイント使用）"):
-                            try:
-                                from modules.review_collector import ReviewCollector
-                                collector = ReviewCollector(rainforest_key)
-                                reviews = collector.collect_reviews(row['asin'], target_count=50)
-                                st.session_state.collected_reviews[row['asin']] = reviews
-
-                                # 収集件数に応じてメッセージを変更
-                                if len(reviews) >= 40:
-                                    st.success(f"✅ {len(reviews)}件収集完了！（reviewsエンドポイント）")
-                                elif len(reviews) >= 10:
-                                    st.success(f"✅ {len(reviews)}件収集完了！")
-                                    st.info("💡 RainforestAPIの無料プランでは約10-20件のレビューが取得できます。より多くのレビューが必要な場合は有料プランをご検討ください。")
-                                else:
-                                    st.warning(f"⚠️ {len(reviews)}件のレビューを収集しましたが、予想より少ない可能性があります。")
-
-                                st.rerun()
-                            except Exception as e:
-                                error_msg = str(e)
+                    job_runner = get_job_runner()
+                    review_job_id = st.session_state.review_jobs.get(row['asin'])
+                    job = job_runner.get(review_job_id) if review_job_id else None
+
+                    if job is not None and job['active']:
+                        # 収集中（バックグラウンドジョブ）
+                        job_progress_panel(job['id'], '収集待機中...')
+
+                    elif job is not None and job['status'] == STATUS_DONE:
+                        st.session_state.collected_reviews[row['asin']] = job_runner.result(job['id'])
+                        del st.session_state.review_jobs[row['asin']]
+                        st.rerun()
+
+                    else:
+                        if job is not None:
+                            # 失敗・中断したジョブの内容を表示（次回の収集ボタンで再試行）
+                            del st.session_state.review_jobs[row['asin']]
+                            error = job_runner.result(job['id'])
+                            error_msg = job['error'] or ''
+
+                            if isinstance(error, DeadlineExceeded):
+                                st.warning(f"⏱️ {REVIEW_TIMEOUT_SEC}秒以内にレビューを取得できませんでした。数分待ってから再試行してください。")
+                            elif job['status'] == STATUS_CANCELLED:
+                                st.info("レビュー収集が中断されました")
+                            else:
                                 st.error(f"❌ レビュー収集エラー: {error_msg}")
 
                                 # RainforestAPIのエラーメッセージを分かりやすく表示
@@ -783,6 +1073,21 @@ if st.session_state.search_results is not None and len(st.session_state.search_r
                                     """)
                                 else:
                                     st.info("数分待ってから再試行してください。")
+
+                        collector = ReviewCollector(rainforest_key)
+                        prefetched = collector.get_cached_reviews(row['asin'], target_count=50) is not None
+                        button_label = "📝 レビューを表示（先読み済み）" if prefetched else "📝 レビューを収集（最新50件）"
+                        if st.button(button_label, key=f"review_{row['asin']}", use_container_width=True, type="secondary"):
+                            st.session_state.review_jobs[row['asin']] = job_runner.submit(
+                                'reviews',
+                                review_job,
+                                row['asin'],
+                                rainforest_key,
+                                owner=st.session_state.session_id,
+                                label=row['asin'],
+                                profile=st.session_state.get('profile_requests', False)
+                            )
+                            st.rerun()
             else:
                 st.warning("⚠️ RainforestAPIキーを設定してください")
 
@@ -795,25 +1100,37 @@ if st.session_state.collected_reviews and claude_key:
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        if st.button("📊 一括分析開始", type="primary", use_container_width=True):
-            with st.spinner("Claude Sonnet 4.5で低評価レビューを分析中... 数十秒かかります"):
-                try:
-                    # 全レビューを統合
-                    all_reviews = []
-                    for asin, reviews in st.session_state.collected_reviews.items():
-                        all_reviews.extend(reviews)
-
-                    df_reviews = pd.DataFrame(all_reviews)
-
-                    # Claude分析
-                    analyzer = ClaudeAnalyzer(claude_key)
-                    analysis = analyzer.analyze_reviews(df_reviews)
+        job_runner = get_job_runner()
+        analysis_job_id = st.session_state.analysis_job_id
+        job = job_runner.get(analysis_job_id) if analysis_job_id else None
 
-                    st.session_state.analysis = analysis
+        if job is not None and job['active']:
+            # 分析中（バックグラウンドジョブ）
+            job_progress_panel(job['id'], '分析待機中...')
+        else:
+            if job is not None:
+                st.session_state.analysis_job_id = None
+                if job['status'] == STATUS_DONE:
+                    analysis_output = job_runner.result(job['id'])
+                    st.session_state.analysis = analysis_output['analysis']
                     st.success("✅ 分析完了！下にスクロールして結果を確認してください")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"❌ 分析エラー: {str(e)}")
+                    if analysis_output['cache_hits'] > 0:
+                        st.caption(f"💾 {analysis_output['cache_hits']}商品は分析済みの結果を再利用しました")
+                else:
+                    st.error(f"❌ 分析エラー: {job['error'] or '中断されました'}")
+
+            if st.button("📊 一括分析開始", type="primary", use_container_width=True):
+                # 商品ごとに並列分析（分析済み・レビュー未更新の商品はキャッシュを再利用）
+                st.session_state.analysis_job_id = job_runner.submit(
+                    'analysis',
+                    analysis_job,
+                    claude_key,
+                    dict(st.session_state.collected_reviews),
+                    owner=st.session_state.session_id,
+                    label=f"{len(st.session_state.collected_reviews)}商品",
+                    profile=st.session_state.get('profile_requests', False)
+                )
+                st.rerun()
 
     with col2:
         if st.button("📄 CSV出力", use_container_width=True):
@@ -867,6 +1184,8 @@ if st.session_state.analysis:
                         with col1:
                             st.markdown(f"**{issue['問題']}**")
                             st.caption(f"具体例: {issue['具体例'][:150]}...")
+                            if issue.get('対象ASIN'):
+                                st.caption(f"該当商品: {', '.join(issue['対象ASIN'])}")
                         with col2:
                             freq_color = {
                                 '高': '🔴',
@@ -0,0 +1,79 @@
+"""
+キーワード一括スコアリング CLI
+Streamlitを使わずに検索 → Keepa取得 → スコアリングを実行する（cron向け）
+
+使い方:
+    python batch_search.py keywords.txt -o results/            # Parquet（ディレクトリ）
+    python batch_search.py keywords.txt -o results.csv --format csv
+    python batch_search.py keywords.txt -o results/ --log-json 2> telemetry.jsonl
+    cat keywords.txt | python batch_search.py - -o results/
+"""
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from modules.batch_runner import BatchRunner, read_keywords
+from modules.keepa_analyzer_simple import SEARCH_SORT_ORDERS
+from modules.logging_config import setup_logging
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="キーワード一括スコアリング")
+    parser.add_argument('keywords', help="キーワードファイル（1行1キーワード、'-'で標準入力）")
+    parser.add_argument('-o', '--output', required=True,
+                        help="出力先（parquetはディレクトリ、csvはファイル）")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help="出力形式")
+    parser.add_argument('--checkpoint', help="チェックポイントファイル（省略時は 出力先.checkpoint）")
+    parser.add_argument('--workers', type=int, default=4, help="同時実行数（キーワードのまとまり単位）")
+    parser.add_argument('--keywords-per-search', type=int, default=5,
+                        help="まとめて検索するキーワード数（キーワード間で重複するASINは1回だけ取得）")
+    parser.add_argument('--row-group-size', type=int, default=1000, help="1行グループあたりの行数")
+    parser.add_argument('--pages', type=int, default=1, help="キーワード検索で取得するページ数（並び順ごと）")
+    parser.add_argument('--sort', action='append', choices=list(SEARCH_SORT_ORDERS.keys()),
+                        help="検索の並び順（複数指定可、省略時はAmazonの既定順）")
+    parser.add_argument('--no-resume', action='store_true', help="チェックポイントを無視して最初から実行")
+    parser.add_argument('--log-level', help="ログレベル（DEBUG/INFO/WARNING/ERROR、省略時は LOG_LEVEL 環境変数）")
+    parser.add_argument('--log-json', action='store_true',
+                        help="ログをJSON Lines形式で出力（テレメトリ集計用、ログは標準エラーへ出力）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    # 結果のJSONは標準出力に出すため、ログは標準エラーへ
+    setup_logging(level=args.log_level, json_format=args.log_json or None, stream=sys.stderr)
+
+    keepa_key = os.getenv('KEEPA_API_KEY', '')
+    if not keepa_key:
+        print("[ERROR] KEEPA_API_KEY が設定されていません", file=sys.stderr)
+        return 1
+
+    runner = BatchRunner(
+        keepa_key,
+        args.output,
+        rainforest_api_key=os.getenv('RAINFOREST_API_KEY') or None,
+        output_format=args.format,
+        checkpoint_path=args.checkpoint,
+        max_workers=args.workers,
+        row_group_size=args.row_group_size,
+        search_pages=args.pages,
+        search_sort_orders=args.sort,
+        keywords_per_search=args.keywords_per_search,
+    )
+
+    if args.keywords == '-':
+        summary = runner.run(read_keywords(sys.stdin), resume=not args.no_resume)
+    else:
+        with open(args.keywords, 'r', encoding='utf-8') as f:
+            summary = runner.run(read_keywords(f), resume=not args.no_resume)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary['failed_keywords'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
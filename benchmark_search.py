@@ -0,0 +1,213 @@
+"""
+検索処理のスケールベンチマーク CLI
+合成Keepaデータで search_products の各段階（csv解析・指標抽出・スコアリング・DataFrame構築・フィルタ）を
+商品数ごとに計測し、スループットとピークメモリをJSONに保存する（APIは呼ばない）
+
+使い方:
+    python benchmark_search.py                                   # 10 / 1k / 10k / 100k件
+    python benchmark_search.py --sizes 10 1000 --history-points 50
+    python benchmark_search.py -o benchmarks/after.json --compare benchmarks/before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import keepa
+import numpy as np
+import pandas as pd
+
+from data.synthetic_keepa import iter_product_batches
+from modules.keepa_analyzer_simple import KeepaAnalyzerSimple, apply_filters
+
+try:
+    import resource
+except ImportError:  # Windowsではピークメモリを計測しない
+    resource = None
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+
+# 計測する段階（この順に実行）
+STAGES = ['parse', 'extract', 'score', 'dataframe', 'filter']
+
+# app.py の詳細検索の既定値に近い条件
+BENCH_FILTERS = {
+    'price': (1000, 10000),
+    'monthly_current': (100, 100000),
+    'growth_3m': False,
+    'growth_6m': False,
+    'growth_12m': False,
+    'growth_24m': False,
+    'bsr': (1, 100000),
+    'rating': (0.0, 5.0),
+    'review_min': 0,
+    'seller_max': 100,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="検索処理のスケールベンチマーク")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="計測する商品数")
+    parser.add_argument('--history-points', type=int, default=100, help="各履歴の点数")
+    parser.add_argument('--batch-size', type=int, default=1000, help="生成・解析のバッチサイズ（Keepaのクエリ単位に相当）")
+    parser.add_argument('--seed', type=int, default=0, help="合成データの乱数シード")
+    parser.add_argument('-o', '--output', help="結果JSONの保存先（省略時は benchmarks/search_scale-<commit>.json）")
+    parser.add_argument('--compare', help="比較する過去の結果JSON（遅くなった段階を表示）")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="比較時に劣化とみなす所要時間の比（既定1.2 = 20%%以上遅い）")
+    return parser.parse_args(argv)
+
+
+def _peak_rss_mb():
+    """プロセスのピーク常駐メモリ(MB)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxは KB、macOSは bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_size(size, history_points, batch_size, seed):
+    """
+    1つの商品数で計測（別プロセスで実行し、ピークメモリを商品数ごとに分離する）
+
+    Returns:
+        dict: 段階ごとの所要時間・スループット・ピークメモリ
+    """
+    analyzer = KeepaAnalyzerSimple('benchmark')
+    timings = dict.fromkeys(STAGES, 0.0)
+    generate_sec = 0.0
+    rss_before = _peak_rss_mb()
+    rows = []
+
+    started = time.perf_counter()
+    for batch in iter_product_batches(size, batch_size, history_points, seed=seed, parsed=False):
+        generate_sec += time.perf_counter() - started
+
+        t = time.perf_counter()
+        for product in batch:
+            product['data'] = keepa.parse_csv(product['csv'])
+        timings['parse'] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        metrics = [m for m in (analyzer._extract_metrics(p) for p in batch) if m is not None]
+        timings['extract'] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        rows.extend(analyzer._score_metrics(m) for m in metrics)
+        timings['score'] += time.perf_counter() - t
+
+        started = time.perf_counter()
+
+    t = time.perf_counter()
+    df = pd.DataFrame(rows)
+    if len(df) > 0:
+        df = df.sort_values('product_score', ascending=False).reset_index(drop=True)
+    timings['dataframe'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    filtered = apply_filters(df, BENCH_FILTERS)
+    timings['filter'] = time.perf_counter() - t
+
+    total = sum(timings.values())
+    return {
+        'products': size,
+        'rows': len(df),
+        'filtered_rows': len(filtered),
+        'generate_sec': round(generate_sec, 4),
+        'total_sec': round(total, 4),
+        'products_per_sec': round(size / total, 1) if total > 0 else None,
+        'stages': {
+            name: {
+                'sec': round(sec, 4),
+                'products_per_sec': round(size / sec, 1) if sec > 0 else None,
+            }
+            for name, sec in timings.items()
+        },
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_before_mb': rss_before,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous, threshold):
+    """
+    過去の結果と比較し、劣化した段階を返す
+
+    Returns:
+        list: (商品数, 段階, 過去の秒数, 今回の秒数, 比) のリスト
+    """
+    previous_by_size = {r['products']: r for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous_by_size.get(result['products'])
+        if before is None:
+            continue
+        for name, stage in result['stages'].items():
+            old = before['stages'].get(name, {}).get('sec')
+            if not old or old < 0.001:  # 1ms未満は誤差が大きいため比較しない
+                continue
+            ratio = stage['sec'] / old
+            print(f"  {result['products']:>7}件 {name:<10} {old:>9.3f}s → {stage['sec']:>9.3f}s  x{ratio:.2f}")
+            if ratio >= threshold:
+                regressions.append((result['products'], name, old, stage['sec'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    results = []
+    # ピークメモリを商品数ごとに測るため、各サイズを新しいプロセスで実行
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_size, (size, args.history_points, args.batch_size, args.seed))
+        results.append(result)
+        print(f"{size:>7}件: {result['total_sec']:.3f}s ({result['products_per_sec']}件/s), "
+              f"peak {result['peak_rss_mb']}MB  "
+              + ' '.join(f"{name}={stage['sec']:.3f}s" for name, stage in result['stages'].items()))
+
+    revision = _git_revision()
+    report = {
+        'benchmark': 'search_scale',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'keepa': getattr(keepa, '__version__', None)},
+        'params': {'history_points': args.history_points, 'batch_size': args.batch_size, 'seed': args.seed},
+        'results': results,
+    }
+
+    output = args.output or os.path.join('benchmarks', f"search_scale-{revision or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"比較: {args.compare}（{previous.get('git_revision')}）")
+        regressions = compare(report, previous, args.threshold)
+        if regressions:
+            print(f"[WARNING] {len(regressions)}段階で{args.threshold:.0%}以上の劣化があります")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
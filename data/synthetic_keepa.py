@@ -0,0 +1,147 @@
+"""
+合成Keepaデータ生成
+keepa.Keepa.query と同じ形式の商品データを任意の件数・履歴長で生成する（ベンチマーク・負荷試験用）
+
+- csv（NEW / SALES / COUNT_NEW / RATING / COUNT_REVIEWS の履歴）は Keepa の生データ形式
+  [Keepa分, 値, Keepa分, 値, ...]。parsed=True の場合は keepa.parse_csv で data も付与
+- monthlySold / monthlySoldHistory（月次の販売数履歴）も生成
+- 同じシードからは同じデータを生成する
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import keepa
+import numpy as np
+
+# Keepa分の基準（2011-01-01 00:00 UTC）
+KEEPA_EPOCH = datetime(2011, 1, 1)
+
+# 生成データの「現在時刻」（固定し、同じシードから同じデータを生成する）
+REFERENCE_TIME = datetime(2025, 1, 1)
+
+# csv のインデックス（keepa.parse_csv と同じ並び）
+CSV_LENGTH = 36
+CSV_NEW = 1
+CSV_SALES = 3
+CSV_COUNT_NEW = 11
+CSV_RATING = 16
+CSV_COUNT_REVIEWS = 17
+
+TITLE_WORDS = ['ヨガマット', 'ダンベル', 'トレーニングチューブ', 'バランスボール', 'ストレッチポール',
+               '腹筋ローラー', 'プッシュアップバー', 'ケトルベル', 'フィットネスバンド', 'ジャンプロープ']
+
+
+def keepa_minutes(dt: datetime) -> int:
+    """datetime を Keepa分（基準日からの経過分）に変換"""
+    return int((dt - KEEPA_EPOCH).total_seconds() // 60)
+
+
+def _series(times: np.ndarray, values: np.ndarray) -> List[int]:
+    """時刻と値を Keepa の [時刻, 値, 時刻, 値, ...] 形式に変換"""
+    out = np.empty(len(times) * 2, dtype=np.int64)
+    out[0::2] = times
+    out[1::2] = values
+    return out.tolist()
+
+
+def generate_product(rng: np.random.Generator, index: int, history_points: int = 200,
+                     history_days: int = 730, now_minutes: int = None, parsed: bool = True) -> Dict:
+    """
+    1商品分の合成データを生成
+
+    Args:
+        rng (np.random.Generator): 乱数生成器
+        index (int): 商品番号（ASINの生成に使用）
+        history_points (int): 各履歴の点数
+        history_days (int): 履歴の期間（日）
+        now_minutes (int): 現在時刻（Keepa分、省略時は REFERENCE_TIME）
+        parsed (bool): True の場合は keepa.parse_csv で data を付与
+
+    Returns:
+        Dict: Keepa商品データ
+    """
+    if now_minutes is None:
+        now_minutes = keepa_minutes(REFERENCE_TIME)
+    span = history_days * 24 * 60
+    times = np.sort(rng.integers(now_minutes - span, now_minutes, size=history_points))
+
+    # 価格: 基準価格からのランダムウォーク（円、JPは整数円）
+    base_price = rng.lognormal(mean=8.0, sigma=0.6)
+    price = np.clip(base_price * np.exp(np.cumsum(rng.normal(0, 0.02, history_points))), 300, 100000)
+    # ランキング: 対数正規 + ゆらぎ
+    base_rank = rng.lognormal(mean=8.5, sigma=1.5)
+    rank = np.clip(base_rank * np.exp(rng.normal(0, 0.3, history_points)), 1, 2_000_000)
+    # 出品者数・評価（0〜50）・レビュー数（単調増加）
+    sellers = np.clip(rng.poisson(rng.uniform(1, 40), history_points), 1, None)
+    rating = np.clip(rng.normal(rng.uniform(33, 47), 1.0, history_points), 10, 50)
+    reviews = np.cumsum(rng.poisson(rng.uniform(0.1, 20), history_points)) + 1
+
+    csv = [None] * CSV_LENGTH
+    csv[CSV_NEW] = _series(times, price.astype(np.int64))
+    csv[CSV_SALES] = _series(times, rank.astype(np.int64))
+    csv[CSV_COUNT_NEW] = _series(times, sellers.astype(np.int64))
+    csv[CSV_RATING] = _series(times, rating.astype(np.int64))
+    csv[CSV_COUNT_REVIEWS] = _series(times, reviews.astype(np.int64))
+
+    # 月間販売数: 月次（30日ごと）の履歴、成長・減少トレンド付き（期間より3ヶ月長めに生成）
+    months = (history_days + 90) // 30
+    month_times = now_minutes - np.arange(months)[::-1] * 30 * 24 * 60
+    growth = rng.normal(0.02, 0.05)
+    monthly = np.maximum(rng.lognormal(5.5, 1.0) * np.exp(growth * (np.arange(months) - months + 1)), 0)
+    monthly = (np.round(monthly / 50) * 50).astype(np.int64)
+
+    product = {
+        'asin': f"B0{index:08d}",
+        'title': f"{TITLE_WORDS[index % len(TITLE_WORDS)]} 合成データ {index}",
+        'domainId': 5,
+        'csv': csv,
+        'monthlySold': int(monthly[-1]),
+        'monthlySoldHistory': _series(month_times, monthly),
+    }
+    if parsed:
+        product['data'] = keepa.parse_csv(csv)
+    return product
+
+
+def generate_products(count: int, history_points: int = 200, history_days: int = 730,
+                      seed: int = 0, parsed: bool = True) -> List[Dict]:
+    """
+    合成商品データを生成
+
+    Args:
+        count (int): 商品数
+        history_points (int): 各履歴の点数
+        history_days (int): 履歴の期間（日）
+        seed (int): 乱数シード
+        parsed (bool): True の場合は data を付与（Keepaクエリの戻り値と同じ形式）
+
+    Returns:
+        List[Dict]: Keepa商品データのリスト
+    """
+    return [p for batch in iter_product_batches(count, count or 1, history_points, history_days, seed, parsed)
+            for p in batch]
+
+
+def iter_product_batches(count: int, batch_size: int = 1000, history_points: int = 200,
+                         history_days: int = 730, seed: int = 0, parsed: bool = True) -> Iterator[List[Dict]]:
+    """
+    合成商品データをバッチ単位で生成（大量件数でも全件をメモリに載せない）
+
+    Args:
+        count (int): 商品数
+        batch_size (int): 1バッチの商品数（Keepaのクエリ単位に相当）
+        history_points (int): 各履歴の点数
+        history_days (int): 履歴の期間（日）
+        seed (int): 乱数シード
+        parsed (bool): True の場合は data を付与
+
+    Yields:
+        List[Dict]: Keepa商品データのリスト
+    """
+    rng = np.random.default_rng(seed)
+    now_minutes = keepa_minutes(REFERENCE_TIME)
+    for start in range(0, count, batch_size):
+        yield [
+            generate_product(rng, index, history_points, history_days, now_minutes, parsed)
+            for index in range(start, min(start + batch_size, count))
+        ]
@@ -0,0 +1,117 @@
+"""
+複数セッションの負荷試験 CLI
+ローカルのスタブ（Keepa・RainforestAPI・Claude）に対して N人の模擬ユーザーが同時に
+検索 → レビュー収集 → AI分析 を行い、レイテンシ百分位・キャッシュヒット率・SQLiteのロック待ち・エラーを出力する
+（本番APIは呼ばない。キャッシュDBは既定で一時ディレクトリに作成）
+
+使い方:
+    python load_test.py --users 20
+    python load_test.py --users 20 --iterations 3 --claude-latency 5 --error-rate 0.02 -o loadtest.json
+    python load_test.py --users 10 --cache-db .cache/loadtest.db      # 2回目はキャッシュが温まった状態
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="複数セッションの負荷試験（スタブAPI使用）")
+    parser.add_argument('--users', type=int, default=20, help="同時ユーザー数")
+    parser.add_argument('--iterations', type=int, default=1, help="各ユーザーの 検索→レビュー→分析 の繰り返し回数")
+    parser.add_argument('--keywords', nargs='+', help="検索キーワード（先頭ほど選ばれやすい）")
+    parser.add_argument('--think-time', type=float, default=1.0, help="操作間の平均待ち時間(秒)")
+    parser.add_argument('--ramp-up', type=float, default=5.0, help="全ユーザーが開始するまでの秒数")
+    parser.add_argument('--review-top', type=int, default=3, help="レビューを収集する上位商品数")
+    parser.add_argument('--prefetch-top', type=int, default=0, help="検索直後にレビューを先読みする件数")
+    parser.add_argument('--keepa-latency', type=float, default=0.3, help="Keepaスタブの平均応答時間(秒)")
+    parser.add_argument('--rainforest-latency', type=float, default=0.5, help="RainforestAPIスタブの平均応答時間(秒)")
+    parser.add_argument('--claude-latency', type=float, default=2.0, help="Claudeスタブの平均応答時間(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="スタブがエラーを返す確率（0.0〜1.0）")
+    parser.add_argument('--catalog-size', type=int, default=500, help="スタブの商品総数（小さいほどキーワード間で重なる）")
+    parser.add_argument('--cache-db', help="キャッシュDBのパス（省略時は一時ディレクトリ＝キャッシュが空の状態）")
+    parser.add_argument('--lock-wait-ms', type=float, default=50, help="ロック待ちとみなすSQLite文の実行時間(ms)")
+    parser.add_argument('--job-timeout', type=float, default=300, help="1ジョブの完了を待つ最大秒数")
+    parser.add_argument('--seed', type=int, default=0, help="乱数シード")
+    parser.add_argument('-o', '--output', help="結果JSONの保存先")
+    parser.add_argument('--log-level', default='WARNING', help="ログレベル（既定 WARNING）")
+    return parser.parse_args(argv)
+
+
+def print_report(report):
+    """結果の要約を表示"""
+    print(f"\n{report['config']['users']}ユーザー × {report['config']['iterations']}回: "
+          f"{report['elapsed_sec']}秒, 完了 {report['sessions_completed']}セッション "
+          f"（{report['sessions_per_min']}/分, ジョブ同時実行数 {report['config']['job_workers']}）")
+
+    print("\nレイテンシ (ms)")
+    print(f"  {'段階':<18}{'件数':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage, stats in report['latency'].items():
+        if stats['count']:
+            print(f"  {stage:<18}{stats['count']:>6}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['max']:>10}")
+
+    print("\nキャッシュヒット率")
+    for namespace, stats in report['cache'].items():
+        print(f"  {namespace:<24}{stats['hit_rate']:>7.1%}  ({stats['hits']}/{stats['hits'] + stats['misses']})")
+
+    sqlite = report['sqlite']
+    print(f"\nSQLite: {sqlite['statements']}文, p99 {sqlite['statement_ms'].get('p99')}ms, "
+          f"max {sqlite['statement_ms'].get('max')}ms, "
+          f"{sqlite['lock_wait_threshold_ms']:.0f}ms超 {sqlite['lock_waits']}件（計{sqlite['lock_wait_total_sec']}秒）")
+    for error, count in sqlite['errors'].items():
+        print(f"  [ERROR] {error} × {count}")
+
+    print("\nスタブへのリクエスト数: " + ', '.join(f"{k}={v}" for k, v in report['upstream_requests'].items()))
+
+    if report['errors']:
+        print("\nエラー")
+        for error, count in report['errors'].items():
+            print(f"  {error} × {count}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # キャッシュDB・本番API用の設定はモジュールの読み込み前に切り替える
+    cache_db = args.cache_db or os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'api_cache.db')
+    os.environ['RESEARCH_CACHE_DB'] = cache_db
+    os.environ['RESEARCH_FIXTURE_MODE'] = 'off'
+
+    from modules.load_test import LoadTest, StubUpstreams
+    from modules.logging_config import setup_logging
+
+    setup_logging(level=args.log_level, stream=sys.stderr)
+
+    with StubUpstreams(
+        keepa_latency=args.keepa_latency,
+        rainforest_latency=args.rainforest_latency,
+        claude_latency=args.claude_latency,
+        error_rate=args.error_rate,
+        catalog_size=args.catalog_size,
+        seed=args.seed,
+    ) as upstreams:
+        report = LoadTest(
+            upstreams,
+            users=args.users,
+            iterations=args.iterations,
+            keywords=args.keywords,
+            think_time=args.think_time,
+            ramp_up=args.ramp_up,
+            review_top_k=args.review_top,
+            prefetch_top_k=args.prefetch_top,
+            job_timeout=args.job_timeout,
+            lock_wait_ms=args.lock_wait_ms,
+            seed=args.seed,
+        ).run()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+"""
+しきい値アラートモジュール
+search_products の指標列（product_score, price, seller_count, sales_growth_rate など）に対するルールを、
+値が変わったASIN・指標だけ評価し、条件を満たしたらSQLiteの送信箱（と任意でJSON Linesファイル）に書き出す
+
+- ルールは指標 → ルールの索引で引き、変化していない指標のルールは評価しない
+- 比較演算子（>, >=, <, <=）は条件を「満たしていない → 満たした」に変わった時のみ通知
+  （初回は満たしていれば通知。値が変わっていなくても、追加後に初めて評価するルールは初回として扱う）
+- change_pct は前回値からの変化率(%)の絶対値がしきい値以上で通知
+- 同じルール・ASINは cool-down 中は通知せず、前回通知と同じ値では再通知しない
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 送信箱のファイル出力先（JSON Lines、省略時はSQLiteのみ）
+ALERT_OUTBOX_ENV = 'RESEARCH_ALERT_OUTBOX'
+
+# 演算子
+OPERATORS = {
+    '>': lambda value, threshold: value > threshold,
+    '>=': lambda value, threshold: value >= threshold,
+    '<': lambda value, threshold: value < threshold,
+    '<=': lambda value, threshold: value <= threshold,
+}
+CHANGE_PCT = 'change_pct'
+
+# 同じルール・ASINを再通知しない秒数（既定）
+DEFAULT_COOLDOWN_SEC = 24 * 3600
+
+# SQLiteの IN 句に渡す最大件数
+QUERY_CHUNK = 500
+
+
+def _number(value) -> Optional[float]:
+    """数値に変換（欠損・数値以外はNone）"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def rule_matches(rule: Dict, previous: Optional[float], value: float) -> bool:
+    """
+    ルールの条件を判定
+
+    Args:
+        rule (dict): alert_rules の行（op, threshold）
+        previous (float): 前回値（初回はNone）
+        value (float): 今回値
+
+    Returns:
+        bool: 通知するか
+    """
+    if rule['op'] == CHANGE_PCT:
+        if not previous:
+            return False
+        return abs(value - previous) / abs(previous) * 100 >= rule['threshold']
+    check = OPERATORS[rule['op']]
+    return check(value, rule['threshold']) and (previous is None or not check(previous, rule['threshold']))
+
+
+def describe_rule(rule: Dict) -> str:
+    """ルールの表示用文字列"""
+    if rule['op'] == CHANGE_PCT:
+        text = f"{rule['metric']} が {rule['threshold']:g}% 以上変化"
+    else:
+        text = f"{rule['metric']} {rule['op']} {rule['threshold']:g}"
+    return f"{text}（{rule['asin']}）" if rule['asin'] else text
+
+
+class AlertEngine:
+    """変化した指標だけルールを評価し、通知を送信箱に書き出すクラス"""
+
+    def __init__(self, db_path: Optional[str] = None, outbox_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            db_path (str): SQLiteファイル（省略時はキャッシュと同じDB）
+            outbox_path (str): 通知を追記するJSON Linesファイル（省略時は RESEARCH_ALERT_OUTBOX 環境変数）
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self.outbox_path = outbox_path or os.getenv(ALERT_OUTBOX_ENV) or None
+        self._file_lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        """短命の接続を作成（BEGIN IMMEDIATEで手動トランザクション管理）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        書き込み用のトランザクション
+
+        Yields:
+            sqlite3.Connection: トランザクション中の接続（例外時はロールバック）
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """ルール・指標の前回値・通知履歴・送信箱テーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alert_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    metric TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    threshold REAL NOT NULL,
+                    asin TEXT,
+                    cooldown_sec REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alert_metric_state (
+                    asin TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (asin, metric)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alert_fired (
+                    rule_id INTEGER NOT NULL,
+                    asin TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    fired_at REAL NOT NULL,
+                    PRIMARY KEY (rule_id, asin)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS alert_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rule_id INTEGER NOT NULL,
+                    asin TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    previous REAL,
+                    value REAL NOT NULL,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    acknowledged INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_alert_outbox_ack ON alert_outbox(acknowledged, created_at)
+            """)
+        finally:
+            conn.close()
+
+    def add_rule(self, metric: str, op: str, threshold: float, asin: Optional[str] = None, name: str = '',
+                 cooldown_sec: float = DEFAULT_COOLDOWN_SEC) -> int:
+        """
+        ルールを追加
+
+        Args:
+            metric (str): 指標の列名（'product_score', 'price', 'seller_count', 'sales_growth_rate' など）
+            op (str): '>', '>=', '<', '<=' または 'change_pct'（前回値からの変化率%）
+            threshold (float): しきい値
+            asin (str): 対象ASIN（Noneは評価する全商品）
+            name (str): 表示名
+            cooldown_sec (float): 同じASINを再通知しない秒数
+
+        Returns:
+            int: ルールID
+        """
+        if op not in OPERATORS and op != CHANGE_PCT:
+            raise ValueError(f"op は {list(OPERATORS) + [CHANGE_PCT]} のいずれか: {op}")
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO alert_rules (name, metric, op, threshold, asin, cooldown_sec, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (name, metric, op, threshold, asin, cooldown_sec, time.time()))
+            return cursor.lastrowid
+
+    def remove_rule(self, rule_id: int):
+        """ルールを削除"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,))
+            conn.execute("DELETE FROM alert_fired WHERE rule_id = ?", (rule_id,))
+
+    def list_rules(self) -> List[Dict]:
+        """ルール一覧"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT * FROM alert_rules ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def _rule_index(self) -> Dict[str, List[Dict]]:
+        """指標 → ルールの索引"""
+        index: Dict[str, List[Dict]] = {}
+        for rule in self.list_rules():
+            index.setdefault(rule['metric'], []).append(rule)
+        return index
+
+    @staticmethod
+    def _select_chunked(conn, query: str, keys: List, *params) -> List[sqlite3.Row]:
+        rows = []
+        for i in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[i:i + QUERY_CHUNK]
+            rows.extend(conn.execute(query.format(','.join('?' * len(chunk))), (*params, *chunk)).fetchall())
+        return rows
+
+    def evaluate(self, rows: Iterable[Dict], now: Optional[float] = None) -> List[Dict]:
+        """
+        指標の行を評価し、前回から変化した指標のルールだけ判定して通知を書き出す
+
+        Args:
+            rows (Iterable[Dict]): search_products の行（asin と指標列）
+            now (float): 評価時刻
+
+        Returns:
+            List[Dict]: 書き出した通知
+        """
+        now = now or time.time()
+        index = self._rule_index()
+        if not index:
+            return []
+        rows = {row['asin']: row for row in rows if row.get('asin')}
+        if not rows:
+            return []
+        asins = list(rows)
+
+        alerts = []
+        with self._transaction() as conn:
+            previous = {
+                (row['asin'], row['metric']): (row['value'], row['updated_at'])
+                for row in self._select_chunked(
+                    conn, "SELECT asin, metric, value, updated_at FROM alert_metric_state WHERE asin IN ({})", asins)
+            }
+            fired = {
+                (row['rule_id'], row['asin']): row
+                for row in self._select_chunked(
+                    conn, "SELECT rule_id, asin, value, fired_at FROM alert_fired WHERE asin IN ({})", asins)
+            }
+
+            states = []
+            for asin, row in rows.items():
+                for metric, rules in index.items():
+                    value = _number(row.get(metric))
+                    if value is None:
+                        continue
+                    before, checked_at = previous.get((asin, metric), (None, None))
+                    if before == value:
+                        # 変化していない指標は、前回の評価より後に追加されたルールのみ初回として評価
+                        rules = [rule for rule in rules if rule['created_at'] > checked_at]
+                        if not rules:
+                            continue
+                        before = None
+                    states.append((asin, metric, value, now))
+
+                    for rule in rules:
+                        if rule['asin'] not in (None, asin) or not rule_matches(rule, before, value):
+                            continue
+                        last = fired.get((rule['id'], asin))
+                        if last is not None and (now - last['fired_at'] < rule['cooldown_sec'] or last['value'] == value):
+                            continue  # cool-down中・前回通知と同じ値
+                        alerts.append({
+                            'rule_id': rule['id'],
+                            'asin': asin,
+                            'metric': metric,
+                            'previous': before,
+                            'value': value,
+                            'message': self._message(rule, row, before, value),
+                            'created_at': now,
+                        })
+
+            conn.executemany("""
+                INSERT INTO alert_metric_state (asin, metric, value, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(asin, metric) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """, states)
+            conn.executemany("""
+                INSERT OR REPLACE INTO alert_fired (rule_id, asin, value, fired_at) VALUES (?, ?, ?, ?)
+            """, [(a['rule_id'], a['asin'], a['value'], now) for a in alerts])
+            for alert in alerts:
+                alert['id'] = conn.execute("""
+                    INSERT INTO alert_outbox (rule_id, asin, metric, previous, value, message, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (alert['rule_id'], alert['asin'], alert['metric'], alert['previous'], alert['value'],
+                      alert['message'], now)).lastrowid
+
+        if alerts:
+            logger.info("アラート %d件（評価 %d商品）", len(alerts), len(rows))
+            self._write_file(alerts)
+        return alerts
+
+    @staticmethod
+    def _message(rule: Dict, row: Dict, previous: Optional[float], value: float) -> str:
+        title = (row.get('title') or '')[:30]
+        change = f"{previous:g} → {value:g}" if previous is not None else f"{value:g}"
+        name = rule['name'] or describe_rule(rule)
+        return f"[{name}] {row['asin']} {title}: {rule['metric']} {change}"
+
+    def _write_file(self, alerts: List[Dict]):
+        """JSON Linesファイルにも追記（設定されている場合）"""
+        if not self.outbox_path:
+            return
+        try:
+            with self._file_lock, open(self.outbox_path, 'a', encoding='utf-8') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning("アラートのファイル出力に失敗: %s", e)
+
+    def outbox(self, unread_only: bool = True, limit: int = 50) -> List[Dict]:
+        """
+        送信箱の通知（新しい順）
+
+        Args:
+            unread_only (bool): 未確認のみ
+            limit (int): 最大件数
+
+        Returns:
+            List[Dict]: alert_outbox の行
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM alert_outbox" + (" WHERE acknowledged = 0" if unread_only else "")
+                + " ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def unread_count(self) -> int:
+        """未確認の通知数"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM alert_outbox WHERE acknowledged = 0").fetchone()[0]
+        finally:
+            conn.close()
+
+    def acknowledge(self, ids: Optional[List[int]] = None):
+        """
+        通知を確認済みにする
+
+        Args:
+            ids (list): 通知ID（Noneは全件）
+        """
+        with self._transaction() as conn:
+            if ids is None:
+                conn.execute("UPDATE alert_outbox SET acknowledged = 1 WHERE acknowledged = 0")
+            else:
+                conn.executemany("UPDATE alert_outbox SET acknowledged = 1 WHERE id = ?", [(i,) for i in ids])
+
+
+# グローバルアラートエンジン(シングルトン)
+_alert_instance = None
+_alert_lock = threading.Lock()
+
+def get_alert_engine():
+    """
+    アラートエンジンのシングルトンインスタンス取得
+
+    Returns:
+        AlertEngine インスタンス
+    """
+    global _alert_instance
+    with _alert_lock:
+        if _alert_instance is None:
+            _alert_instance = AlertEngine()
+    return _alert_instance
@@ -0,0 +1,445 @@
+"""
+バッチ検索モジュール
+キーワードリストに対して検索 → Keepa取得 → スコアリングを並列実行し、
+結果をParquet/CSVへ逐次書き出す（cron等からのヘッドレス実行用）
+
+キーワードは数件ずつまとめて検索し、キーワード間・実行中の他のまとまりと重複するASINは
+1回だけKeepaから取得・スコアリングする（出力はキーワードごとの行のまま）
+"""
+import csv
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .keepa_analyzer_simple import KeepaAnalyzerSimple
+from .keepa_token_scheduler import PRIORITY_BATCH
+from .logging_config import get_logger
+from .progress_reporter import LoggingProgressSink, ProgressReporter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrowが無い環境ではCSVのみ対応
+    pa = None
+    pq = None
+
+logger = get_logger(__name__)
+
+
+def read_keywords(lines: Iterable[str]) -> Iterator[str]:
+    """
+    キーワードを1行ずつ読み出す（空行・#コメント行はスキップ）
+
+    Args:
+        lines: ファイルオブジェクトや文字列のイテラブル
+
+    Yields:
+        str: キーワード
+    """
+    for line in lines:
+        keyword = line.strip()
+        if keyword and not keyword.startswith('#'):
+            yield keyword
+
+
+class CsvRowWriter:
+    """CSVへ行グループ単位で追記するライター"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns: Optional[List[str]] = None
+
+        # 再開時は既存ヘッダーを引き継いで追記
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+                self.columns = next(csv.reader(f), None)
+
+    def write(self, df: pd.DataFrame):
+        """行グループを書き出し、ディスクへフラッシュ"""
+        write_header = self.columns is None
+        if write_header:
+            self.columns = list(df.columns)
+        df = df.reindex(columns=self.columns)
+        with open(self.path, 'a', encoding='utf-8-sig' if write_header else 'utf-8', newline='') as f:
+            df.to_csv(f, index=False, header=write_header)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+class ParquetRowWriter:
+    """
+    Parquetディレクトリへ行グループ単位で書き出すライター
+
+    1ファイルに row_groups_per_file 個の行グループを書いたら閉じて次のpartへ移る。
+    書き込み中のpartは一時ファイル（.part-XXXXX.parquet.tmp、Parquetの読み込み対象外）に書き、
+    クローズ時に part-XXXXX.parquet へ置き換える。チェックポイントはpartのクローズ時に確定する
+    """
+
+    def __init__(self, path: str, row_groups_per_file: int = 10):
+        if pq is None:
+            raise ImportError("Parquet出力にはpyarrowが必要です（pip install pyarrow）")
+
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.row_groups_per_file = row_groups_per_file
+        self.schema = None
+        self._writer = None
+        self._tmp_path: Optional[Path] = None
+        self._part_path: Optional[Path] = None
+        self._row_groups = 0
+
+        # 中断時に書きかけだったpartを削除（その行のキーワードはチェックポイント未確定のため再実行される）
+        for stale in self.dir.glob('.part-*.parquet.tmp'):
+            logger.warning("書きかけのpartを削除: %s", stale.name)
+            stale.unlink()
+
+        # 再開時は完全なpartのみスキーマを引き継ぎ、続き番号から書き出す
+        existing = []
+        for part in sorted(self.dir.glob('part-*.parquet')):
+            try:
+                schema = pq.read_schema(part)
+            except (pa.ArrowInvalid, OSError) as e:
+                logger.warning("読み込めないpartを削除: %s (%s)", part.name, e)
+                part.unlink()
+                continue
+            existing.append(part)
+            self.schema = schema
+        self._part_index = int(existing[-1].stem.split('-')[1]) + 1 if existing else 0
+
+    def write(self, df: pd.DataFrame) -> bool:
+        """
+        行グループを書き出す
+
+        Returns:
+            bool: partファイルを閉じた（=書き出し済み行が確定した）場合True
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.schema is None:
+            self.schema = table.schema
+        else:
+            table = table.select(self.schema.names).cast(self.schema)
+
+        if self._writer is None:
+            self._part_path = self.dir / f"part-{self._part_index:05d}.parquet"
+            self._tmp_path = self.dir / f".{self._part_path.name}.tmp"
+            self._writer = pq.ParquetWriter(self._tmp_path, self.schema)
+            self._part_index += 1
+
+        self._writer.write_table(table)
+        self._row_groups += 1
+
+        if self._row_groups >= self.row_groups_per_file:
+            self.close()
+            return True
+        return False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp_path, self._part_path)
+            self._writer = None
+            self._tmp_path = None
+            self._part_path = None
+            self._row_groups = 0
+
+
+class SharedRows:
+    """
+    実行中に取得・スコアリングした行の共有キャッシュ（ASIN → 行、スレッドセーフ）
+
+    max_rows を超えたら古いものから捨てる（メモリ使用量を一定に保つ）
+    """
+
+    def __init__(self, max_rows: int = 10000):
+        self.max_rows = max_rows
+        self._rows: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, asin: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._rows.get(asin)
+            if row is not None:
+                self._rows.move_to_end(asin)
+            return row
+
+    def update(self, rows: Iterable[Dict]) -> int:
+        """
+        行を追加
+
+        Returns:
+            int: 新しく追加した商品数
+        """
+        added = 0
+        with self._lock:
+            for row in rows:
+                added += row['asin'] not in self._rows
+                self._rows[row['asin']] = row
+                self._rows.move_to_end(row['asin'])
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+        return added
+
+
+class BatchRunner:
+    """キーワード一括スコアリング実行クラス"""
+
+    def __init__(
+        self,
+        keepa_api_key: str,
+        output_path: str,
+        rainforest_api_key: Optional[str] = None,
+        output_format: str = 'parquet',
+        checkpoint_path: Optional[str] = None,
+        max_workers: int = 4,
+        row_group_size: int = 1000,
+        row_groups_per_file: int = 10,
+        search_pages: int = 1,
+        search_sort_orders: Optional[List[str]] = None,
+        keywords_per_search: int = 5,
+        shared_rows: int = 10000
+    ):
+        """
+        初期化
+
+        Args:
+            keepa_api_key (str): Keepa APIキー
+            output_path (str): 出力先（parquetはディレクトリ、csvはファイル）
+            rainforest_api_key (str): RainforestAPI キー
+            output_format (str): 'parquet' または 'csv'
+            checkpoint_path (str): チェックポイントファイル（省略時は出力先+.checkpoint）
+            max_workers (int): 同時実行数（キーワードのまとまり単位）
+            row_group_size (int): 1行グループあたりの行数
+            row_groups_per_file (int): Parquet 1ファイルあたりの行グループ数
+            search_pages (int): キーワード検索で取得するページ数（並び順ごと）
+            search_sort_orders (List[str]): 検索の並び順
+            keywords_per_search (int): まとめて検索するキーワード数（重複するASINは1回だけ取得）
+            shared_rows (int): 他のまとまりと共有する取得済みの行の最大数（0で共有しない）
+        """
+        self.keepa_api_key = keepa_api_key
+        self.rainforest_api_key = rainforest_api_key
+        self.output_format = output_format
+        self.max_workers = max_workers
+        self.row_group_size = row_group_size
+        self.search_pages = search_pages
+        self.search_sort_orders = search_sort_orders
+        self.keywords_per_search = max(keywords_per_search, 1)
+        self.shared_rows = SharedRows(shared_rows) if shared_rows > 0 else None
+        self._unique_products = 0
+
+        output_path = str(output_path).rstrip('/')
+        self.checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint")
+
+        if output_format == 'parquet':
+            self.writer = ParquetRowWriter(output_path, row_groups_per_file=row_groups_per_file)
+        elif output_format == 'csv':
+            self.writer = CsvRowWriter(output_path)
+        else:
+            raise ValueError(f"未対応の出力形式: {output_format}")
+
+        # スレッドごとにアナライザーを持つ（使用量集計のため一覧も保持）
+        self._local = threading.local()
+        self._analyzers: List[KeepaAnalyzerSimple] = []
+        self._analyzers_lock = threading.Lock()
+
+        # 書き出し待ちの行と、それに対応する完了キーワード
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered_rows = 0
+        self._pending_keywords: List[str] = []
+        self._unconfirmed_keywords: List[str] = []
+
+    def _get_analyzer(self) -> KeepaAnalyzerSimple:
+        """ワーカースレッド専用のアナライザーを取得"""
+        analyzer = getattr(self._local, 'analyzer', None)
+        if analyzer is None:
+            analyzer = KeepaAnalyzerSimple(
+                self.keepa_api_key,
+                rainforest_api_key=self.rainforest_api_key,
+                priority=PRIORITY_BATCH,  # 対話操作のトークン確保を優先
+                search_pages=self.search_pages,
+                search_sort_orders=self.search_sort_orders
+            )
+            self._local.analyzer = analyzer
+            with self._analyzers_lock:
+                self._analyzers.append(analyzer)
+        return analyzer
+
+    def _search(self, keywords: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        キーワードのまとまりを検索・スコアリング（重複するASINは1回だけ取得）
+
+        Returns:
+            Dict: キーワード → 商品データフレーム（先頭列が keyword）
+        """
+        keyword_asins, products = self._get_analyzer().search_products_multi(keywords, known_rows=self.shared_rows)
+        if self.shared_rows is not None and len(products) > 0:
+            added = self.shared_rows.update(products.to_dict('records'))
+            with self._analyzers_lock:
+                self._unique_products += added
+
+        indexed = products.set_index('asin', drop=False) if len(products) > 0 else products
+        results = {}
+        for keyword, asins in keyword_asins.items():
+            df = indexed.loc[asins].reset_index(drop=True) if asins else pd.DataFrame()
+            df.insert(0, 'keyword', keyword)
+            results[keyword] = df
+        return results
+
+    def load_checkpoint(self) -> set:
+        """完了済みキーワードを読み込む"""
+        if not self.checkpoint_path.exists():
+            return set()
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return set(read_keywords(f))
+
+    def _commit_keywords(self, keywords: List[str]):
+        """書き出しが確定したキーワードをチェックポイントへ追記"""
+        if not keywords:
+            return
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{k}\n" for k in keywords))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        行グループ間で型を揃える
+
+        Keepa由来の値は行によってint/floatが混在するため、数値列はfloat64に統一する
+        """
+        numeric = df.select_dtypes(include='number').columns
+        return df.astype({col: 'float64' for col in numeric})
+
+    def _flush(self, final: bool = False):
+        """バッファを行グループとして書き出し、確定したキーワードをチェックポイントに記録"""
+        if self._buffered_rows > 0:
+            df = self._normalize(pd.concat(self._buffer, ignore_index=True))
+            closed = self.writer.write(df)
+            self._unconfirmed_keywords.extend(self._pending_keywords)
+            if self.output_format == 'csv' or closed:
+                self._commit_keywords(self._unconfirmed_keywords)
+                self._unconfirmed_keywords = []
+        else:
+            # 結果0件のキーワードは書き出すものが無いため、そのまま確定待ちへ
+            self._unconfirmed_keywords.extend(self._pending_keywords)
+
+        self._buffer = []
+        self._buffered_rows = 0
+        self._pending_keywords = []
+
+        if final:
+            self.writer.close()
+            self._commit_keywords(self._unconfirmed_keywords)
+            self._unconfirmed_keywords = []
+
+    def _collect_usage(self) -> Dict:
+        """全ワーカーのAPI使用量を集計"""
+        usage = {}
+        with self._analyzers_lock:
+            for analyzer in self._analyzers:
+                for key, value in analyzer.usage.items():
+                    usage[key] = usage.get(key, 0) + value
+            tokens_left = [a.api.tokens_left for a in self._analyzers]
+        usage['keepa_tokens_left'] = min(tokens_left) if tokens_left else None
+        return usage
+
+    def run(self, keywords: Iterable[str], resume: bool = True) -> Dict:
+        """
+        バッチ実行
+
+        キーワードは遅延読み込みし、実行中のタスク数も max_workers の2倍までに
+        制限するため、キーワード数に関わらずメモリ使用量は一定に保たれる
+        （共有する取得済みの行も shared_rows 件まで）
+
+        Args:
+            keywords (Iterable[str]): キーワード
+            resume (bool): チェックポイント済みキーワードをスキップするか
+
+        Returns:
+            Dict: 実行サマリー（件数・スループット・API使用量）
+        """
+        done = self.load_checkpoint() if resume else set()
+        skipped = 0
+        completed = 0
+        failed = []
+        total_rows = 0
+        started = time.monotonic()
+        max_in_flight = self.max_workers * 2
+        # キーワード数は遅延読み込みで未知のため件数のみ、一定間隔でログ出力
+        progress = ProgressReporter(LoggingProgressSink("バッチ進捗"), message="キーワード処理中", min_interval=30.0)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+            keyword_iter = iter(keywords)
+            exhausted = False
+
+            while in_flight or not exhausted:
+                # 実行中タスクを上限まで補充（keywords_per_search 件ずつまとめる）
+                while not exhausted and len(in_flight) < max_in_flight:
+                    group = []
+                    while len(group) < self.keywords_per_search:
+                        keyword = next(keyword_iter, None)
+                        if keyword is None:
+                            exhausted = True
+                            break
+                        if keyword in done:
+                            skipped += 1
+                            continue
+                        done.add(keyword)
+                        group.append(keyword)
+                    if group:
+                        in_flight[executor.submit(self._search, group)] = group
+
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    group = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logger.error("「%s」の処理に失敗: %s", '」「'.join(group), e)
+                        failed.extend(group)
+                        continue
+
+                    for keyword in group:
+                        df = results.get(keyword, pd.DataFrame())
+                        completed += 1
+                        total_rows += len(df)
+                        self._pending_keywords.append(keyword)
+                        if len(df) > 0:
+                            self._buffer.append(df)
+                            self._buffered_rows += len(df)
+
+                        progress.advance(message=f"{total_rows}行取得 / 経過{time.monotonic() - started:.0f}秒")
+
+                    if self._buffered_rows >= self.row_group_size:
+                        self._flush()
+
+        self._flush(final=True)
+        progress.close(f"完了 {total_rows}行取得 / 経過{time.monotonic() - started:.0f}秒")
+
+        elapsed = time.monotonic() - started
+        return {
+            'completed_keywords': completed,
+            'skipped_keywords': skipped,
+            'failed_keywords': failed,
+            'rows': total_rows,
+            'unique_products': self._unique_products if self.shared_rows is not None else None,
+            'elapsed_sec': round(elapsed, 1),
+            'keywords_per_min': round(completed / elapsed * 60, 2) if elapsed > 0 else 0,
+            'rows_per_sec': round(total_rows / elapsed, 2) if elapsed > 0 else 0,
+            'api_usage': self._collect_usage(),
+        }
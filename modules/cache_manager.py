@@ -4,13 +4,94 @@ API呼び出し結果をキャッシュして、コスト削減とパフォー
 """
 import json
 import hashlib
+import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+# キャッシュDBの既定パス（RESEARCH_CACHE_DB 環境変数で変更可能。負荷試験などで本番のキャッシュと分ける）
+DEFAULT_DB_PATH = ".cache/api_cache.db"
+CACHE_DB_ENV = 'RESEARCH_CACHE_DB'
+
+# 接続プールの最大接続数（同時にキャッシュを読み書きできるスレッド数）
+DEFAULT_POOL_SIZE = 8
+
+# 他の接続が書き込み中の場合に待つ最大秒数（busy_timeout）
+BUSY_TIMEOUT_SEC = 10
+
+# アクセス時刻（LRU用）を更新する最小間隔(秒)。ヒットのたびに書き込まないようにする
+ACCESS_TOUCH_INTERVAL_SEC = 60
+
+
+class ConnectionPool:
+    """
+    SQLite接続のプール
+
+    接続は貸し出し中のスレッドだけが使い、返却後に別のスレッドへ貸し出す（1接続を複数スレッドで同時に使わない）。
+    最大数まで使用中の場合は返却を待つ
+    """
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, busy_timeout=BUSY_TIMEOUT_SEC):
+        """
+        Args:
+            db_path: SQLiteデータベースファイルパス
+            size: 最大接続数
+            busy_timeout: ロック待ちの最大秒数
+        """
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # トランザクションは明示的に BEGIN / COMMIT する（isolation_level=None）
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")  # WALではコミットごとのfsyncを省略しても破損しない
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        接続を借りる（with文を抜けると返却）
+
+        Yields:
+            sqlite3.Connection: 自動コミットモードの接続
+        """
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """すべての接続をクローズ"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._idle = queue.LifoQueue()
+
 
 class CacheManager:
     """
@@ -20,13 +101,15 @@ class CacheManager:
     - TTL(Time To Live)ベースの自動期限切れ
     - キャッシュキーのハッシュ化
     - LRUスタイルの容量管理
+    - スレッドセーフ（接続プール + WALで読み込みは書き込みを待たない）
     """
 
-    def __init__(self, db_path=".cache/api_cache.db", max_size_mb=100):
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_size_mb=100, pool_size=DEFAULT_POOL_SIZE):
         """
         Args:
             db_path: SQLiteデータベースファイルパス
             max_size_mb: 最大キャッシュサイズ(MB)
+            pool_size: 接続プールの最大接続数
         """
         self.db_path = db_path
         self.max_size_mb = max_size_mb
@@ -35,27 +118,50 @@ class CacheManager:
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
         # データベース初期化
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.pool = ConnectionPool(db_path, size=pool_size)
         self._init_db()
 
     def _init_db(self):
         """データベーステーブル作成"""
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS cache (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                created_at TIMESTAMP NOT NULL,
-                accessed_at TIMESTAMP NOT NULL,
-                ttl_hours INTEGER NOT NULL,
-                size_bytes INTEGER NOT NULL
-            )
-        """)
-
-        # インデックス作成(パフォーマンス向上)
-        self.conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_accessed_at ON cache(accessed_at)
-        """)
-        self.conn.commit()
+        with self.pool.connection() as conn:
+            # WALはDBファイルに記録され、同じDBを使うジョブ・トークン予算などの接続にも効く
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError as e:
+                logger.warning("WALモードに切り替えられませんでした: %s", e)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    accessed_at TIMESTAMP NOT NULL,
+                    ttl_hours INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL
+                )
+            """)
+
+            # インデックス作成(パフォーマンス向上)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_accessed_at ON cache(accessed_at)
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        書き込み用の短いトランザクション（開始時に書き込みロックを取得し、途中で待たされないようにする）
+
+        Yields:
+            sqlite3.Connection: トランザクション中の接続（例外時はロールバック）
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
 
     def _generate_cache_key(self, namespace, **params):
         """
@@ -89,37 +195,38 @@ class CacheManager:
         """
         cache_key = self._generate_cache_key(namespace, **params)
 
-        cursor = self.conn.execute("""
-            SELECT value, created_at, ttl_hours
-            FROM cache
-            WHERE key = ?
-        """, (cache_key,))
-
-        row = cursor.fetchone()
+        with self.pool.connection() as conn:
+            row = conn.execute("""
+                SELECT value, created_at, accessed_at, ttl_hours
+                FROM cache
+                WHERE key = ?
+            """, (cache_key,)).fetchone()
 
         if row:
-            value_json, created_at_str, cached_ttl = row
+            value_json, created_at_str, accessed_at_str, cached_ttl = row
+            now = datetime.now()
             created_at = datetime.fromisoformat(created_at_str)
 
             # TTLチェック
-            if datetime.now() - created_at < timedelta(hours=cached_ttl):
-                # アクセス時刻を更新(LRU用)
-                self.conn.execute("""
-                    UPDATE cache
-                    SET accessed_at = ?
-                    WHERE key = ?
-                """, (datetime.now(), cache_key))
-                self.conn.commit()
-
-                logger.info(f"✓ キャッシュヒット: {namespace} (age: {(datetime.now() - created_at).seconds}秒)")
+            if now - created_at < timedelta(hours=cached_ttl):
+                # アクセス時刻を更新(LRU用)。直近に更新済みなら書き込まない
+                if (now - datetime.fromisoformat(accessed_at_str)).total_seconds() >= ACCESS_TOUCH_INTERVAL_SEC:
+                    with self._transaction() as conn:
+                        conn.execute("""
+                            UPDATE cache
+                            SET accessed_at = ?
+                            WHERE key = ?
+                        """, (now, cache_key))
+
+                logger.debug("✓ キャッシュヒット: %s (age: %d秒)", namespace, (now - created_at).seconds)
                 return json.loads(value_json)
             else:
                 # 期限切れ - 削除
-                self.conn.execute("DELETE FROM cache WHERE key = ?", (cache_key,))
-                self.conn.commit()
-                logger.info(f"✗ キャッシュ期限切れ: {namespace}")
+                with self._transaction() as conn:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (cache_key,))
+                logger.debug("✗ キャッシュ期限切れ: %s", namespace)
 
-        logger.info(f"✗ キャッシュミス: {namespace}")
+        logger.debug("✗ キャッシュミス: %s", namespace)
         return None
 
     def set(self, value, namespace, ttl_hours=24, **params):
@@ -133,33 +240,35 @@ class CacheManager:
             **params: キャッシュキーのパラメータ
         """
         cache_key = self._generate_cache_key(namespace, **params)
+        # JSON化はロックを取る前に済ませる
         value_json = json.dumps(value, ensure_ascii=False)
         size_bytes = len(value_json.encode('utf-8'))
 
         now = datetime.now()
 
-        # 容量チェック
-        self._ensure_capacity(size_bytes)
+        with self._transaction() as conn:
+            # 容量チェック
+            self._ensure_capacity(conn, size_bytes)
 
-        # INSERT OR REPLACE
-        self.conn.execute("""
-            INSERT OR REPLACE INTO cache
-            (key, value, created_at, accessed_at, ttl_hours, size_bytes)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (cache_key, value_json, now, now, ttl_hours, size_bytes))
+            # INSERT OR REPLACE
+            conn.execute("""
+                INSERT OR REPLACE INTO cache
+                (key, value, created_at, accessed_at, ttl_hours, size_bytes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cache_key, value_json, now, now, ttl_hours, size_bytes))
 
-        self.conn.commit()
-        logger.info(f"✓ キャッシュ保存: {namespace} ({size_bytes} bytes, TTL: {ttl_hours}h)")
+        logger.debug("✓ キャッシュ保存: %s (%d bytes, TTL: %sh)", namespace, size_bytes, ttl_hours)
 
-    def _ensure_capacity(self, new_size_bytes):
+    def _ensure_capacity(self, conn, new_size_bytes):
         """
-        キャッシュ容量管理(LRU削除)
+        キャッシュ容量管理(LRU削除)。set() のトランザクション内で呼ぶ
 
         Args:
+            conn: トランザクション中の接続
             new_size_bytes: 新規追加するデータのサイズ
         """
         # 現在の合計サイズ取得
-        cursor = self.conn.execute("SELECT SUM(size_bytes) FROM cache")
+        cursor = conn.execute("SELECT SUM(size_bytes) FROM cache")
         total_size = cursor.fetchone()[0] or 0
 
         max_size_bytes = self.max_size_mb * 1024 * 1024
@@ -169,7 +278,7 @@ class CacheManager:
             # LRU削除(最も古くアクセスされたものから削除)
             delete_size = total_size + new_size_bytes - max_size_bytes
 
-            cursor = self.conn.execute("""
+            cursor = conn.execute("""
                 SELECT key, size_bytes
                 FROM cache
                 ORDER BY accessed_at ASC
@@ -180,11 +289,9 @@ class CacheManager:
                 if deleted_size >= delete_size:
                     break
 
-                self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
                 deleted_size += size
-                logger.info(f"LRU削除: {key} ({size} bytes)")
-
-            self.conn.commit()
+                logger.info("LRU削除: %s (%d bytes)", key, size)
 
     def clear(self, namespace=None):
         """
@@ -195,15 +302,12 @@ class CacheManager:
         """
         if namespace:
             # 名前空間指定削除(キーがnamespace:で始まるもの)
-            cursor = self.conn.execute("SELECT key FROM cache")
-            for (key,) in cursor.fetchall():
-                # 元のnamespaceを復元してチェック(ハッシュ化されているため完全一致不可)
-                # 簡易的にすべてクリア
-                pass
+            # 元のnamespaceを復元してチェック(ハッシュ化されているため完全一致不可)
+            # 簡易的にすべてクリア
             logger.info(f"キャッシュクリア: {namespace}")
         else:
-            self.conn.execute("DELETE FROM cache")
-            self.conn.commit()
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM cache")
             logger.info("全キャッシュクリア")
 
     def get_stats(self):
@@ -213,15 +317,15 @@ class CacheManager:
         Returns:
             統計情報の辞書
         """
-        cursor = self.conn.execute("""
-            SELECT
-                COUNT(*) as count,
-                SUM(size_bytes) as total_size,
-                AVG(size_bytes) as avg_size
-            FROM cache
-        """)
+        with self.pool.connection() as conn:
+            row = conn.execute("""
+                SELECT
+                    COUNT(*) as count,
+                    SUM(size_bytes) as total_size,
+                    AVG(size_bytes) as avg_size
+                FROM cache
+            """).fetchone()
 
-        row = cursor.fetchone()
         count, total_size, avg_size = row
 
         return {
@@ -233,11 +337,12 @@ class CacheManager:
 
     def close(self):
         """データベース接続クローズ"""
-        self.conn.close()
+        self.pool.close()
 
 
 # グローバルキャッシュインスタンス(シングルトン)
 _cache_instance = None
+_cache_lock = threading.Lock()
 
 def get_cache_manager():
     """
@@ -247,6 +352,7 @@ def get_cache_manager():
         CacheManager インスタンス
     """
     global _cache_instance
-    if _cache_instance is None:
-        _cache_instance = CacheManager()
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = CacheManager(db_path=os.getenv(CACHE_DB_ENV) or DEFAULT_DB_PATH)
     return _cache_instance
@@ -3,31 +3,59 @@ Claude APIを使用してレビューを分析するモジュール
 """
 import anthropic
 import json
+import hashlib
 import pandas as pd
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Iterable, Optional, Tuple
+from .cache_manager import get_cache_manager
+from .fixtures import wrap_anthropic
+from .profiling import get_profiler
+
+# 商品別分析のキャッシュ有効期限（レビューが変わればキーも変わるため長めに設定）
+ANALYSIS_CACHE_TTL_HOURS = 24 * 30
+
+# 頻度ラベルの優先度（統合時に高い方を採用）
+FREQUENCY_ORDER = {'高': 3, '中': 2, '低': 1}
+
 
 class ClaudeAnalyzer:
     """Claude AI分析クラス"""
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, profile: Optional[bool] = None):
         """
         初期化
 
         Args:
             api_key (str): Anthropic Claude APIキー
+            profile (bool): 分析のプロファイルを記録するか（Noneは RESEARCH_PROFILE 環境変数に従う）
         """
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = wrap_anthropic(anthropic.Anthropic(api_key=api_key))
+        self.cache = get_cache_manager()  # キャッシュマネージャー
+        self.last_cache_hits = 0  # 直近のanalyze_productsでキャッシュヒットした商品数
+        self.profile = profile
+        self.profiler = get_profiler()
 
-    def analyze_reviews(self, reviews_df: pd.DataFrame) -> Dict:
+    def analyze_reviews(self, reviews_df: pd.DataFrame, profile_id: Optional[str] = None, label: str = '') -> Dict:
         """
         レビューをプロセス別に分析
 
         Args:
             reviews_df (pd.DataFrame): レビューデータフレーム
+            profile_id (str): プロファイルの保存単位（省略時は記録する場合のみ新規発行）
+            label (str): プロファイルの表示用ラベル（ASINなど）
 
         Returns:
             Dict: 分析結果（カテゴリ別問題、改善提案、新商品コンセプト）
         """
+        if not self.profiler.should_profile(self.profile):
+            return self._analyze_reviews(reviews_df)
+
+        with self.profiler.stage(profile_id or self.profiler.new_request_id('analysis'), 'analyze_reviews',
+                                 enabled=True, kind='analysis', label=label, reviews=len(reviews_df)):
+            return self._analyze_reviews(reviews_df)
+
+    def _analyze_reviews(self, reviews_df: pd.DataFrame) -> Dict:
+        """analyze_reviews の本体（プロンプト作成 → Claude呼び出し → JSON解析）"""
         # 低評価レビューを抽出（★3以下）
         negative_reviews = reviews_df[reviews_df['rating'] <= 3]
 
@@ -39,8 +67,10 @@ class ClaudeAnalyzer:
             }
 
         # サンプリング（最大300件、トークン制限対策）
+        # シードを固定し、同じレビューからは同じプロンプトを作る（記録した応答の再生に必要）
         sampled = negative_reviews.sample(
-            n=min(300, len(negative_reviews))
+            n=min(300, len(negative_reviews)),
+            random_state=0
         )
 
         # レビューテキストを整形
@@ -120,3 +150,163 @@ class ClaudeAnalyzer:
 
         except Exception as e:
             raise Exception(f"Claude分析エラー: {str(e)}")
+
+    @staticmethod
+    def _reviews_fingerprint(reviews: List[Dict]) -> str:
+        """
+        レビュー集合のフィンガープリントを生成（キャッシュキー用）
+
+        レビューを再収集して内容が変わった場合のみ、キーが変わる
+
+        Args:
+            reviews (List[Dict]): レビューデータのリスト
+
+        Returns:
+            str: SHA256ハッシュ
+        """
+        keys = sorted(
+            f"{r.get('review_id', '')}|{r.get('rating', '')}|{r.get('title', '')}|{r.get('body', '')}"
+            for r in reviews
+        )
+        return hashlib.sha256("\n".join(keys).encode('utf-8')).hexdigest()
+
+    def analyze_product(self, asin: str, reviews: List[Dict], force: bool = False,
+                        profile_id: Optional[str] = None) -> Dict:
+        """
+        1商品分のレビューを分析（キャッシュ対応）
+
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+            reviews (List[Dict]): 対象商品のレビューデータ
+            force (bool): Trueの場合キャッシュを無視して再分析
+            profile_id (str): プロファイルの保存単位（analyze_products で複数商品をまとめる）
+
+        Returns:
+            Dict: 分析結果（analyze_reviewsと同じ形式）
+        """
+        analysis, _cache_hit = self._analyze_product(asin, reviews, force, profile_id)
+        return analysis
+
+    def _analyze_product(self, asin: str, reviews: List[Dict], force: bool = False,
+                         profile_id: Optional[str] = None) -> Tuple[Dict, bool]:
+        """
+        1商品分のレビューを分析し、キャッシュヒットしたかも返す（ワーカースレッドから呼ぶため共有状態は更新しない）
+
+        Returns:
+            Tuple[Dict, bool]: 分析結果、キャッシュヒットした場合True
+        """
+        fingerprint = self._reviews_fingerprint(reviews)
+
+        if not force:
+            cached = self.cache.get('claude_analysis', ttl_hours=ANALYSIS_CACHE_TTL_HOURS,
+                                    asin=asin, reviews=fingerprint)
+            if cached:
+                return cached, True
+
+        if len(reviews) == 0:
+            analysis = {"カテゴリ別問題": {}, "改善提案": [], "新商品コンセプト": {}}
+        else:
+            analysis = self.analyze_reviews(pd.DataFrame(reviews), profile_id=profile_id, label=asin)
+
+        self.cache.set(analysis, 'claude_analysis', ttl_hours=ANALYSIS_CACHE_TTL_HOURS,
+                       asin=asin, reviews=fingerprint)
+        return analysis, False
+
+    def analyze_products(
+        self,
+        reviews_by_asin: Dict[str, List[Dict]],
+        max_workers: int = 4,
+        refresh: Iterable[str] = ()
+    ) -> Dict[str, Dict]:
+        """
+        商品ごとにレビューを並列分析
+
+        キャッシュ済みの商品はClaudeを呼ばずに再利用するため、
+        商品を1つ追加・更新した場合はその商品のみ再分析される
+
+        Args:
+            reviews_by_asin (Dict[str, List[Dict]]): ASIN → レビューリスト
+            max_workers (int): 並列実行数
+            refresh (Iterable[str]): キャッシュを無視して再分析するASIN
+
+        Returns:
+            Dict[str, Dict]: ASIN → 分析結果
+        """
+        refresh = set(refresh)
+        self.last_cache_hits = 0
+
+        if not reviews_by_asin:
+            return {}
+
+        # 複数商品の分析は1つのプロファイル（商品ごとのステージ）にまとめる
+        profile_id = self.profiler.new_request_id('analysis') if self.profiler.should_profile(self.profile) else None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(reviews_by_asin)))) as executor:
+            futures = {
+                asin: executor.submit(self._analyze_product, asin, reviews, asin in refresh, profile_id)
+                for asin, reviews in reviews_by_asin.items()
+            }
+            results = {asin: future.result() for asin, future in futures.items()}
+
+        # キャッシュヒット数は呼び出し元のスレッドで集計
+        self.last_cache_hits = sum(cache_hit for _analysis, cache_hit in results.values())
+        return {asin: analysis for asin, (analysis, _cache_hit) in results.items()}
+
+    @staticmethod
+    def merge_analyses(per_asin: Dict[str, Dict]) -> Dict:
+        """
+        商品別の分析結果を横断レポートに統合
+
+        - カテゴリ別問題: 同じ問題は1件にまとめ、該当ASINと最も高い頻度を保持
+        - 改善提案: 同じ提案は1件にまとめ、該当ASINを保持
+        - 新商品コンセプト: 問題点が最も多く抽出された商品のものを採用
+
+        Args:
+            per_asin (Dict[str, Dict]): ASIN → 分析結果
+
+        Returns:
+            Dict: 統合済み分析結果（analyze_reviewsと同じ形式 + 商品別分析）
+        """
+        categories = {}
+        proposals = {}
+        concept = {}
+        concept_issue_count = -1
+
+        for asin, analysis in per_asin.items():
+            issue_count = 0
+
+            for category, issues in analysis.get('カテゴリ別問題', {}).items():
+                merged_issues = categories.setdefault(category, {})
+                for issue in issues:
+                    issue_count += 1
+                    key = str(issue.get('問題', '')).strip()
+                    if key not in merged_issues:
+                        merged_issues[key] = dict(issue, 対象ASIN=[])
+                    merged = merged_issues[key]
+                    merged['対象ASIN'].append(asin)
+                    if FREQUENCY_ORDER.get(issue.get('頻度'), 0) > FREQUENCY_ORDER.get(merged.get('頻度'), 0):
+                        merged['頻度'] = issue['頻度']
+
+            for proposal in analysis.get('改善提案', []):
+                key = str(proposal.get('提案', '')).strip()
+                if key not in proposals:
+                    proposals[key] = dict(proposal, 対象ASIN=[])
+                proposals[key]['対象ASIN'].append(asin)
+
+            if analysis.get('新商品コンセプト') and issue_count > concept_issue_count:
+                concept = analysis['新商品コンセプト']
+                concept_issue_count = issue_count
+
+        # 複数商品に共通する問題・頻度が高い問題を上位に
+        def _issue_rank(issue):
+            return (-len(issue['対象ASIN']), -FREQUENCY_ORDER.get(issue.get('頻度'), 0))
+
+        return {
+            "カテゴリ別問題": {
+                category: sorted(issues.values(), key=_issue_rank)
+                for category, issues in categories.items()
+            },
+            "改善提案": sorted(proposals.values(), key=lambda p: -len(p['対象ASIN'])),
+            "新商品コンセプト": concept,
+            "商品別分析": per_asin
+        }
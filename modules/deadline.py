@@ -0,0 +1,109 @@
+"""
+リクエスト単位のデッドライン・キャンセルモジュール
+検索全体の持ち時間を各ステージへ引き継ぎ、個々のAPI呼び出しのタイムアウトを残り時間で打ち切る
+
+- Deadline: 全体の持ち時間。各呼び出しは timeout() で「固定タイムアウトと残り時間の小さい方」を使う
+- CancelToken: 画面遷移・再実行時に実行中の処理を中断するためのフラグ（スレッド間で共有）
+"""
+import threading
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """持ち時間を使い切った場合の例外（途中結果を返す合図）"""
+
+
+class OperationCancelled(Exception):
+    """キャンセルトークンにより中断された場合の例外"""
+
+
+class CancelToken:
+    """スレッドセーフなキャンセルフラグ"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """キャンセルを要求"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """キャンセル済みなら OperationCancelled を送出"""
+        if self._event.is_set():
+            raise OperationCancelled("処理がキャンセルされました")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        最大timeout秒待機（キャンセルされた時点で即座に戻る）
+
+        Returns:
+            bool: キャンセルされた場合True
+        """
+        return self._event.wait(timeout)
+
+
+class Deadline:
+    """リクエスト全体の持ち時間"""
+
+    def __init__(self, budget_sec: Optional[float] = None, cancel_token: Optional[CancelToken] = None):
+        """
+        初期化
+
+        Args:
+            budget_sec (float): 持ち時間(秒)。Noneの場合は無制限（キャンセルのみ有効）
+            cancel_token (CancelToken): キャンセルトークン（省略時は新規作成）
+        """
+        self.expires_at = time.monotonic() + budget_sec if budget_sec is not None else None
+        self.cancel_token = cancel_token or CancelToken()
+
+    def remaining(self) -> Optional[float]:
+        """残り秒数（無制限の場合はNone）"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self):
+        """キャンセル・期限切れを確認し、該当する場合は例外を送出"""
+        self.cancel_token.raise_if_cancelled()
+        if self.expired():
+            raise DeadlineExceeded("持ち時間を超過しました")
+
+    def timeout(self, default: Optional[float]) -> Optional[float]:
+        """
+        API呼び出しに渡すタイムアウトを計算（固定タイムアウトと残り時間の小さい方）
+
+        Args:
+            default (float): 呼び出し固有の固定タイムアウト(秒)
+
+        Returns:
+            float: 使用するタイムアウト(秒)
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if default is None:
+            return remaining
+        return min(default, remaining)
+
+    def sleep(self, seconds: float):
+        """キャンセル・期限切れで中断可能なsleep"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        self.cancel_token.wait(max(seconds, 0.0))
+        self.check()
+
+
+def ensure_deadline(deadline: Optional[Deadline]) -> Deadline:
+    """Noneの場合は無制限のデッドラインを返す（引数省略時の既定値用）"""
+    return deadline if deadline is not None else Deadline()
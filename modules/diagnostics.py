@@ -0,0 +1,227 @@
+"""
+診断データ取得モジュール
+検索時のKeepa・RainforestAPIの応答をリクエスト単位で保存する（既定では無効）
+
+- RESEARCH_DIAGNOSTICS=1 で有効化。無効時の呼び出し側コストはフラグ確認のみ
+- 書き込みは専用スレッドで行い、検索処理は待たない
+- リクエストIDごとのディレクトリに gzip JSON で保存し、合計サイズが上限を超えたら古いリクエストから削除
+- 保存したKeepa応答は load_keepa_products() で再構築でき、ベンチマーク・再現用のフィクスチャに使える
+"""
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import keepa
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 有効化する環境変数
+DIAGNOSTICS_ENV = 'RESEARCH_DIAGNOSTICS'
+
+# 保存先ディレクトリの合計サイズ上限（バイト）
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# Keepa応答のうち csv から再計算できる項目（保存しない）
+_DERIVED_PRODUCT_KEYS = ('data', 'stats_parsed')
+
+
+def compact_keepa_products(products: List[Dict]) -> List[Dict]:
+    """
+    Keepa商品データから再計算できる項目を除いた応答そのもの（JSON化可能）
+
+    Args:
+        products (List[Dict]): keepa.Keepa.query の戻り値
+
+    Returns:
+        List[Dict]: 保存用の商品データ
+    """
+    return [{key: value for key, value in product.items() if key not in _DERIVED_PRODUCT_KEYS}
+            for product in products]
+
+
+def _json_default(value):
+    """numpy型などJSON化できない値の変換"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class DiagnosticsCapture:
+    """リクエスト単位のスナップショットを非同期に保存するクラス"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 enabled: Optional[bool] = None):
+        """
+        初期化
+
+        Args:
+            directory (str): 保存先（省略時はキャッシュDBと同じディレクトリの diagnostics/）
+            max_bytes (int): 保存先の合計サイズ上限
+            enabled (bool): 有効にするか（省略時は RESEARCH_DIAGNOSTICS 環境変数）
+        """
+        if enabled is None:
+            enabled = os.getenv(DIAGNOSTICS_ENV, '') not in ('', '0', 'false')
+        self.enabled = enabled
+        self.directory = Path(directory) if directory else Path(get_cache_manager().db_path).parent / 'diagnostics'
+        self.max_bytes = max_bytes
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def capture(self, request_id: Optional[str], kind: str, payload: Dict):
+        """
+        スナップショットを保存キューへ追加（無効時は何もしない）
+
+        Args:
+            request_id (str): 検索リクエストのID
+            kind (str): 種類（'keepa_query', 'search_page' など）
+            payload (Dict): 保存する内容（JSON化可能な値）
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='diagnostics', daemon=True)
+                self._writer.start()
+
+        self._queue.put((request_id or 'unknown', seq, kind, time.time(), payload))
+
+    def flush(self):
+        """キューに積まれたスナップショットの書き込み完了を待つ"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(*item)
+                self._rotate()
+            except Exception as e:
+                # 診断データの保存失敗で本処理に影響させない
+                logger.warning("診断データの保存に失敗: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, request_id: str, seq: int, kind: str, captured_at: float, payload: Dict):
+        request_dir = self.directory / request_id
+        request_dir.mkdir(parents=True, exist_ok=True)
+        snapshot = {'request_id': request_id, 'kind': kind, 'captured_at': captured_at, 'payload': payload}
+        with gzip.open(request_dir / f"{seq:06d}_{kind}.json.gz", 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, default=_json_default)
+
+    def _rotate(self):
+        """合計サイズが上限を超えた場合、古いリクエストのディレクトリから削除"""
+        requests_dirs = []
+        total = 0
+        for request_dir in self.directory.iterdir():
+            if not request_dir.is_dir():
+                continue
+            files = list(request_dir.glob('*.json.gz'))
+            size = sum(f.stat().st_size for f in files)
+            mtime = max((f.stat().st_mtime for f in files), default=request_dir.stat().st_mtime)
+            requests_dirs.append((mtime, size, request_dir))
+            total += size
+
+        requests_dirs.sort()
+        # 書き込み中の最新リクエストは削除しない
+        for mtime, size, request_dir in requests_dirs[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(request_dir, ignore_errors=True)
+            total -= size
+
+    def list_requests(self) -> List[str]:
+        """保存済みのリクエストID（新しい順）"""
+        if not self.directory.exists():
+            return []
+        dirs = [d for d in self.directory.iterdir() if d.is_dir()]
+        return [d.name for d in sorted(dirs, key=lambda d: d.stat().st_mtime, reverse=True)]
+
+    def load_request(self, request_id: str, kind: Optional[str] = None) -> List[Dict]:
+        """
+        リクエストのスナップショットを保存順に読み込む
+
+        Args:
+            request_id (str): リクエストID
+            kind (str): 指定した場合はその種類のみ
+
+        Returns:
+            List[Dict]: スナップショット（request_id, kind, captured_at, payload）
+        """
+        pattern = f"*_{kind}.json.gz" if kind else '*.json.gz'
+        return [load_snapshot(path) for path in sorted((self.directory / request_id).glob(pattern))]
+
+
+def load_snapshot(path) -> Dict:
+    """
+    スナップショットファイルを読み込む
+
+    Args:
+        path: .json.gz ファイルのパス
+
+    Returns:
+        Dict: request_id, kind, captured_at, payload
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_keepa_products(snapshot: Dict) -> List[Dict]:
+    """
+    'keepa_query' スナップショットからKeepa商品データを再構築（csv から data を再計算）
+
+    Args:
+        snapshot (Dict): load_snapshot() の戻り値
+
+    Returns:
+        List[Dict]: keepa.Keepa.query と同じ形式の商品データ
+    """
+    return restore_keepa_products(snapshot['payload']['products'])
+
+
+def restore_keepa_products(products: List[Dict]) -> List[Dict]:
+    """
+    compact_keepa_products() で保存した商品データに data（価格・ランキング等の履歴）を再計算して付与
+
+    Args:
+        products (List[Dict]): 保存した商品データ
+
+    Returns:
+        List[Dict]: keepa.Keepa.query と同じ形式の商品データ
+    """
+    for product in products:
+        if product.get('csv'):
+            product['data'] = keepa.parse_csv(product['csv'])
+    return products
+
+
+# グローバル診断インスタンス(シングルトン)
+_diagnostics_instance = None
+_diagnostics_lock = threading.Lock()
+
+def get_diagnostics():
+    """
+    診断データ取得のシングルトンインスタンス取得
+
+    Returns:
+        DiagnosticsCapture インスタンス
+    """
+    global _diagnostics_instance
+    with _diagnostics_lock:
+        if _diagnostics_instance is None:
+            _diagnostics_instance = DiagnosticsCapture()
+    return _diagnostics_instance
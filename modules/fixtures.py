@@ -0,0 +1,386 @@
+"""
+API応答の記録・再生モジュール
+Keepa・RainforestAPI・Claude APIの通信部分を差し替え、ネットワーク無しで検索〜分析を再現する
+
+- record: 実際のAPIを呼び、応答をフィクスチャファイルに保存
+- replay: 保存した応答を返す（APIは呼ばない）。遅延・エラーを注入して性能・障害時の挙動を再現できる
+- off（既定）: 何も差し替えない（wrap_* は受け取ったクライアントをそのまま返す）
+
+設定は環境変数（RESEARCH_FIXTURE_MODE / RESEARCH_FIXTURE_DIR / RESEARCH_FIXTURE_LATENCY /
+RESEARCH_FIXTURE_ERROR_RATE）または use_fixtures() で行う。
+フィクスチャはAPIキーを除いたリクエスト内容のハッシュで引くため、同じリクエストには同じ応答を返す。
+キャッシュ（CacheManager）に残っている応答は通信前に返されるため、計測時は空のキャッシュで実行すること
+"""
+import copy
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+
+from .diagnostics import compact_keepa_products, restore_keepa_products
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MODE_OFF = 'off'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+# リクエストのキーに含めない項目（APIキー・表示用の指定）
+_IGNORED_PARAMS = {'api_key', 'key', 'progress_bar', 'wait'}
+
+# 再生時のKeepaトークン残高・回復レート（記録に無い場合）
+REPLAY_TOKENS_LEFT = 10000
+REPLAY_REFILL_RATE = 1000
+
+
+class FixtureMissing(Exception):
+    """再生モードで対応するフィクスチャが無い場合の例外"""
+
+
+class InjectedFault(ConnectionError):
+    """再生モードで注入したエラー（通信エラーとして扱われる）"""
+
+
+class FixtureStore:
+    """フィクスチャファイルの保存・検索と、再生時の遅延・エラー注入"""
+
+    def __init__(self, directory: str, mode: str = MODE_REPLAY, latency: Optional[float] = None,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        """
+        初期化
+
+        Args:
+            directory (str): フィクスチャの保存先
+            mode (str): 'record' / 'replay'
+            latency (float): 再生時の応答遅延(秒)。Noneの場合は記録時の実測値を使う
+            latency_jitter (float): 遅延に加える一様乱数の最大値(秒)
+            error_rate (float): 再生時にエラーを注入する確率（0.0〜1.0）
+            seed (int): 遅延・エラー注入の乱数シード（同じシードなら同じ順序で再現）
+        """
+        self.directory = Path(directory)
+        self.mode = mode
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0, 'injected_errors': 0}
+
+    @staticmethod
+    def request_key(service: str, request: Dict) -> str:
+        """APIキー等を除いたリクエスト内容のハッシュ"""
+        canonical = json.dumps(
+            {k: v for k, v in request.items() if k not in _IGNORED_PARAMS},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(f"{service}:{canonical}".encode('utf-8')).hexdigest()[:24]
+
+    def _path(self, service: str, request: Dict) -> Path:
+        return self.directory / service / f"{self.request_key(service, request)}.json.gz"
+
+    def record(self, service: str, request: Dict, response: Dict, latency: float):
+        """
+        応答を保存
+
+        Args:
+            service (str): 'keepa' / 'rainforest' / 'claude'
+            request (Dict): リクエスト内容
+            response (Dict): 応答（JSON化可能な値）
+            latency (float): 実測の応答時間(秒)
+        """
+        path = self._path(service, request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fixture = {
+            'service': service,
+            'request': {k: v for k, v in request.items() if k not in _IGNORED_PARAMS},
+            'response': response,
+            'latency': latency,
+            'recorded_at': time.time(),
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False, default=_json_default)
+        with self._lock:
+            self.stats['recorded'] += 1
+
+    def _load(self, service: str, request: Dict) -> Dict:
+        path = self._path(service, request)
+        if not path.exists():
+            with self._lock:
+                self.stats['missing'] += 1
+            raise FixtureMissing(f"フィクスチャがありません: {service} {path.name}")
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _inject(self, service: str, recorded_latency: float, count: int = 1):
+        """遅延を入れ、エラー注入の対象ならInjectedFaultを送出"""
+        with self._lock:
+            delay = recorded_latency if self.latency is None else self.latency
+            delay += self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.stats['injected_errors'] += 1
+            else:
+                self.stats['replayed'] += count
+
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise InjectedFault(f"注入したエラー: {service}")
+
+    def replay(self, service: str, request: Dict) -> Dict:
+        """
+        保存した応答を返す（設定に応じて遅延・エラーを注入）
+
+        Returns:
+            Dict: 記録時の応答
+
+        Raises:
+            FixtureMissing: 対応するフィクスチャが無い場合
+            InjectedFault: エラー注入の対象になった場合
+        """
+        fixture = self._load(service, request)
+        self._inject(service, fixture.get('latency', 0.0))
+        return fixture['response']
+
+    def replay_many(self, service: str, request_list: list) -> list:
+        """
+        複数の応答をまとめて返す（遅延は記録時の合計を1回、エラー注入も1回として扱う）
+
+        Returns:
+            list: 記録時の応答（request_list と同じ順）
+        """
+        fixtures = [self._load(service, request) for request in request_list]
+        self._inject(service, sum(f.get('latency', 0.0) for f in fixtures), count=len(fixtures))
+        return [f['response'] for f in fixtures]
+
+
+def _json_default(value):
+    """numpy型などJSON化できない値の変換"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class FixtureResponse:
+    """requests.Response の代わりに返す応答（status_code / json() / raise_for_status() のみ）"""
+
+    def __init__(self, status_code: int, data: Any):
+        self.status_code = status_code
+        self._data = data
+        self.ok = status_code < 400
+
+    def json(self):
+        return self._data
+
+    @property
+    def text(self) -> str:
+        return json.dumps(self._data, ensure_ascii=False)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error (fixture)", response=self)
+
+
+class FixtureSession:
+    """requests.Session（または requests モジュール）の get() を記録・再生するラッパー"""
+
+    def __init__(self, session, store: FixtureStore):
+        self._session = session
+        self._store = store
+
+    def get(self, url, params=None, **kwargs):
+        request = dict(params or {}, url=url)
+        if self._store.mode == MODE_REPLAY:
+            fixture = self._store.replay('rainforest', request)
+            return FixtureResponse(fixture['status_code'], fixture['json'])
+
+        started = time.monotonic()
+        response = self._session.get(url, params=params, **kwargs)
+        try:
+            data = response.json()
+        except ValueError:
+            return response  # JSON以外の応答は記録しない
+        self._store.record('rainforest', request, {'status_code': response.status_code, 'json': data},
+                           time.monotonic() - started)
+        return response
+
+    def close(self):
+        if self._store.mode != MODE_REPLAY and hasattr(self._session, 'close'):
+            self._session.close()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class FixtureKeepa:
+    """keepa.Keepa の query() / update_status() を記録・再生するラッパー"""
+
+    def __init__(self, api, store: FixtureStore):
+        self._api = api
+        self._store = store
+        if store.mode == MODE_REPLAY:
+            self._set_status(REPLAY_TOKENS_LEFT, REPLAY_REFILL_RATE)
+
+    def _set_status(self, tokens_left, refill_rate):
+        self._api.tokens_left = tokens_left
+        self._api.status.refillRate = refill_rate
+
+    def query(self, items, **kwargs):
+        """
+        商品データを取得（商品ごとに記録するため、再生時のチャンク分割が記録時と違っても引ける）
+        """
+        asins = [items] if isinstance(items, str) else list(items)
+        if self._store.mode == MODE_REPLAY:
+            fixtures = self._store.replay_many('keepa', [dict(kwargs, asin=asin) for asin in asins])
+            if fixtures:
+                self._set_status(fixtures[-1].get('tokens_left', REPLAY_TOKENS_LEFT),
+                                 fixtures[-1].get('refill_rate', REPLAY_REFILL_RATE))
+            return restore_keepa_products([f['product'] for f in fixtures])
+
+        started = time.monotonic()
+        products = self._api.query(items, **kwargs)
+        latency = (time.monotonic() - started) / max(len(products), 1)
+        for product in compact_keepa_products(products):
+            self._store.record('keepa', dict(kwargs, asin=product.get('asin')), {
+                'product': product,
+                'tokens_left': self._api.tokens_left,
+                'refill_rate': getattr(self._api.status, 'refillRate', None),
+            }, latency)
+        return products
+
+    def update_status(self):
+        if self._store.mode != MODE_REPLAY:
+            self._api.update_status()
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    def __setattr__(self, name, value):
+        # _timeout などクライアントの設定は元のクライアントへ反映
+        if name in ('_api', '_store'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._api, name, value)
+
+
+class _FixtureMessages:
+    def __init__(self, messages, store: FixtureStore):
+        self._messages = messages
+        self._store = store
+
+    def create(self, **kwargs):
+        from anthropic.types import Message
+
+        if self._store.mode == MODE_REPLAY:
+            return Message.model_validate(self._store.replay('claude', kwargs))
+
+        started = time.monotonic()
+        message = self._messages.create(**kwargs)
+        self._store.record('claude', kwargs, message.model_dump(mode='json'), time.monotonic() - started)
+        return message
+
+
+class FixtureAnthropic:
+    """anthropic.Anthropic の messages.create() を記録・再生するラッパー"""
+
+    def __init__(self, client, store: FixtureStore):
+        self._client = client
+        self.messages = _FixtureMessages(client.messages, store)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# プロセス全体で使うフィクスチャ設定
+_store: Optional[FixtureStore] = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+
+def _store_from_env() -> Optional[FixtureStore]:
+    mode = os.getenv('RESEARCH_FIXTURE_MODE', MODE_OFF).lower()
+    if mode not in (MODE_RECORD, MODE_REPLAY):
+        return None
+    latency = os.getenv('RESEARCH_FIXTURE_LATENCY', 'recorded')
+    store = FixtureStore(
+        os.getenv('RESEARCH_FIXTURE_DIR', 'fixtures'),
+        mode=mode,
+        latency=None if latency == 'recorded' else float(latency),
+        error_rate=float(os.getenv('RESEARCH_FIXTURE_ERROR_RATE', '0')),
+    )
+    logger.info("API応答フィクスチャ: %sモード（%s）", mode, store.directory)
+    return store
+
+
+def get_fixture_store() -> Optional[FixtureStore]:
+    """
+    現在のフィクスチャ設定を取得（無効の場合はNone）
+
+    Returns:
+        FixtureStore インスタンス
+    """
+    global _store, _store_loaded
+    with _store_lock:
+        if not _store_loaded:
+            _store = _store_from_env()
+            _store_loaded = True
+    return _store
+
+
+@contextmanager
+def use_fixtures(store: Optional[FixtureStore]):
+    """
+    ブロック内で作成するクライアントに指定したフィクスチャ設定を使う（ベンチマーク・テスト用）
+
+    Args:
+        store (FixtureStore): 使用する設定（Noneで無効化）
+    """
+    global _store, _store_loaded
+    with _store_lock:
+        previous = (_store, _store_loaded)
+        _store, _store_loaded = store, True
+    try:
+        yield store
+    finally:
+        with _store_lock:
+            _store, _store_loaded = previous
+
+
+def wrap_session(session):
+    """RainforestAPI用のセッション（または requests モジュール）を設定に応じて差し替え"""
+    store = get_fixture_store()
+    return FixtureSession(session, store) if store else session
+
+
+def wrap_keepa(api):
+    """Keepaクライアントを設定に応じて差し替え"""
+    store = get_fixture_store()
+    return FixtureKeepa(api, store) if store else api
+
+
+def keepa_with_timeout(api, timeout):
+    """
+    タイムアウトだけを変えたKeepaクライアントの複製（wrap_keepa の戻り値にも対応）
+
+    並行する問い合わせがそれぞれの残り時間で打ち切れるよう、共有クライアントの設定は書き換えない
+    """
+    if isinstance(api, FixtureKeepa):
+        return FixtureKeepa(keepa_with_timeout(api._api, timeout), api._store)
+    clone = copy.copy(api)
+    clone._timeout = timeout
+    return clone
+
+
+def wrap_anthropic(client):
+    """Anthropicクライアントを設定に応じて差し替え"""
+    store = get_fixture_store()
+    return FixtureAnthropic(client, store) if store else client
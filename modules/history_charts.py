@@ -0,0 +1,201 @@
+"""
+履歴グラフ用の間引きモジュール
+時系列ストアに保存したKeepa履歴（価格・ランキング・月間販売数・レビュー数）を表示期間ごとに少数の点へ間引き、
+キャッシュしておく（グラフ描画時に数万点をブラウザへ送らない）
+
+- 価格・ランキング: 区間ごとの最小値・最大値を残す（急な値下げ・ランキングの跳ねを消さない）
+- 月間販売数・レビュー数: LTTB（Largest-Triangle-Three-Buckets、見た目の形を保つ）
+- 間引き結果は系列の最後の時刻ごとにキャッシュ（新しい点が追記されると作り直す）
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+from .timeseries_store import MONTHLY_SOLD, get_timeseries_store
+
+logger = get_logger(__name__)
+
+# グラフに表示する系列（時系列ストアの系列名 → 表示名・間引き方法・段差表示か）
+CHART_SERIES = {
+    'NEW': {'label': '価格(円)', 'method': 'minmax', 'step': True},
+    'SALES': {'label': 'ランキング', 'method': 'minmax', 'step': True},
+    MONTHLY_SOLD: {'label': '月間販売数', 'method': 'lttb', 'step': True},
+    'COUNT_REVIEWS': {'label': 'レビュー数', 'method': 'lttb', 'step': False},
+}
+
+# 表示期間（名前 → 日数、Noneは全期間）
+ZOOM_LEVELS = {
+    '3ヶ月': 90,
+    '1年': 365,
+    '2年': 730,
+    '全期間': None,
+}
+
+# 1系列・1表示期間あたりの最大点数
+MAX_POINTS = 300
+
+# 間引き結果のキャッシュ（系列の最後の時刻をキーに含めるため、期限は長めでよい）
+CHART_CACHE_TTL_HOURS = 24 * 30
+
+
+def minmax_downsample(t: np.ndarray, v: np.ndarray, max_points: int = MAX_POINTS):
+    """
+    区間ごとの最小値・最大値を残して間引く
+
+    Args:
+        t (np.ndarray): 時刻（昇順）
+        v (np.ndarray): 値（NaNは欠損）
+        max_points (int): 最大点数
+
+    Returns:
+        tuple: (時刻, 値)。点数が max_points 以下の場合はそのまま
+    """
+    n = len(t)
+    if n <= max_points:
+        return t, v
+
+    # 先頭・末尾は必ず残し、間を max_points//2 - 1 区間に分ける
+    buckets = max(max_points // 2 - 1, 1)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    keep = [0]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        segment = v[lo:hi]
+        if np.isnan(segment).all():
+            keep.append(lo)  # 欠損区間は1点だけ残して途切れを表示
+            continue
+        low, high = lo + int(np.nanargmin(segment)), lo + int(np.nanargmax(segment))
+        keep.extend(sorted({low, high}))
+    keep.append(n - 1)
+    keep = np.asarray(keep)
+    return t[keep], v[keep]
+
+
+def lttb(t: np.ndarray, v: np.ndarray, max_points: int = MAX_POINTS):
+    """
+    LTTB（Largest-Triangle-Three-Buckets）で間引く
+
+    Args:
+        t (np.ndarray): 時刻（昇順）
+        v (np.ndarray): 値（NaNの点は除く）
+        max_points (int): 最大点数（3以上）
+
+    Returns:
+        tuple: (時刻, 値)。点数が max_points 以下の場合はそのまま
+    """
+    valid = ~np.isnan(v)
+    t, v = t[valid], v[valid]
+    n = len(t)
+    if n <= max_points or max_points < 3:
+        return t, v
+
+    x = t.astype(float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    keep = np.empty(max_points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # 次の区間の平均点（最後の区間の次は末尾の点）
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        if next_hi <= next_lo:
+            next_lo, next_hi = n - 1, n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), v[next_lo:next_hi].mean()
+        # 前に選んだ点・次の区間の平均点と作る三角形の面積が最大の点を選ぶ
+        area = np.abs((x[a] - avg_x) * (v[lo:hi] - v[a]) - (x[a] - x[lo:hi]) * (avg_y - v[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return t[keep], v[keep]
+
+
+def downsample(t: np.ndarray, v: np.ndarray, method: str, max_points: int = MAX_POINTS):
+    """
+    method に応じて間引く
+
+    Args:
+        method (str): 'minmax' / 'lttb'
+    """
+    if method == 'lttb':
+        return lttb(t, v, max_points)
+    return minmax_downsample(t, v, max_points)
+
+
+def _build_levels(points: np.ndarray, series: str, max_points: int) -> Dict[str, Dict[str, List]]:
+    t = points['t'].astype(np.int64)
+    v = points['v'].astype(float)
+    v[v < 0] = np.nan
+    method = CHART_SERIES.get(series, {}).get('method', 'minmax')
+
+    levels = {}
+    for level, days in ZOOM_LEVELS.items():
+        lo = 0 if days is None else int(np.searchsorted(t, t[-1] - days * 24 * 60, side='left'))
+        level_t, level_v = downsample(t[lo:], v[lo:], method, max_points)
+        levels[level] = {
+            't': level_t.tolist(),
+            'v': [None if np.isnan(value) else value for value in level_v.tolist()],
+        }
+    return levels
+
+
+def get_chart_levels(asin: str, series: str, max_points: int = MAX_POINTS) -> Optional[Dict[str, Dict[str, List]]]:
+    """
+    系列を全表示期間について間引いた結果を取得（キャッシュ済みならそれを返す）
+
+    Args:
+        asin (str): ASIN
+        series (str): 時系列ストアの系列名
+        max_points (int): 1表示期間あたりの最大点数
+
+    Returns:
+        Dict: 表示期間 → {'t': Keepa分のリスト, 'v': 値のリスト（欠損はNone）}（履歴がない場合はNone）
+    """
+    store = get_timeseries_store()
+    last_time = store.last_time(asin, series)
+    if last_time is None:
+        return None
+
+    cache = get_cache_manager()
+    params = {'asin': asin, 'series': series, 'last_time': last_time, 'max_points': max_points}
+    levels = cache.get('history_chart', ttl_hours=CHART_CACHE_TTL_HOURS, **params)
+    if levels is not None:
+        return levels
+
+    points = store.read_points(asin, series)
+    if len(points) == 0:
+        return None
+    levels = _build_levels(points, series, max_points)
+    cache.set(levels, 'history_chart', ttl_hours=CHART_CACHE_TTL_HOURS, **params)
+    logger.debug("履歴グラフを間引き: %s/%s %d点 → 最大%d点", asin, series, len(points), max_points)
+    return levels
+
+
+def get_product_chart_levels(asin: str, max_points: int = MAX_POINTS) -> Dict[str, Dict[str, Dict[str, List]]]:
+    """
+    商品のグラフ用の全系列を取得
+
+    Returns:
+        Dict: 系列名 → get_chart_levels() の戻り値（履歴がない系列は含まない）
+    """
+    charts = {}
+    for series in CHART_SERIES:
+        levels = get_chart_levels(asin, series, max_points)
+        if levels is not None:
+            charts[series] = levels
+    return charts
+
+
+def warm_chart_levels(asins: List[str], max_points: int = MAX_POINTS):
+    """
+    上位商品の間引き結果を事前に作成（画面表示時に即座に描画するため。失敗しても検索は止めない）
+
+    Args:
+        asins (list): ASINのリスト
+    """
+    for asin in asins:
+        try:
+            get_product_chart_levels(asin, max_points)
+        except Exception as e:
+            logger.warning("履歴グラフの事前作成に失敗 %s: %s", asin, e)
@@ -0,0 +1,382 @@
+"""
+バックグラウンドジョブ実行モジュール
+検索・レビュー収集・AI分析をStreamlitのスクリプト再実行から切り離して実行する
+
+- ジョブはスレッドプールで実行し、状態（進捗・メッセージ・エラー）はSQLiteのジョブテーブルに保存
+- 結果はセッション状態ではなくファイル（pickle）に保存し、ジョブIDで取得
+- 画面側はジョブIDを保持して状態をポーリング表示するだけなので、操作中も再実行でジョブが失われない
+"""
+import os
+import pickle
+import threading
+import time
+import uuid
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache_manager import get_cache_manager
+from .deadline import CancelToken, OperationCancelled
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# ジョブの状態
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# 完了したジョブの結果ファイルを保持する時間
+JOB_RESULT_TTL_HOURS = 24
+
+
+def _process_token() -> str:
+    """
+    このプロセスの識別子（PIDが再利用されても別プロセスと区別できる）
+
+    Linuxではプロセスの起動時刻を含めるため、同じプロセス内でモジュールを再読み込みしても変わらない。
+    起動時刻を取得できない環境ではインポート時に生成する
+    """
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # comm（括弧内）に空白を含む場合があるため、最後の ')' 以降を分割（starttime は22番目の項目）
+            started = f.read().rsplit(b')', 1)[1].split()[19].decode()
+        return f"{os.getpid()}-{started}"
+    except (OSError, IndexError):
+        return f"{os.getpid()}-{uuid.uuid4().hex}"
+
+
+# ジョブテーブルに記録するプロセスの識別子（コンテナの再起動で同じPIDになっても値は変わる）
+PROCESS_TOKEN = _process_token()
+
+
+class JobContext:
+    """ジョブ関数に渡される実行コンテキスト（進捗報告・キャンセル確認用）"""
+
+    def __init__(self, runner: 'JobRunner', job_id: str, cancel_token: CancelToken):
+        self.runner = runner
+        self.job_id = job_id
+        self.cancel_token = cancel_token
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None):
+        """
+        進捗を報告
+
+        Args:
+            progress (float): 0.0〜1.0（Noneの場合は据え置き）
+            message (str): 状態メッセージ（Noneの場合は据え置き）
+        """
+        self.runner._update(self.job_id, progress=progress, message=message)
+
+    def set_partial(self, value: Any):
+        """途中結果を公開（メモリ上のみ、画面の暫定表示用）"""
+        self.runner._partials[self.job_id] = value
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+
+class JobRunner:
+    """SQLiteのジョブテーブルを持つスレッドプール実行クラス"""
+
+    def __init__(self, db_path: Optional[str] = None, result_dir: Optional[str] = None, max_workers: int = 4):
+        """
+        初期化
+
+        Args:
+            db_path (str): ジョブテーブルを保存するSQLiteファイル（省略時はキャッシュと同じDB）
+            result_dir (str): 結果ファイルの保存先（省略時はDBと同じディレクトリの jobs/）
+            max_workers (int): 同時実行ジョブ数（全セッション共通）
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self.result_dir = Path(result_dir) if result_dir else Path(self.db_path).parent / 'jobs'
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._cancel_tokens: Dict[str, CancelToken] = {}
+        self._partials: Dict[str, Any] = {}
+        self._init_db()
+        self._recover_interrupted()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """ジョブテーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT,
+                    label TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    pid INTEGER NOT NULL,
+                    instance TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created_at)
+            """)
+            # プロセス識別子の列が無い既存DBには列を追加（NULLの行は以前のプロセスのジョブ）
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'instance' not in existing:
+                conn.execute("ALTER TABLE jobs ADD COLUMN instance TEXT")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _recover_interrupted(self):
+        """
+        終了したプロセスが残した実行中ジョブを失敗扱いにし、期限切れの結果ファイルを削除
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, pid, instance FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchall()
+            orphaned = [job_id for job_id, pid, instance in rows if not _job_process_alive(pid, instance)]
+            conn.executemany("""
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?
+                WHERE id = ?
+            """, [(STATUS_FAILED, "プロセスの再起動により中断されました", now, job_id) for job_id in orphaned])
+
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (now - JOB_RESULT_TTL_HOURS * 3600,)
+            ).fetchall()]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+            conn.commit()
+        finally:
+            conn.close()
+
+        for job_id in expired:
+            self._result_path(job_id).unlink(missing_ok=True)
+
+    def _result_path(self, job_id: str) -> Path:
+        return self.result_dir / f"{job_id}.pkl"
+
+    def submit(self, kind: str, func: Callable, *args, owner: Optional[str] = None,
+               label: Optional[str] = None, **kwargs) -> str:
+        """
+        ジョブを登録して実行を開始
+
+        Args:
+            kind (str): ジョブの種類（'search', 'reviews', 'analysis' など）
+            func (callable): func(ctx: JobContext, *args, **kwargs) の形で呼ばれるジョブ関数
+            owner (str): ジョブを登録したセッションの識別子
+            label (str): 表示用のラベル（キーワード・ASINなど）
+
+        Returns:
+            str: ジョブID
+        """
+        job_id = uuid.uuid4().hex
+        cancel_token = CancelToken()
+        self._cancel_tokens[job_id] = cancel_token
+
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, owner, label, status, pid, instance, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, owner, label, STATUS_QUEUED, os.getpid(), PROCESS_TOKEN, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+        ctx = JobContext(self, job_id, cancel_token)
+        self.executor.submit(self._run, ctx, func, args, kwargs)
+        return job_id
+
+    def _run(self, ctx: JobContext, func: Callable, args, kwargs):
+        """ワーカースレッドでジョブを実行し、結果・状態を保存"""
+        job_id = ctx.job_id
+        if ctx.cancelled:
+            self._finish(job_id, STATUS_CANCELLED)
+            return
+
+        self._set_status(job_id, STATUS_RUNNING, started_at=time.time())
+        try:
+            result = func(ctx, *args, **kwargs)
+            with open(self._result_path(job_id), 'wb') as f:
+                pickle.dump(result, f)
+            self._finish(job_id, STATUS_DONE, progress=1.0)
+        except OperationCancelled:
+            self._finish(job_id, STATUS_CANCELLED)
+        except Exception as e:
+            logger.exception("ジョブ失敗: %s: %s", job_id, e)
+            # 例外オブジェクトも保存し、画面側で種類に応じたメッセージを出せるようにする
+            try:
+                with open(self._result_path(job_id), 'wb') as f:
+                    pickle.dump(e, f)
+            except Exception:
+                pass
+            self._finish(job_id, STATUS_FAILED, error=str(e))
+        finally:
+            self._cancel_tokens.pop(job_id, None)
+            self._partials.pop(job_id, None)
+
+    def _set_status(self, job_id: str, status: str, started_at: Optional[float] = None):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE jobs SET status = ?, started_at = COALESCE(?, started_at)
+                WHERE id = ?
+            """, (status, started_at, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, progress: Optional[float] = None, error: Optional[str] = None):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE jobs SET status = ?, progress = COALESCE(?, progress), error = ?, finished_at = ?
+                WHERE id = ?
+            """, (status, progress, error, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, progress: Optional[float] = None, message: Optional[str] = None):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message)
+                WHERE id = ?
+            """, (progress, message, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        ジョブの状態を取得
+
+        Returns:
+            Dict: id, kind, label, status, progress, message, error, 経過秒数（存在しない場合はNone）
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        job = dict(row)
+        end = job['finished_at'] or time.time()
+        job['elapsed'] = end - job['started_at'] if job['started_at'] else 0.0
+        job['active'] = job['status'] in ACTIVE_STATUSES
+        return job
+
+    def list_jobs(self, owner: Optional[str] = None, active_only: bool = False, limit: int = 20) -> List[Dict]:
+        """
+        ジョブ一覧を取得（新しい順）
+
+        Args:
+            owner (str): 指定した場合はそのセッションのジョブのみ
+            active_only (bool): 実行中・待機中のみ
+            limit (int): 最大件数
+        """
+        query = "SELECT id FROM jobs WHERE 1 = 1"
+        params = []
+        if owner is not None:
+            query += " AND owner = ?"
+            params.append(owner)
+        if active_only:
+            query += " AND status IN (?, ?)"
+            params.extend(ACTIVE_STATUSES)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            ids = [row[0] for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+        return [job for job in (self.get(job_id) for job_id in ids) if job is not None]
+
+    def result(self, job_id: str) -> Any:
+        """
+        完了したジョブの結果を取得（失敗したジョブの場合は保存された例外を返す）
+
+        Returns:
+            Any: ジョブ関数の戻り値（結果ファイルが無い場合はNone）
+        """
+        path = self._result_path(job_id)
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def partial(self, job_id: str) -> Any:
+        """実行中ジョブの途中結果（未公開の場合はNone）"""
+        return self._partials.get(job_id)
+
+    def cancel(self, job_id: str):
+        """
+        ジョブのキャンセルを要求（実行中の処理は次のキャンセル確認で停止）
+
+        Args:
+            job_id (str): ジョブID
+        """
+        token = self._cancel_tokens.get(job_id)
+        if token is not None:
+            token.cancel()
+
+
+def _job_process_alive(pid: int, instance: Optional[str]) -> bool:
+    """
+    ジョブを登録したプロセスが生存しているか
+
+    自分と同じPIDでも識別子が異なる場合は、再起動前のプロセス（PIDの再利用）とみなす
+    """
+    if instance == PROCESS_TOKEN:
+        return True
+    if pid == os.getpid():
+        return False
+    return _pid_alive(pid)
+
+
+def _pid_alive(pid: int) -> bool:
+    """プロセスが生存しているか"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# グローバルジョブランナー(シングルトン)
+_job_runner_instance = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """
+    ジョブランナーのシングルトンインスタンス取得（全セッションで共有）
+
+    Returns:
+        JobRunner インスタンス
+    """
+    global _job_runner_instance
+    with _job_runner_lock:
+        if _job_runner_instance is None:
+            _job_runner_instance = JobRunner()
+    return _job_runner_instance
@@ -0,0 +1,204 @@
+"""
+バックグラウンドジョブ定義
+app.py からジョブランナーに登録する検索・レビュー収集・AI分析の処理本体
+"""
+from typing import Dict, List, Optional
+
+from .claude_analyzer import ClaudeAnalyzer
+from .deadline import Deadline
+from .history_charts import warm_chart_levels
+from .job_runner import JobContext
+from .keepa_analyzer_simple import KeepaAnalyzerSimple, apply_filters
+from .progress_reporter import CallbackProgressSink, ProgressReporter
+from .progress_tracker import ProgressTracker
+from .review_collector import ReviewCollector
+from .review_prefetcher import PrefetchBudget, get_review_prefetcher
+from .search_pipeline import SearchPipeline
+from .watchlist import WatchlistPoller
+
+# レビュー収集の持ち時間（秒）
+REVIEW_TIMEOUT_SEC = 60
+
+
+def search_job(
+    ctx: JobContext,
+    keyword: str,
+    keepa_key: str,
+    rainforest_key: Optional[str],
+    filters: Dict,
+    search_pages: int = 1,
+    search_sort_orders: Optional[List[str]] = None,
+    search_timeout: float = 120,
+    prefetch_threshold: Optional[float] = None,
+    prefetch_top_k: int = 0,
+    prefetch_credit_budget: int = 15,
+    profile: bool = False
+) -> Dict:
+    """
+    キーワード検索 → Keepa取得 → スコアリング → フィルタ → レビュー先読み
+
+    Args:
+        profile: 各ステージのプロファイルを記録する（Falseの場合は RESEARCH_PROFILE 環境変数に従う）
+
+    Returns:
+        Dict: results（フィルタ前）, filtered（フィルタ後・スコア順）, partial_reason, request_id（診断データのID）
+    """
+    # ステージごとの所要時間を記録し、過去の実績からETAを表示
+    tracker = ProgressTracker(kind='search', on_update=ctx.update)
+    tracker.start(total_steps=4, stages=['search', 'keepa', 'offers', 'filter'])
+    tracker.update("RainforestAPIでキーワード検索中...")
+
+    analyzer = KeepaAnalyzerSimple(
+        keepa_key,
+        rainforest_api_key=rainforest_key,
+        max_token_wait=180,
+        search_pages=search_pages,
+        search_sort_orders=search_sort_orders or None,
+        profile=profile or None
+    )
+    analyzer.on_token_wait = lambda sec: tracker.update(f"Keepaトークン回復待ち（約{int(sec)}秒）...", increment=0)
+
+    def on_rows(partial_df):
+        ctx.set_partial(partial_df)
+        tracker.update(
+            f"Keepa APIで商品データ取得中...（{len(partial_df)}件スコアリング済み）",
+            increment=1 if tracker.current_step < 2 else 0
+        )
+
+    # 検索中の閾値先読みと検索後の上位K件先読みで、件数・クレジットの上限を共有
+    prefetch_budget = PrefetchBudget(prefetch_top_k, prefetch_credit_budget)
+    pipeline = SearchPipeline(
+        analyzer,
+        review_collector=ReviewCollector(rainforest_key) if rainforest_key else None,
+        prefetch_threshold=prefetch_threshold,
+        prefetch_budget=prefetch_budget,
+        tracker=tracker
+    )
+    try:
+        results = pipeline.run_sync(
+            keyword,
+            filters=filters,
+            on_rows=on_rows,
+            deadline=Deadline(search_timeout, ctx.cancel_token)
+        )
+
+        tracker.current_step = 2
+        tracker.update("検索結果を整形中...")
+        with tracker.stage('filter', rows=len(results)):
+            filtered = apply_filters(results, filters)
+            if len(filtered) > 0:
+                filtered = filtered.sort_values('product_score', ascending=False).reset_index(drop=True)
+    except Exception as e:
+        tracker.error(str(e))
+        raise
+
+    # TOP5の履歴グラフを間引いておく（結果表示時に即座に描画）
+    if len(filtered) > 0:
+        warm_chart_levels(filtered['asin'].head(5).tolist())
+
+    # TOP候補のレビューをバックグラウンドで先読み（ボタン押下時はキャッシュから即時表示）
+    if len(filtered) > 0 and rainforest_key and prefetch_top_k > 0:
+        get_review_prefetcher().prefetch(
+            ReviewCollector(rainforest_key),
+            filtered['asin'].tolist(),
+            budget=prefetch_budget
+        )
+
+    tracker.complete(f"{len(filtered)}件の商品を発見しました")
+    return {
+        'results': results,
+        'filtered': filtered,
+        'partial_reason': analyzer.partial_reason,
+        'request_id': analyzer.request_id,
+    }
+
+
+def review_job(ctx: JobContext, asin: str, rainforest_key: str, target_count: int = 50,
+               profile: bool = False) -> List[Dict]:
+    """
+    1商品のレビュー収集（先読み中の場合は完了を待ってキャッシュから取得）
+
+    Args:
+        profile: 収集のプロファイルを記録する（Falseの場合は RESEARCH_PROFILE 環境変数に従う）
+
+    Returns:
+        List[Dict]: レビューデータのリスト
+    """
+    tracker = ProgressTracker(kind='reviews', on_update=ctx.update)
+    tracker.start(total_steps=2, stages=['prefetch_wait', 'collect'])
+    tracker.update("レビュー収集中...（reviewsエンドポイント使用）")
+
+    try:
+        prefetcher = get_review_prefetcher()
+        with tracker.stage('prefetch_wait', asin=asin):
+            prefetcher.wait_for(asin)  # 先読み中なら二重取得せず完了を待つ
+
+        collector = ReviewCollector(rainforest_key, profile=profile or None)
+        with tracker.stage('collect', asin=asin) as span:
+            span['attrs']['cached'] = collector.get_cached_reviews(asin, target_count) is not None
+            # 収集ステップ（後半50%）の進捗を間引いてジョブの状態へ反映
+            progress = ProgressReporter(
+                CallbackProgressSink(lambda p, m: ctx.update(0.5 + 0.5 * p if p is not None else None, m)),
+                message="レビュー収集中"
+            )
+            reviews = collector.collect_reviews(
+                asin, target_count=target_count, progress=progress,
+                deadline=Deadline(REVIEW_TIMEOUT_SEC, ctx.cancel_token)
+            )
+            span['attrs']['reviews'] = len(reviews)
+        prefetcher.record_use(asin)
+    except Exception as e:
+        tracker.error(str(e))
+        raise
+
+    tracker.complete(f"{len(reviews)}件収集しました")
+    return reviews
+
+
+def analysis_job(ctx: JobContext, claude_key: str, reviews_by_asin: Dict[str, List[Dict]],
+                 profile: bool = False) -> Dict:
+    """
+    商品ごとのAI分析と横断レポートへの統合
+
+    Args:
+        profile: 分析のプロファイルを記録する（Falseの場合は RESEARCH_PROFILE 環境変数に従う）
+
+    Returns:
+        Dict: analysis（統合レポート）, cache_hits（分析済み結果を再利用した商品数）
+    """
+    tracker = ProgressTracker(kind='analysis', on_update=ctx.update)
+    tracker.start(total_steps=2, stages=['analyze', 'merge'])
+    tracker.update(f"Claude Sonnet 4.5で{len(reviews_by_asin)}商品の低評価レビューを分析中...")
+
+    try:
+        analyzer = ClaudeAnalyzer(claude_key, profile=profile or None)
+        with tracker.stage('analyze', products=len(reviews_by_asin)) as span:
+            per_asin = analyzer.analyze_products(reviews_by_asin)
+            span['attrs']['cache_hits'] = analyzer.last_cache_hits
+
+        tracker.update("商品別の結果を統合中...")
+        with tracker.stage('merge'):
+            analysis = ClaudeAnalyzer.merge_analyses(per_asin)
+    except Exception as e:
+        tracker.error(str(e))
+        raise
+
+    tracker.complete("分析が完了しました")
+    return {
+        'analysis': analysis,
+        'cache_hits': analyzer.last_cache_hits,
+    }
+
+
+def watchlist_job(ctx: JobContext, keepa_key: str, rainforest_key: Optional[str], max_asins: int = 100) -> Dict:
+    """
+    ウォッチリストのうち取得時刻を過ぎた商品を1回分取得・再スコアリング
+
+    Returns:
+        Dict: WatchlistPoller.poll_once() の集計
+    """
+    ctx.update(0.1, "ウォッチリストの商品を取得中...")
+    poller = WatchlistPoller(keepa_key, rainforest_key=rainforest_key)
+    summary = poller.poll_once(max_asins, deadline=Deadline(None, ctx.cancel_token))
+    ctx.update(1.0, f"{summary['polled']}件を更新しました")
+    return summary
@@ -1,644 +1,1216 @@
 """
 Keepa APIを使用したシンプルな商品検索モジュール（テスト用）
 """
+import logging
+import os
+import threading
+import uuid
 import keepa
 import pandas as pd
 import numpy as np
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from .cache_manager import get_cache_manager
+from .diagnostics import compact_keepa_products, get_diagnostics
+from .fixtures import keepa_with_timeout, wrap_keepa, wrap_session
+from .leaderboard import get_leaderboard
+from .logging_config import Timer, get_logger, log_event
+from .profiling import get_profiler
+from .timeseries_store import get_timeseries_store
+from .keepa_token_scheduler import (
+    get_token_scheduler, estimate_query_cost, KeepaTokenBudgetError, PRIORITY_INTERACTIVE
+)
+from .deadline import DeadlineExceeded, OperationCancelled, ensure_deadline
+
+logger = get_logger(__name__)
+
+# 接続先（RAINFOREST_API_URL 環境変数で負荷試験用のスタブなどに切り替え可能）
+RAINFOREST_API_URL = 'https://api.rainforestapi.com/request'
+
+# 各API呼び出しの固定タイムアウト(秒)。デッドライン指定時は残り時間で打ち切る
+KEEPA_TIMEOUT = 60
+RAINFOREST_SEARCH_TIMEOUT = 30
+
+# 検索ページの同時取得数（コネクションプールのサイズも兼ねる）
+SEARCH_MAX_WORKERS = 8
+
+# RainforestAPI 検索の並び順（sort_by）
+SEARCH_SORT_ORDERS = {
+    'featured': 'おすすめ順',
+    'bestseller_rankings': '売れ筋順',
+    'average_review': 'レビュー評価順',
+    'most_recent': '新着順',
+    'price_low_to_high': '価格の安い順',
+    'price_high_to_low': '価格の高い順',
+}
+
+
+def apply_filters(results, filters):
+    """
+    詳細検索フィルタを適用（ベクトル化で高速化）
+
+    Args:
+        results (pd.DataFrame): search_products の戻り値
+        filters (dict): フィルタ条件（app.pyの詳細検索と同じキー）
+
+    Returns:
+        pd.DataFrame: 条件を満たす行のみのデータフレーム
+    """
+    if len(results) == 0:
+        return results.copy()
+
+    # 価格フィルタ
+    price_mask = (results['price'] >= filters['price'][0]) & (results['price'] <= filters['price'][1])
+
+    # 月間販売数フィルタ
+    monthly_mask = (results['monthly_sold_current'] >= filters['monthly_current'][0]) & \
+                  (results['monthly_sold_current'] <= filters['monthly_current'][1])
+
+    # 成長トレンドフィルタ
+    growth_mask = pd.Series([True] * len(results), index=results.index)
+
+    if filters['growth_3m']:
+        growth_mask &= (results['monthly_sold_3m_ago'] > 0) & \
+                      (results['monthly_sold_current'] > results['monthly_sold_3m_ago'])
+
+    if filters['growth_6m']:
+        growth_mask &= (results['monthly_sold_6m_ago'] > 0) & \
+                      (results['monthly_sold_current'] > results['monthly_sold_6m_ago'])
+
+    if filters['growth_12m']:
+        growth_mask &= (results['monthly_sold_12m_ago'] > 0) & \
+                      (results['monthly_sold_current'] > results['monthly_sold_12m_ago'])
+
+    if filters['growth_24m']:
+        growth_mask &= (results['monthly_sold_24m_ago'] > 0) & \
+                      (results['monthly_sold_current'] > results['monthly_sold_24m_ago'])
+
+    # BSRフィルタ
+    bsr_mask = ((results['current_rank'] >= filters['bsr'][0]) & \
+               (results['current_rank'] <= filters['bsr'][1])) | \
+              (results['current_rank'] == 0)
+
+    # 評価フィルタ
+    rating_mask = (results['rating'] >= filters['rating'][0]) & \
+                 (results['rating'] <= filters['rating'][1])
+
+    # レビュー数フィルタ
+    review_mask = results['review_count'] >= filters['review_min']
+
+    # 出品者数フィルタ
+    seller_mask = results['seller_count'] <= filters['seller_max']
+
+    # 全フィルタを結合
+    final_mask = price_mask & monthly_mask & growth_mask & bsr_mask & rating_mask & review_mask & seller_mask
+
+    return results[final_mask].copy()
 
 
 class KeepaAnalyzerSimple:
     """Keepa API分析クラス（超シンプル版）"""
 
-    def __init__(self, api_key, rainforest_api_key=None):
+    def __init__(self, api_key, rainforest_api_key=None, priority=PRIORITY_INTERACTIVE, max_token_wait=None,
+                 search_pages=1, search_sort_orders=None, profile=None):
         """
         初期化
 
         Args:
             api_key (str): Keepa APIキー
             rainforest_api_key (str): RainforestAPI キー（動的検索用）
+            priority (int): トークン待ちの優先度（PRIORITY_INTERACTIVE / PRIORITY_BATCH）
+            max_token_wait (float): トークン回復を待つ最大秒数（Noneは無制限）
+            search_pages (int): キーワード検索で取得するページ数（並び順ごと）
+            search_sort_orders (list): 検索の並び順（SEARCH_SORT_ORDERSのキー、Noneは既定順のみ）
+            profile (bool): 各ステージのプロファイルを記録するか（Noneは RESEARCH_PROFILE 環境変数に従う）
         """
-        self.api = keepa.Keepa(api_key, timeout=60)  # タイムアウトを60秒に延長
+        self.api = wrap_keepa(keepa.Keepa(api_key, timeout=KEEPA_TIMEOUT))  # タイムアウトを60秒に延長
         self.rainforest_api_key = rainforest_api_key
+        self.rainforest_url = os.getenv('RAINFOREST_API_URL') or RAINFOREST_API_URL
+        self.search_pages = search_pages
+        self.search_sort_orders = search_sort_orders
+        self._session = None  # RainforestAPI用セッション（遅延生成）
         self.cache = get_cache_manager()  # キャッシュマネージャー
 
-    def _search_asins_with_rainforest(self, keyword, max_results=10):
+        # トークン予算スケジューラー（セッション・プロセス間で共有）
+        self.token_scheduler = get_token_scheduler(api_key)
+        self.priority = priority
+        self.max_token_wait = max_token_wait
+        self.on_token_wait = None  # トークン待ち発生時のコールバック（推定待ち秒数を受け取る）
+
+        # 直近の検索が持ち時間切れで途中結果になった場合の理由（完全な結果の場合はNone）
+        self.partial_reason = None
+
+        # 直近の検索のリクエストID（診断データの保存単位）
+        self.request_id = None
+        self.request_label = ''
+        self.diagnostics = get_diagnostics()
+
+        # ステージごとのプロファイル（既定では無効）
+        self.profile = profile
+        self.profiler = get_profiler()
+
+        # 取得した履歴の保存先（後の分析・グラフで再取得しない）
+        self.timeseries = get_timeseries_store()
+
+        # キーワードをまたいだランキング（スコアリング結果を商品ごとに更新）
+        self.leaderboard = get_leaderboard()
+
+        # 並行するKeepaバッチ・検索ページから更新する使用量・途中結果の理由を保護
+        self._state_lock = threading.Lock()
+
+        # API使用量（バッチ実行時の集計用、更新は _add_usage() で行う）
+        self.usage = {
+            'rainforest_requests': 0,
+            'rainforest_cache_hits': 0,
+            'keepa_requests': 0,
+            'keepa_asins': 0,
+            'keepa_tokens_estimated': 0,
+        }
+
+    def _get_session(self):
+        """
+        RainforestAPI用のコネクションプール付きセッションを取得
+
+        Returns:
+            requests.Session: ページ並列取得で共有するセッション
+        """
+        if self._session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=SEARCH_MAX_WORKERS)
+            session.mount('https://', adapter)
+            self._session = wrap_session(session)
+        return self._session
+
+    def _begin_request(self, keyword=None):
+        """検索1回分の状態（途中結果の理由・リクエストID）を初期化"""
+        self.partial_reason = None
+        self.request_id = uuid.uuid4().hex[:12]
+        self.request_label = keyword or ''
+
+    def _profile_stage(self, stage, **attrs):
+        """
+        検索のステージをプロファイル（無効時は何もしない）
+
+        Args:
+            stage (str): ステージ名（'search_page', 'keepa_query', 'score', 'leaderboard', 'dataframe'）
+            **attrs: ステージの属性（件数など）
+        """
+        return self.profiler.stage(self.request_id, stage, enabled=self.profile, kind='search',
+                                   label=self.request_label, **attrs)
+
+    def record_leaderboard(self, rows, keyword=None, live_asins=None):
+        """
+        スコアリング結果をリーダーボードに反映（失敗しても検索は止めない）
+
+        オファーを取得していない行（出品者数が履歴ベースの仮の値）は、リーダーボードに
+        最近の実際の出品者数があればそれで再スコアリングしてから反映する（経路によってスコアが揺れない）
+
+        Args:
+            rows (list): _build_rows の戻り値
+            keyword (str): 検索キーワード
+            live_asins (set): 実際の出品者数で更新したASIN（_refresh_seller_counts の戻り値）
+        """
+        live_asins = live_asins or set()
+        try:
+            with self._profile_stage('leaderboard', rows=len(rows)):
+                provisional = [row['asin'] for row in rows if row['asin'] not in live_asins]
+                stored = self.leaderboard.live_seller_counts(provisional) if provisional else {}
+                rows = [
+                    self._score_metrics(dict(row, seller_count=stored[row['asin']]))
+                    if row['asin'] in stored else row
+                    for row in rows
+                ]
+                self.leaderboard.record(rows, keyword=keyword, live_asins=live_asins)
+        except Exception as e:
+            logger.warning("リーダーボードの更新に失敗: %s", e)
+
+    def _mark_partial(self, reason):
+        """途中結果になった理由を記録（最初の理由のみ保持）"""
+        with self._state_lock:
+            if self.partial_reason is not None:
+                return
+            self.partial_reason = reason
+        logger.warning("%s", reason)
+
+    def _add_usage(self, **counts):
+        """
+        API使用量を加算（並行するワーカースレッドから呼んでも取りこぼさない）
+
+        Args:
+            **counts: usage のキー → 加算する値
+        """
+        with self._state_lock:
+            for key, value in counts.items():
+                self.usage[key] += value
+
+    def _fetch_search_page(self, keyword, page, sort_by=None, deadline=None):
+        """
+        RainforestAPIの検索結果を1ページ取得（ページ単位でキャッシュ）
+
+        Args:
+            keyword (str): 検索キーワード
+            page (int): ページ番号（1始まり）
+            sort_by (str): 並び順（Noneの場合はAmazonの既定順）
+            deadline (Deadline): 検索全体の持ち時間（Noneは無制限）
+
+        Returns:
+            tuple: (ASINのリスト, キャッシュヒットしたか)。取得失敗時はASINリストがNone
+        """
+        # キャッシュチェック
+        cached = self.cache.get('rainforest_search_page', ttl_hours=1, keyword=keyword, page=page, sort_by=sort_by)
+        if cached is not None:
+            log_event(logger, logging.DEBUG, "検索ページ（キャッシュ）", endpoint='rainforest_search',
+                      keyword=keyword, page=page, sort_by=sort_by, cache_hit=True, asins=len(cached))
+            return cached, True
+
+        with self._profile_stage('search_page', page=page, sort_by=sort_by):
+            try:
+                params = {
+                    'api_key': self.rainforest_api_key,
+                    'type': 'search',
+                    'amazon_domain': 'amazon.co.jp',
+                    'search_term': keyword,
+                    'page': str(page)
+                }
+                if sort_by:
+                    params['sort_by'] = sort_by
+
+                timeout = ensure_deadline(deadline).timeout(RAINFOREST_SEARCH_TIMEOUT)
+                with Timer() as timer:
+                    response = self._get_session().get(self.rainforest_url, params=params, timeout=timeout)
+                response.raise_for_status()
+                data = response.json()
+
+                asins = [result['asin'] for result in data.get('search_results', []) if 'asin' in result]
+                log_event(logger, logging.INFO, "検索ページ取得", endpoint='rainforest_search', keyword=keyword,
+                          page=page, sort_by=sort_by, cache_hit=False, latency_ms=timer.latency_ms,
+                          status=response.status_code, asins=len(asins), credits=1)
+
+                # キャッシュに保存(TTL: 1時間)
+                self.cache.set(asins, 'rainforest_search_page', ttl_hours=1,
+                               keyword=keyword, page=page, sort_by=sort_by)
+                if self.diagnostics.enabled:
+                    self.diagnostics.capture(self.request_id, 'search_page', {
+                        'keyword': keyword, 'page': page, 'sort_by': sort_by, 'asins': asins,
+                    })
+                return asins, False
+
+            except OperationCancelled:
+                raise
+            except DeadlineExceeded:
+                self._mark_partial("持ち時間切れのため、一部の検索ページを取得できませんでした")
+                return None, False
+            except Exception as e:
+                log_event(logger, logging.ERROR, "RainforestAPI検索エラー（%sページ目, sort_by=%s）: %s",
+                          page, sort_by, e, endpoint='rainforest_search', keyword=keyword)
+                return None, False
+
+    def _search_asins_with_rainforest(self, keyword, max_results=None, pages=None, sort_orders=None, deadline=None):
         """
         RainforestAPIでキーワード検索してASINを取得（キャッシュ対応）
 
+        複数ページ・複数の並び順を並列取得し、初出順に重複を除いて結合する。
+        ページ単位でキャッシュするため、ページ数を増やした場合は追加分のみ取得される
+
         Args:
             keyword (str): 検索キーワード
-            max_results (int): 最大取得件数（デフォルト10件）
+            max_results (int): 最大取得件数（Noneの場合は全件）
+            pages (int): 並び順ごとの取得ページ数（省略時はインスタンス設定）
+            sort_orders (list): 並び順のリスト（省略時はインスタンス設定）
+            deadline (Deadline): 検索全体の持ち時間（Noneは無制限）
 
         Returns:
             list: ASINのリスト
         """
         if not self.rainforest_api_key:
-            print("[INFO] RainforestAPIキーが未設定のため、固定ASINリストを使用します")
+            logger.info("RainforestAPIキーが未設定のため、固定ASINリストを使用します")
             return None
 
-        # キャッシュチェック
-        cached = self.cache.get('rainforest_search', ttl_hours=1, keyword=keyword, max_results=max_results)
-        if cached:
-            print(f"[CACHE HIT] キャッシュから{len(cached)}件のASINを取得")
-            return cached
+        pages = pages or self.search_pages
+        sort_orders = sort_orders or self.search_sort_orders or [None]
+        tasks = [(sort_by, page) for sort_by in sort_orders for page in range(1, pages + 1)]
 
-        try:
-            print(f"[INFO] RainforestAPIで「{keyword}」を検索中...")
-            params = {
-                'api_key': self.rainforest_api_key,
-                'type': 'search',
-                'amazon_domain': 'amazon.co.jp',
-                'search_term': keyword,
-                'page': '1'
-            }
+        logger.info("RainforestAPIで「%s」を検索中...（%dページ）", keyword, len(tasks))
+        with ThreadPoolExecutor(max_workers=min(len(tasks), SEARCH_MAX_WORKERS)) as executor:
+            page_results = list(executor.map(
+                lambda task: self._fetch_search_page(keyword, task[1], task[0], deadline=deadline), tasks
+            ))
 
-            response = requests.get('https://api.rainforestapi.com/request', params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+        asins = []
+        seen = set()
+        for page_asins, from_cache in page_results:
+            if from_cache:
+                self._add_usage(rainforest_cache_hits=1)
+            elif page_asins is not None:
+                self._add_usage(rainforest_requests=1)
 
-            asins = []
-            if 'search_results' in data:
-                for result in data['search_results'][:max_results]:
-                    if 'asin' in result:
-                        asins.append(result['asin'])
+            for asin in page_asins or []:
+                if asin not in seen:
+                    seen.add(asin)
+                    asins.append(asin)
 
-            print(f"[SUCCESS] RainforestAPIから{len(asins)}件のASINを取得しました")
+        if max_results:
+            asins = asins[:max_results]
 
-            # キャッシュに保存(TTL: 1時間)
-            if len(asins) > 0:
-                self.cache.set(asins, 'rainforest_search', ttl_hours=1, keyword=keyword, max_results=max_results)
+        logger.info("RainforestAPIから%d件のASINを取得しました", len(asins))
+        return asins if len(asins) > 0 else None
 
-            return asins if len(asins) > 0 else None
+    def _fallback_asins(self, keyword):
+        """
+        RainforestAPIが使えない場合の固定ASINリスト（3件のみ）
 
-        except Exception as e:
-            print(f"[ERROR] RainforestAPI検索エラー: {e}")
-            return None
+        Args:
+            keyword (str): 検索キーワード
 
-    def search_products(self, keyword):
+        Returns:
+            list: ASINのリスト
+        """
+        keyword_to_asins = {
+            'ヨガマット': ['B01LP0VI3G', 'B01N7EQ8CK', 'B078WZ13GP'],
+            'ダンベル': ['B07WTQ2YPX', 'B0BH7KQWMY', 'B0C8RJHXKP'],
+            'フィットネスバンド': ['B0BVKX7QWM', 'B0C4NMHQXZ', 'B0BYFK3MNQ'],
+        }
+
+        for key, value in keyword_to_asins.items():
+            if key in keyword or keyword in key:
+                return value
+
+        return ['B01LP0VI3G', 'B01N7EQ8CK', 'B078WZ13GP']
+
+    def _query_keepa(self, asins, deadline=None, **params):
+        """
+        トークン予算に合わせてチャンク分割・待機しながらKeepaに問い合わせる
+
+        持ち時間を使い切った場合は、それまでに取得できたチャンク分のみ返す（partial_reasonに記録）
+
+        Args:
+            asins (list): ASINのリスト
+            deadline (Deadline): 検索全体の持ち時間（Noneは無制限）
+            **params: keepa.Keepa.query に渡すパラメータ
+
+        Returns:
+            list: Keepa商品データのリスト
+        """
+        deadline = ensure_deadline(deadline)
+        cost_per_asin = estimate_query_cost(1, offers=params.get('offers'), rating=params.get('rating', False))
+
+        def on_wait(wait_sec):
+            # トークン待ち中もキャンセルを受け付ける
+            deadline.cancel_token.raise_if_cancelled()
+            if self.on_token_wait:
+                self.on_token_wait(wait_sec)
+
+        with self._profile_stage('keepa_query', asins=len(asins), offers=params.get('offers')):
+            products = []
+            try:
+                self.token_scheduler.sync(self.api)
+
+                for chunk in self.token_scheduler.chunk_asins(asins, cost_per_asin):
+                    deadline.check()
+                    cost = cost_per_asin * len(chunk)
+
+                    # トークン待ちも持ち時間の範囲内に収める
+                    remaining = deadline.remaining()
+                    limited_by_deadline = remaining is not None and (
+                        self.max_token_wait is None or remaining < self.max_token_wait
+                    )
+                    try:
+                        self.token_scheduler.acquire(
+                            cost,
+                            priority=self.priority,
+                            max_wait=remaining if limited_by_deadline else self.max_token_wait,
+                            on_wait=on_wait
+                        )
+                    except KeepaTokenBudgetError:
+                        if limited_by_deadline:
+                            raise DeadlineExceeded("持ち時間内にKeepaトークンが回復しません")
+                        raise
+
+                    self._add_usage(keepa_requests=1, keepa_asins=len(chunk), keepa_tokens_estimated=cost)
+
+                    # 並行するバッチが共有クライアントのタイムアウトを書き換え合わないよう、呼び出しごとに複製
+                    api = keepa_with_timeout(self.api, deadline.timeout(KEEPA_TIMEOUT))
+                    try:
+                        with Timer() as timer:
+                            chunk_products = api.query(chunk, progress_bar=False, **params)
+                        products.extend(chunk_products)
+                    except Exception:
+                        # 残り時間で打ち切ったタイムアウトは途中結果として扱う
+                        deadline.check()
+                        raise
+                    self.api.tokens_left = api.tokens_left  # バッチ集計などは共有クライアントの残高を参照
+                    self.token_scheduler.observe(api)
+                    self.timeseries.append_products(chunk_products)
+                    log_event(logger, logging.INFO, "Keepa取得", endpoint='keepa_product', asins=len(chunk),
+                              offers=params.get('offers'), latency_ms=timer.latency_ms, tokens=cost,
+                              tokens_left=api.tokens_left)
+                    if self.diagnostics.enabled:
+                        self.diagnostics.capture(self.request_id, 'keepa_query', {
+                            'asins': chunk, 'params': params, 'products': compact_keepa_products(chunk_products),
+                        })
+
+            except DeadlineExceeded:
+                self._mark_partial(f"持ち時間切れのため、{len(asins)}件中{len(products)}件のみKeepaから取得しました")
+
+        return products
+
+    def search_products(self, keyword, filters=None, offers_top_k=5, deadline=None):
         """
         キーワードで商品を検索（超シンプル版）
 
+        トークン消費の大きいオファー情報は2段階で取得する
+        1. オファー無しで全ASINを取得し、仮スコアを計算
+        2. フィルタ通過後の上位offers_top_k件のみオファーを取得し、出品者数を更新して再スコアリング
+
         Args:
             keyword (str): 検索キーワード
+            filters (dict): 詳細検索フィルタ（上位候補の選定に使用、戻り値は絞り込まない）
+            offers_top_k (int): オファーを取得する上位件数（0で取得しない）
+            deadline (Deadline): 検索全体の持ち時間（超過時は途中結果を返し、partial_reasonに理由を記録）
 
         Returns:
             pd.DataFrame: 商品データフレーム
         """
+        self._begin_request(keyword)
         try:
-            # Step 1: RainforestAPIで動的にASINを検索（上位10件のみ）
-            asins = self._search_asins_with_rainforest(keyword, max_results=10)
+            # Step 1: RainforestAPIで動的にASINを検索（設定したページ数・並び順）
+            asins = self._search_asins_with_rainforest(keyword, deadline=deadline)
 
             # RainforestAPIが使えない場合は固定リストにフォールバック（3件のみ）
             if asins is None:
-                keyword_to_asins = {
-                    'ヨガマット': ['B01LP0VI3G', 'B01N7EQ8CK', 'B078WZ13GP'],
-                    'ダンベル': ['B07WTQ2YPX', 'B0BH7KQWMY', 'B0C8RJHXKP'],
-                    'フィットネスバンド': ['B0BVKX7QWM', 'B0C4NMHQXZ', 'B0BYFK3MNQ'],
-                }
+                asins = self._fallback_asins(keyword)
 
-                for key, value in keyword_to_asins.items():
-                    if key in keyword or keyword in key:
-                        asins = value
-                        break
-
-                if asins is None:
-                    asins = ['B01LP0VI3G', 'B01N7EQ8CK', 'B078WZ13GP']
+            logger.info("検索ASIN: %s... (合計%d件)", asins[:10], len(asins))
 
-            print(f"検索ASIN: {asins[:10]}... (合計{len(asins)}件)")
-
-            # Keepa APIでデータ取得
-            products = self.api.query(
+            # Phase 1: Keepa APIでデータ取得（オファー無し、トークン予算に合わせて待機・分割）
+            products = self._query_keepa(
                 asins,
+                deadline=deadline,
                 domain='JP',
                 stats=90,      # 過去90日の統計情報
-                rating=True,   # レビュー情報を含める
-                offers=20      # オファー情報を含める
+                rating=True    # レビュー情報を含める
             )
 
-            # デバッグ: 取得した商品数とデータ構造をファイルに書き出し
-            with open('keepa_debug.txt', 'w', encoding='utf-8') as f:
-                f.write(f"取得した商品数: {len(products)}\n\n")
-                for idx, product in enumerate(products):
-                    f.write(f"\n{'='*50}\n")
-                    f.write(f"商品 {idx+1}: {product.get('asin', 'N/A')}\n")
-                    f.write(f"{'='*50}\n")
-                    f.write(f"利用可能なキー: {list(product.keys())}\n\n")
-
-                    # 主要なフィールドの値を確認
-                    f.write(f"title: {product.get('title')}\n")
-                    f.write(f"reviewCount: {product.get('reviewCount')}\n")
-                    f.write(f"rating: {product.get('rating')}\n")
-
-                    if 'data' in product:
-                        f.write(f"\ndata内のキー: {list(product['data'].keys())}\n")
-
-                        # NEW価格データ
-                        if 'NEW' in product['data']:
-                            new_data = product['data']['NEW']
-                            f.write(f"\nNEW価格データの型: {type(new_data)}\n")
-                            if isinstance(new_data, (list, np.ndarray)):
-                                f.write(f"NEW価格データの長さ: {len(new_data)}\n")
-                                f.write(f"NEW価格データの最初の10要素: {list(new_data[:10]) if len(new_data) > 0 else []}\n")
-                                # 最後の10要素も確認
-                                f.write(f"NEW価格データの最後の10要素: {list(new_data[-10:]) if len(new_data) >= 10 else list(new_data)}\n")
-
-                        # RATINGデータ
-                        if 'RATING' in product['data']:
-                            rating_data = product['data']['RATING']
-                            f.write(f"\nRATING評価データの型: {type(rating_data)}\n")
-                            if isinstance(rating_data, (list, np.ndarray)):
-                                f.write(f"RATING評価データの長さ: {len(rating_data)}\n")
-                                f.write(f"RATING評価データの最後の10要素: {list(rating_data[-10:]) if len(rating_data) >= 10 else list(rating_data)}\n")
-
-                        # COUNT_REVIEWSデータ
-                        if 'COUNT_REVIEWS' in product['data']:
-                            review_data = product['data']['COUNT_REVIEWS']
-                            f.write(f"\nCOUNT_REVIEWSデータの型: {type(review_data)}\n")
-                            if isinstance(review_data, (list, np.ndarray)):
-                                f.write(f"COUNT_REVIEWSデータの長さ: {len(review_data)}\n")
-                                f.write(f"COUNT_REVIEWSデータの最後の10要素: {list(review_data[-10:]) if len(review_data) >= 10 else list(review_data)}\n")
-
-            results = []
+            results = self._build_rows(products)
 
-            for product in products:
-                try:
-                    # 基本情報のみ取得
-                    asin = product.get('asin', 'N/A')
-                    title = product.get('title', 'N/A')
+            # Phase 2: 上位候補のみオファー情報を取得して出品者数を更新
+            live_asins = set()
+            if offers_top_k and len(results) > 0:
+                live_asins = self._refresh_seller_counts(results, filters, offers_top_k, deadline=deadline)
 
-                    # データが存在しない商品をスキップ
-                    if not title or title == 'N/A' or title is None:
-                        print(f"[SKIP] {asin}: タイトルなし（Keepaにデータが存在しない可能性）")
-                        continue
+            self.record_leaderboard(results, keyword, live_asins=live_asins)
 
-                    # dataフィールドが空の商品もスキップ
-                    if 'data' not in product or not product['data']:
-                        print(f"[SKIP] {asin}: dataフィールドが空")
-                        continue
+            with self._profile_stage('dataframe', rows=len(results)):
+                df = pd.DataFrame(results)
 
-                    # 価格取得（シンプル版）
-                    price = 0
-                    lowest_price = 0
-                    try:
-                        if 'NEW' in product.get('data', {}):
-                            new_prices = product['data']['NEW']
-                            if isinstance(new_prices, np.ndarray):
-                                new_prices = new_prices.tolist()
-
-                            valid_prices = []
-                            # 最後の有効な価格を取得（nanをスキップ）
-                            # Keepa APIは価格を100で割った値で返すため、100倍して円に変換
-                            for p in reversed(new_prices):
-                                if isinstance(p, (int, float)) and not np.isnan(p) and p > 0:
-                                    price = int(p * 100)  # 円に変換（例: 24.03 → 2403円）
-                                    break
-
-                            # 過去最安単価を取得（全価格データから最小値）
-                            for p in new_prices:
-                                if isinstance(p, (int, float)) and not np.isnan(p) and p > 0:
-                                    valid_prices.append(int(p * 100))
-
-                            if len(valid_prices) > 0:
-                                lowest_price = min(valid_prices)
-                    except:
-                        price = 0
-                        lowest_price = 0
-
-                    # レビュー数（dataから取得）
-                    review_count = 0
-                    try:
-                        if 'COUNT_REVIEWS' in product.get('data', {}):
-                            review_data = product['data']['COUNT_REVIEWS']
-                            if isinstance(review_data, np.ndarray) and len(review_data) > 0:
-                                # 最後の有効な値を取得
-                                for r in reversed(review_data.tolist()):
-                                    if isinstance(r, (int, float)) and not np.isnan(r) and r > 0:
-                                        review_count = int(r)
-                                        break
-                    except:
-                        review_count = 0
-
-                    # 評価（dataから取得）
-                    rating = 0
-                    try:
-                        if 'RATING' in product.get('data', {}):
-                            rating_data = product['data']['RATING']
-                            if isinstance(rating_data, np.ndarray) and len(rating_data) > 0:
-                                # 最後の有効な値を取得
-                                # stats=90を使用すると既に正しいスケール（4.2など）で返される
-                                for r in reversed(rating_data.tolist()):
-                                    if isinstance(r, (int, float)) and not np.isnan(r) and r > 0:
-                                        rating = r  # そのまま使用
-                                        break
-                    except:
-                        rating = 0
-
-                    # BSRランキング（最新のみ）
-                    current_rank = 0
-                    try:
-                        if 'SALES' in product.get('data', {}):
-                            sales = product['data']['SALES']
-                            if isinstance(sales, np.ndarray) and len(sales) > 0:
-                                sales_list = sales.tolist()
-                                # 最後の有効なランキング
-                                for s in reversed(sales_list):
-                                    if isinstance(s, (int, float)) and s > 0:
-                                        current_rank = int(s)
-                                        break
-                    except:
-                        current_rank = 0
-
-                    # 新品出品者数（競合分析用）
-                    seller_count = 0
-                    try:
-                        if 'COUNT_NEW' in product.get('data', {}):
-                            count_new_data = product['data']['COUNT_NEW']
-                            if isinstance(count_new_data, np.ndarray) and len(count_new_data) > 0:
-                                # 最後の有効な値を取得（-1はデータなしを意味する）
-                                for c in reversed(count_new_data.tolist()):
-                                    if isinstance(c, (int, float)) and c > 0:
-                                        seller_count = int(c)
-                                        break
-                    except:
-                        seller_count = 0
-
-                    # 月間販売数トレンド計算
-                    monthly_sold_current = 0
-                    monthly_sold_3m_ago = 0
-                    monthly_sold_6m_ago = 0
-                    monthly_sold_12m_ago = 0
-                    monthly_sold_24m_ago = 0
-                    sales_growth_rate = 0
+                # 商品選定スコアでソート（降順）
+                if len(df) > 0 and 'product_score' in df.columns:
+                    df = df.sort_values('product_score', ascending=False).reset_index(drop=True)
+            if len(df) > 0 and 'product_score' in df.columns:
+                logger.info("取得完了: %d件（商品選定スコア順にソート済み）", len(df))
+            else:
+                logger.info("取得完了: %d件", len(df))
 
-                    try:
-                        # 現在の月間販売数
-                        monthly_sold_current = product.get('monthlySold', 0)
-
-                        # 履歴データから過去の販売数を取得
-                        if 'monthlySoldHistory' in product and product['monthlySoldHistory']:
-                            history = product['monthlySoldHistory']
-
-                            # 偶数インデックス：タイムスタンプ、奇数インデックス：販売数
-                            # 最新から遡って3ヶ月前、6ヶ月前、12ヶ月前、2年前のデータを探す
-                            if len(history) >= 2:
-                                # 現在のタイムスタンプ（最新）
-                                current_time = history[-2] if len(history) >= 2 else 0
-
-                                # 3ヶ月 = 約90日 = 90 * 24 * 60 = 129600分
-                                # 6ヶ月 = 約180日 = 180 * 24 * 60 = 259200分
-                                # 12ヶ月 = 約365日 = 365 * 24 * 60 = 525600分
-                                # 24ヶ月 = 約730日 = 730 * 24 * 60 = 1051200分
-                                target_3m = current_time - 129600
-                                target_6m = current_time - 259200
-                                target_12m = current_time - 525600
-                                target_24m = current_time - 1051200
-
-                                # 3ヶ月前の販売数を探す
-                                for i in range(len(history) - 2, 0, -2):
-                                    timestamp = history[i]
-                                    sales = history[i + 1]
-                                    if timestamp <= target_3m:
-                                        monthly_sold_3m_ago = sales
-                                        break
-
-                                # 6ヶ月前の販売数を探す
-                                for i in range(len(history) - 2, 0, -2):
-                                    timestamp = history[i]
-                                    sales = history[i + 1]
-                                    if timestamp <= target_6m:
-                                        monthly_sold_6m_ago = sales
-                                        break
-
-                                # 12ヶ月前の販売数を探す
-                                for i in range(len(history) - 2, 0, -2):
-                                    timestamp = history[i]
-                                    sales = history[i + 1]
-                                    if timestamp <= target_12m:
-                                        monthly_sold_12m_ago = sales
-                                        break
-
-                                # 24ヶ月前（2年前）の販売数を探す
-                                for i in range(len(history) - 2, 0, -2):
-                                    timestamp = history[i]
-                                    sales = history[i + 1]
-                                    if timestamp <= target_24m:
-                                        monthly_sold_24m_ago = sales
-                                        break
-
-                        # 販売数成長率を計算（6ヶ月前→現在）
-                        if monthly_sold_6m_ago > 0 and monthly_sold_current > 0:
-                            sales_growth_rate = ((monthly_sold_current - monthly_sold_6m_ago) / monthly_sold_6m_ago) * 100
-                        elif monthly_sold_12m_ago > 0 and monthly_sold_current > 0:
-                            # 6ヶ月前のデータがない場合は12ヶ月前で計算
-                            sales_growth_rate = ((monthly_sold_current - monthly_sold_12m_ago) / monthly_sold_12m_ago) * 100
-                    except Exception as e:
-                        print(f"[WARNING] 月間販売数の計算エラー: {e}")
-                        sales_growth_rate = 0
-
-                    # ========================================
-                    # 収益性スコア計算（35点）NEW!
-                    # ========================================
-                    profitability_score = 0
-                    profit_margin = 0
-                    roi = 0
-                    net_profit = 0
-
-                    if price > 0:
-                        # コスト推定（簡易版）
-                        product_cost = price * 0.60  # 原価60%
-                        shipping_cost = price * 0.15  # 配送費15%
-                        amazon_fee = price * 0.15  # Amazon手数料15%
-                        fba_fee = 350  # FBA手数料（平均）
-
-                        # 純利益計算
-                        net_profit = price - product_cost - shipping_cost - amazon_fee - fba_fee
-
-                        # 利益率(%)
-                        profit_margin = (net_profit / price) * 100 if price > 0 else 0
-
-                        # ROI(%) = 純利益 / (原価+配送費)
-                        investment = product_cost + shipping_cost
-                        roi = (net_profit / investment) * 100 if investment > 0 else 0
-
-                        # 利益率スコア（20点）
-                        if profit_margin >= 30:
-                            profit_score = 20
-                        elif profit_margin >= 25:
-                            profit_score = 17
-                        elif profit_margin >= 20:
-                            profit_score = 14
-                        elif profit_margin >= 15:
-                            profit_score = 10
-                        elif profit_margin >= 10:
-                            profit_score = 5
-                        else:
-                            profit_score = 0  # 10%未満は推奨しない
-
-                        # ROIスコア（15点）
-                        if roi >= 100:
-                            roi_score = 15
-                        elif roi >= 75:
-                            roi_score = 12
-                        elif roi >= 50:
-                            roi_score = 9
-                        elif roi >= 30:
-                            roi_score = 6
-                        elif roi >= 15:
-                            roi_score = 3
-                        else:
-                            roi_score = 0
-
-                        profitability_score = profit_score + roi_score
-
-                    # ========================================
-                    # 市場魅力度スコア計算（25点）IMPROVED!
-                    # ========================================
-                    market_score = 0
-                    monthly_market_size = monthly_sold_current * price
-
-                    # 月間市場規模（金額ベース）
-                    if monthly_market_size >= 30000000:  # ¥30M/月
-                        market_score = 25
-                    elif monthly_market_size >= 20000000:  # ¥20M/月
-                        market_score = 22
-                    elif monthly_market_size >= 10000000:  # ¥10M/月
-                        market_score = 18
-                    elif monthly_market_size >= 5000000:  # ¥5M/月
-                        market_score = 14
-                    elif monthly_market_size >= 2000000:  # ¥2M/月
-                        market_score = 10
-                    elif monthly_market_size >= 500000:  # ¥500K/月
-                        market_score = 6
-                    else:
-                        market_score = 2
-
-                    # 価格帯調整（¥2,000-7,000が最適）
-                    if 2000 <= price <= 7000:
-                        pass  # 調整なし
-                    elif 1000 <= price < 2000 or 7000 < price <= 15000:
-                        market_score = int(market_score * 0.9)  # 10%減点
-                    else:
-                        market_score = int(market_score * 0.7)  # 30%減点
-
-                    market_score = min(market_score, 25)
-
-                    # ========================================
-                    # 競合難易度スコア計算（20点）IMPROVED!
-                    # ========================================
-                    competition_score = 0
-
-                    # 出品者数スコア（10点）
-                    if 0 < seller_count <= 3:
-                        seller_score = 10
-                    elif 4 <= seller_count <= 10:
-                        seller_score = 8
-                    elif 11 <= seller_count <= 30:
-                        seller_score = 6
-                    elif 31 <= seller_count <= 50:
-                        seller_score = 4
-                    elif 51 <= seller_count <= 100:
-                        seller_score = 2
-                    elif seller_count > 100:
-                        seller_score = 1
-                    else:
-                        seller_score = 5  # データなし
-
-                    # レビュー数スコア（10点）- トップ商品のレビュー数
-                    if 0 < review_count < 100:
-                        review_score = 10  # 少ない=参入しやすい
-                    elif 100 <= review_count < 500:
-                        review_score = 8
-                    elif 500 <= review_count < 1000:
-                        review_score = 6
-                    elif 1000 <= review_count < 3000:
-                        review_score = 4
-                    elif review_count >= 3000:
-                        review_score = 2  # 非常に多い=参入困難
-                    else:
-                        review_score = 5  # データなし
-
-                    competition_score = seller_score + review_score
-
-                    # ========================================
-                    # 成長スコア計算（20点）IMPROVED!
-                    # ========================================
-                    growth_score = 0
-
-                    # 短期成長（直近6ヶ月、10点）
-                    if monthly_sold_6m_ago > 0 and monthly_sold_current > 0:
-                        short_term_growth = ((monthly_sold_current - monthly_sold_6m_ago) / monthly_sold_6m_ago) * 100
-
-                        if short_term_growth > 100:
-                            short_score = 10
-                        elif short_term_growth > 50:
-                            short_score = 8
-                        elif short_term_growth > 20:
-                            short_score = 6
-                        elif short_term_growth > 0:
-                            short_score = 4
-                        else:
-                            short_score = 2
-
-                        growth_score += short_score
-
-                    # 長期成長（過去24ヶ月→現在、10点）
-                    if monthly_sold_24m_ago > 0 and monthly_sold_current > 0:
-                        long_term_growth = ((monthly_sold_current - monthly_sold_24m_ago) / monthly_sold_24m_ago) * 100
-
-                        if long_term_growth > 200:
-                            long_score = 10
-                        elif long_term_growth > 100:
-                            long_score = 8
-                        elif long_term_growth > 50:
-                            long_score = 6
-                        elif long_term_growth > 20:
-                            long_score = 4
-                        elif long_term_growth > 0:
-                            long_score = 2
-                        else:
-                            long_score = 0
-
-                        growth_score += long_score
-                    elif monthly_sold_12m_ago > 0 and monthly_sold_current > 0:
-                        # 24ヶ月データがない場合は12ヶ月で代用
-                        mid_term_growth = ((monthly_sold_current - monthly_sold_12m_ago) / monthly_sold_12m_ago) * 100
-
-                        if mid_term_growth > 100:
-                            mid_score = 10
-                        elif mid_term_growth > 50:
-                            mid_score = 7
-                        elif mid_term_growth > 20:
-                            mid_score = 5
-                        elif mid_term_growth > 0:
-                            mid_score = 3
-                        else:
-                            mid_score = 0
-
-                        growth_score += mid_score
-
-                    # ========================================
-                    # 総合スコア計算（100点満点）
-                    # ========================================
-                    product_score = profitability_score + market_score + competition_score + growth_score
-
-                    # ========================================
-                    # 旧スコアリングも保持（比較用）
-                    # ========================================
-                    # 1. 販売トレンドスコア（40点）- 旧版
-                    if sales_growth_rate > 100:
-                        trend_score_old = 40
-                    elif sales_growth_rate > 50:
-                        trend_score_old = 30
-                    elif sales_growth_rate > 20:
-                        trend_score_old = 20
-                    elif sales_growth_rate > 0:
-                        trend_score_old = 10
-                    else:
-                        trend_score_old = 0
-
-                    # 2. 市場規模スコア（30点）- 月間販売数（旧版）
-                    if monthly_sold_current >= 5000:
-                        market_score_old = 30
-                    elif monthly_sold_current >= 3000:
-                        market_score_old = 25
-                    elif monthly_sold_current >= 1000:
-                        market_score_old = 20
-                    elif monthly_sold_current >= 500:
-                        market_score_old = 15
-                    elif monthly_sold_current >= 100:
-                        market_score_old = 10
-                    else:
-                        market_score_old = 5
-
-                    # 3. 改善余地スコア（20点）- 評価が低いほど改善余地あり（旧版）
-                    if 0 < rating < 3.5:
-                        improvement_score = 20
-                    elif 3.5 <= rating < 4.0:
-                        improvement_score = 15
-                    elif 4.0 <= rating < 4.3:
-                        improvement_score = 10
-                    elif 4.3 <= rating < 4.5:
-                        improvement_score = 5
-                    else:
-                        improvement_score = 0
-
-                    # 4. 参入難易度スコア（10点）- 新品出品者数（競合の少なさ）（旧版）
-                    if 0 < seller_count <= 3:  # 1-3社: ブルーオーシャン
-                        entry_score_old = 10
-                    elif 4 <= seller_count <= 10:  # 4-10社: 競合少なめ
-                        entry_score_old = 7
-                    elif 11 <= seller_count <= 30:  # 11-30社: 普通
-                        entry_score_old = 5
-                    elif 31 <= seller_count <= 50:  # 31-50社: 競合多め
-                        entry_score_old = 3
-                    elif seller_count > 50:  # 51社以上: レッドオーシャン
-                        entry_score_old = 1
-                    else:  # データなし
-                        entry_score_old = 5  # 中間値
-
-                    product_score_old = trend_score_old + market_score_old + improvement_score + entry_score_old
-
-                    results.append({
-                        # 基本情報
-                        'asin': asin,
-                        'title': title,
-                        'price': price,
-                        'lowest_price': lowest_price,
-                        'review_count': review_count,
-                        'rating': rating,
-                        'current_rank': current_rank,
-                        'seller_count': seller_count,
-
-                        # 販売データ
-                        'monthly_sold_current': monthly_sold_current,
-                        'monthly_sold_3m_ago': monthly_sold_3m_ago,
-                        'monthly_sold_6m_ago': monthly_sold_6m_ago,
-                        'monthly_sold_12m_ago': monthly_sold_12m_ago,
-                        'monthly_sold_24m_ago': monthly_sold_24m_ago,
-                        'sales_growth_rate': sales_growth_rate,
-
-                        # 新スコアリング（v2.0）
-                        'product_score': product_score,  # 総合スコア（100点）
-                        'profitability_score': profitability_score,  # 収益性（35点）
-                        'market_score': market_score,  # 市場魅力度（25点）
-                        'competition_score': competition_score,  # 競合難易度（20点）
-                        'growth_score': growth_score,  # 成長スコア（20点）
-
-                        # 収益性の詳細
-                        'profit_margin': profit_margin,  # 利益率(%)
-                        'roi': roi,  # ROI(%)
-                        'net_profit': net_profit,  # 純利益(円)
-                        'monthly_market_size': monthly_market_size,  # 月間市場規模(円)
-
-                        # 旧スコアリング（v1.0 比較用）
-                        'product_score_old': product_score_old,
-                        'trend_score': trend_score_old,
-                        'market_score_old': market_score_old,
-                        'improvement_score': improvement_score,
-                        'entry_score': entry_score_old,
-                    })
+            return df
 
-                    print(f"[OK] {asin}: {title[:30]}... 価格: {price}円")
+        except (KeepaTokenBudgetError, OperationCancelled):
+            raise
+        except Exception as e:
+            logger.exception("Keepa検索エラー: %s", e)
+            raise Exception(f"Keepa検索エラー: {str(e)}")
 
-                except Exception as e:
-                    print(f"[ERROR] 商品処理エラー: {e}")
-                    continue
+    def search_products_multi(self, keywords, filters=None, offers_top_k=5, deadline=None, known_rows=None):
+        """
+        複数キーワードで商品を検索し、キーワード間で重複するASINは1回だけ取得・スコアリングする
 
-            df = pd.DataFrame(results)
+        1. 全キーワードを検索してASINの和集合を作る
+        2. 和集合（known_rows にある商品を除く）をまとめてKeepaから取得・スコアリング
+        3. キーワードごとの上位offers_top_k件の和集合のみオファーを取得し、出品者数を更新
 
-            # 商品選定スコアでソート（降順）
-            if len(df) > 0 and 'product_score' in df.columns:
-                df = df.sort_values('product_score', ascending=False).reset_index(drop=True)
-                print(f"\n取得完了: {len(df)}件（商品選定スコア順にソート済み）")
-            else:
-                print(f"\n取得完了: {len(df)}件")
+        Args:
+            keywords (list): 検索キーワードのリスト
+            filters (dict): 詳細検索フィルタ（上位候補の選定に使用、戻り値は絞り込まない）
+            offers_top_k (int): キーワードごとにオファーを取得する上位件数（0で取得しない）
+            deadline (Deadline): 検索全体の持ち時間（超過時は途中結果を返し、partial_reasonに理由を記録）
+            known_rows (Mapping): 取得済みの行（ASIN → 行、get()で参照）。含まれる商品はKeepaから取得せず、
+                オファーも再取得しない（バッチ実行で先に処理したキーワードの結果を共有する用途）
 
-            return df
+        Returns:
+            tuple: (キーワード → ASINのリスト（商品選定スコア順、行のある商品のみ）,
+                    重複を除いた商品データフレーム（商品選定スコア順）)
+        """
+        keywords = list(dict.fromkeys(keywords))
+        self._begin_request(' / '.join(keywords))
+        deadline = ensure_deadline(deadline)
+        known_rows = known_rows if known_rows is not None else {}
+        try:
+            # Step 1: キーワードごとに検索し、初出順にASINの和集合を作る
+            keyword_asins = {}
+            for keyword in keywords:
+                asins = self._search_asins_with_rainforest(keyword, deadline=deadline)
+                if asins is None:
+                    asins = self._fallback_asins(keyword)
+                keyword_asins[keyword] = asins
+
+            rows = {}
+            for asins in keyword_asins.values():
+                for asin in asins:
+                    if asin not in rows:
+                        rows[asin] = known_rows.get(asin)
+            fetch = [asin for asin, row in rows.items() if row is None]
+            pairs = sum(len(asins) for asins in keyword_asins.values())
+            logger.info("%dキーワードで%d件（重複除外後%d件、取得済み%d件）", len(keywords), pairs, len(rows),
+                        len(rows) - len(fetch))
+
+            # Phase 1: 未取得の商品のみKeepaから取得（オファー無し）
+            products = self._query_keepa(
+                fetch,
+                deadline=deadline,
+                domain='JP',
+                stats=90,      # 過去90日の統計情報
+                rating=True    # レビュー情報を含める
+            ) if fetch else []
+            fetched = self._build_rows(products)
+            for row in fetched:
+                rows[row['asin']] = row
+
+            # Phase 2: キーワードごとの上位候補（今回取得した商品のみ）のオファーをまとめて取得
+            live_asins = set()
+            if offers_top_k and fetched:
+                fetched_asins = {row['asin'] for row in fetched}
+                shortlist = []
+                for asins in keyword_asins.values():
+                    keyword_rows = [rows[asin] for asin in asins if asin in fetched_asins]
+                    shortlist.extend(self._offer_shortlist(keyword_rows, filters, offers_top_k))
+                live_asins = self._refresh_seller_counts(fetched, filters, offers_top_k, deadline=deadline,
+                                                         shortlist=list(dict.fromkeys(shortlist)))
+                for row in fetched:
+                    rows[row['asin']] = row
+
+            with self._profile_stage('dataframe', rows=len(rows)):
+                df = pd.DataFrame([row for row in rows.values() if row is not None])
+                if len(df) > 0 and 'product_score' in df.columns:
+                    df = df.sort_values('product_score', ascending=False).reset_index(drop=True)
+            order = {asin: i for i, asin in enumerate(df['asin'])} if len(df) > 0 else {}
+            keyword_asins = {
+                keyword: sorted((asin for asin in asins if asin in order), key=order.get)
+                for keyword, asins in keyword_asins.items()
+            }
+
+            for keyword, asins in keyword_asins.items():
+                self.record_leaderboard([rows[asin] for asin in asins], keyword, live_asins=live_asins)
 
+            logger.info("取得完了: %dキーワード / %d件（商品選定スコア順にソート済み）", len(keywords), len(df))
+            return keyword_asins, df
+
+        except (KeepaTokenBudgetError, OperationCancelled):
+            raise
         except Exception as e:
-            print(f"Keepa検索エラー: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Keepa検索エラー: %s", e)
             raise Exception(f"Keepa検索エラー: {str(e)}")
+
+    def _extract_metrics(self, product):
+        """
+        Keepa商品データから基本情報・販売データを抽出
+
+        Args:
+            product (dict): Keepa商品データ
+
+        Returns:
+            dict: 指標の辞書（データが存在しない商品はNone）
+        """
+        # 基本情報のみ取得
+        asin = product.get('asin', 'N/A')
+        title = product.get('title', 'N/A')
+
+        # データが存在しない商品をスキップ
+        if not title or title == 'N/A' or title is None:
+            logger.debug("スキップ %s: タイトルなし（Keepaにデータが存在しない可能性）", asin)
+            return None
+
+        # dataフィールドが空の商品もスキップ
+        if 'data' not in product or not product['data']:
+            logger.debug("スキップ %s: dataフィールドが空", asin)
+            return None
+
+        # 価格取得（シンプル版）
+        price = 0
+        lowest_price = 0
+        try:
+            if 'NEW' in product.get('data', {}):
+                new_prices = product['data']['NEW']
+                if isinstance(new_prices, np.ndarray):
+                    new_prices = new_prices.tolist()
+
+                valid_prices = []
+                # 最後の有効な価格を取得（nanをスキップ）
+                # Keepa APIは価格を100で割った値で返すため、100倍して円に変換
+                for p in reversed(new_prices):
+                    if isinstance(p, (int, float)) and not np.isnan(p) and p > 0:
+                        price = int(p * 100)  # 円に変換（例: 24.03 → 2403円）
+                        break
+
+                # 過去最安単価を取得（全価格データから最小値）
+                for p in new_prices:
+                    if isinstance(p, (int, float)) and not np.isnan(p) and p > 0:
+                        valid_prices.append(int(p * 100))
+
+                if len(valid_prices) > 0:
+                    lowest_price = min(valid_prices)
+        except:
+            price = 0
+            lowest_price = 0
+
+        # レビュー数（dataから取得）
+        review_count = 0
+        try:
+            if 'COUNT_REVIEWS' in product.get('data', {}):
+                review_data = product['data']['COUNT_REVIEWS']
+                if isinstance(review_data, np.ndarray) and len(review_data) > 0:
+                    # 最後の有効な値を取得
+                    for r in reversed(review_data.tolist()):
+                        if isinstance(r, (int, float)) and not np.isnan(r) and r > 0:
+                            review_count = int(r)
+                            break
+        except:
+            review_count = 0
+
+        # 評価（dataから取得）
+        rating = 0
+        try:
+            if 'RATING' in product.get('data', {}):
+                rating_data = product['data']['RATING']
+                if isinstance(rating_data, np.ndarray) and len(rating_data) > 0:
+                    # 最後の有効な値を取得
+                    # stats=90を使用すると既に正しいスケール（4.2など）で返される
+                    for r in reversed(rating_data.tolist()):
+                        if isinstance(r, (int, float)) and not np.isnan(r) and r > 0:
+                            rating = r  # そのまま使用
+                            break
+        except:
+            rating = 0
+
+        # BSRランキング（最新のみ）
+        current_rank = 0
+        try:
+            if 'SALES' in product.get('data', {}):
+                sales = product['data']['SALES']
+                if isinstance(sales, np.ndarray) and len(sales) > 0:
+                    sales_list = sales.tolist()
+                    # 最後の有効なランキング
+                    for s in reversed(sales_list):
+                        if isinstance(s, (int, float)) and s > 0:
+                            current_rank = int(s)
+                            break
+        except:
+            current_rank = 0
+
+        # 新品出品者数（競合分析用）
+        seller_count = 0
+        try:
+            if 'COUNT_NEW' in product.get('data', {}):
+                count_new_data = product['data']['COUNT_NEW']
+                if isinstance(count_new_data, np.ndarray) and len(count_new_data) > 0:
+                    # 最後の有効な値を取得（-1はデータなしを意味する）
+                    for c in reversed(count_new_data.tolist()):
+                        if isinstance(c, (int, float)) and c > 0:
+                            seller_count = int(c)
+                            break
+        except:
+            seller_count = 0
+
+        # 月間販売数トレンド計算
+        monthly_sold_current = 0
+        monthly_sold_3m_ago = 0
+        monthly_sold_6m_ago = 0
+        monthly_sold_12m_ago = 0
+        monthly_sold_24m_ago = 0
+        sales_growth_rate = 0
+
+        try:
+            # 現在の月間販売数
+            monthly_sold_current = product.get('monthlySold', 0)
+
+            # 履歴データから過去の販売数を取得
+            if 'monthlySoldHistory' in product and product['monthlySoldHistory']:
+                history = product['monthlySoldHistory']
+
+                # 偶数インデックス：タイムスタンプ、奇数インデックス：販売数
+                # 最新から遡って3ヶ月前、6ヶ月前、12ヶ月前、2年前のデータを探す
+                if len(history) >= 2:
+                    # 現在のタイムスタンプ（最新）
+                    current_time = history[-2] if len(history) >= 2 else 0
+
+                    # 3ヶ月 = 約90日 = 90 * 24 * 60 = 129600分
+                    # 6ヶ月 = 約180日 = 180 * 24 * 60 = 259200分
+                    # 12ヶ月 = 約365日 = 365 * 24 * 60 = 525600分
+                    # 24ヶ月 = 約730日 = 730 * 24 * 60 = 1051200分
+                    target_3m = current_time - 129600
+                    target_6m = current_time - 259200
+                    target_12m = current_time - 525600
+                    target_24m = current_time - 1051200
+
+                    # 3ヶ月前の販売数を探す
+                    for i in range(len(history) - 2, 0, -2):
+                        timestamp = history[i]
+                        sales = history[i + 1]
+                        if timestamp <= target_3m:
+                            monthly_sold_3m_ago = sales
+                            break
+
+                    # 6ヶ月前の販売数を探す
+                    for i in range(len(history) - 2, 0, -2):
+                        timestamp = history[i]
+                        sales = history[i + 1]
+                        if timestamp <= target_6m:
+                            monthly_sold_6m_ago = sales
+                            break
+
+                    # 12ヶ月前の販売数を探す
+                    for i in range(len(history) - 2, 0, -2):
+                        timestamp = history[i]
+                        sales = history[i + 1]
+                        if timestamp <= target_12m:
+                            monthly_sold_12m_ago = sales
+                            break
+
+                    # 24ヶ月前（2年前）の販売数を探す
+                    for i in range(len(history) - 2, 0, -2):
+                        timestamp = history[i]
+                        sales = history[i + 1]
+                        if timestamp <= target_24m:
+                            monthly_sold_24m_ago = sales
+                            break
+
+            # 販売数成長率を計算（6ヶ月前→現在）
+            if monthly_sold_6m_ago > 0 and monthly_sold_current > 0:
+                sales_growth_rate = ((monthly_sold_current - monthly_sold_6m_ago) / monthly_sold_6m_ago) * 100
+            elif monthly_sold_12m_ago > 0 and monthly_sold_current > 0:
+                # 6ヶ月前のデータがない場合は12ヶ月前で計算
+                sales_growth_rate = ((monthly_sold_current - monthly_sold_12m_ago) / monthly_sold_12m_ago) * 100
+        except Exception as e:
+            logger.warning("月間販売数の計算エラー: %s", e)
+
+        # ルートカテゴリ名（カテゴリ別のランキング用）
+        category_tree = product.get('categoryTree') or []
+        category = category_tree[0].get('name', '') if category_tree else ''
+
+        return {
+            # 基本情報
+            'asin': asin,
+            'title': title,
+            'category': category,
+            'price': price,
+            'lowest_price': lowest_price,
+            'review_count': review_count,
+            'rating': rating,
+            'current_rank': current_rank,
+            'seller_count': seller_count,
+
+            # 販売データ
+            'monthly_sold_current': monthly_sold_current,
+            'monthly_sold_3m_ago': monthly_sold_3m_ago,
+            'monthly_sold_6m_ago': monthly_sold_6m_ago,
+            'monthly_sold_12m_ago': monthly_sold_12m_ago,
+            'monthly_sold_24m_ago': monthly_sold_24m_ago,
+            'sales_growth_rate': sales_growth_rate,
+        }
+
+    def _score_metrics(self, metrics):
+        """
+        指標から商品選定スコアを計算
+
+        Args:
+            metrics (dict): _extract_metrics の戻り値
+
+        Returns:
+            dict: 指標 + スコアの辞書（DataFrameの1行分）
+        """
+        price = metrics['price']
+        rating = metrics['rating']
+        review_count = metrics['review_count']
+        seller_count = metrics['seller_count']
+        monthly_sold_current = metrics['monthly_sold_current']
+        monthly_sold_6m_ago = metrics['monthly_sold_6m_ago']
+        monthly_sold_12m_ago = metrics['monthly_sold_12m_ago']
+        monthly_sold_24m_ago = metrics['monthly_sold_24m_ago']
+        sales_growth_rate = metrics['sales_growth_rate']
+
+        # ========================================
+        # 収益性スコア計算（35点）NEW!
+        # ========================================
+        profitability_score = 0
+        profit_margin = 0
+        roi = 0
+        net_profit = 0
+
+        if price > 0:
+            # コスト推定（簡易版）
+            product_cost = price * 0.60  # 原価60%
+            shipping_cost = price * 0.15  # 配送費15%
+            amazon_fee = price * 0.15  # Amazon手数料15%
+            fba_fee = 350  # FBA手数料（平均）
+
+            # 純利益計算
+            net_profit = price - product_cost - shipping_cost - amazon_fee - fba_fee
+
+            # 利益率(%)
+            profit_margin = (net_profit / price) * 100 if price > 0 else 0
+
+            # ROI(%) = 純利益 / (原価+配送費)
+            investment = product_cost + shipping_cost
+            roi = (net_profit / investment) * 100 if investment > 0 else 0
+
+            # 利益率スコア（20点）
+            if profit_margin >= 30:
+                profit_score = 20
+            elif profit_margin >= 25:
+                profit_score = 17
+            elif profit_margin >= 20:
+                profit_score = 14
+            elif profit_margin >= 15:
+                profit_score = 10
+            elif profit_margin >= 10:
+                profit_score = 5
+            else:
+                profit_score = 0  # 10%未満は推奨しない
+
+            # ROIスコア（15点）
+            if roi >= 100:
+                roi_score = 15
+            elif roi >= 75:
+                roi_score = 12
+            elif roi >= 50:
+                roi_score = 9
+            elif roi >= 30:
+                roi_score = 6
+            elif roi >= 15:
+                roi_score = 3
+            else:
+                roi_score = 0
+
+            profitability_score = profit_score + roi_score
+
+        # ========================================
+        # 市場魅力度スコア計算（25点）IMPROVED!
+        # ========================================
+        market_score = 0
+        monthly_market_size = monthly_sold_current * price
+
+        # 月間市場規模（金額ベース）
+        if monthly_market_size >= 30000000:  # ¥30M/月
+            market_score = 25
+        elif monthly_market_size >= 20000000:  # ¥20M/月
+            market_score = 22
+        elif monthly_market_size >= 10000000:  # ¥10M/月
+            market_score = 18
+        elif monthly_market_size >= 5000000:  # ¥5M/月
+            market_score = 14
+        elif monthly_market_size >= 2000000:  # ¥2M/月
+            market_score = 10
+        elif monthly_market_size >= 500000:  # ¥500K/月
+            market_score = 6
+        else:
+            market_score = 2
+
+        # 価格帯調整（¥2,000-7,000が最適）
+        if 2000 <= price <= 7000:
+            pass  # 調整なし
+        elif 1000 <= price < 2000 or 7000 < price <= 15000:
+            market_score = int(market_score * 0.9)  # 10%減点
+        else:
+            market_score = int(market_score * 0.7)  # 30%減点
+
+        market_score = min(market_score, 25)
+
+        # ========================================
+        # 競合難易度スコア計算（20点）IMPROVED!
+        # ========================================
+        competition_score = 0
+
+        # 出品者数スコア（10点）
+        if 0 < seller_count <= 3:
+            seller_score = 10
+        elif 4 <= seller_count <= 10:
+            seller_score = 8
+        elif 11 <= seller_count <= 30:
+            seller_score = 6
+        elif 31 <= seller_count <= 50:
+            seller_score = 4
+        elif 51 <= seller_count <= 100:
+            seller_score = 2
+        elif seller_count > 100:
+            seller_score = 1
+        else:
+            seller_score = 5  # データなし
+
+        # レビュー数スコア（10点）- トップ商品のレビュー数
+        if 0 < review_count < 100:
+            review_score = 10  # 少ない=参入しやすい
+        elif 100 <= review_count < 500:
+            review_score = 8
+        elif 500 <= review_count < 1000:
+            review_score = 6
+        elif 1000 <= review_count < 3000:
+            review_score = 4
+        elif review_count >= 3000:
+            review_score = 2  # 非常に多い=参入困難
+        else:
+            review_score = 5  # データなし
+
+        competition_score = seller_score + review_score
+
+        # ========================================
+        # 成長スコア計算（20点）IMPROVED!
+        # ========================================
+        growth_score = 0
+
+        # 短期成長（直近6ヶ月、10点）
+        if monthly_sold_6m_ago > 0 and monthly_sold_current > 0:
+            short_term_growth = ((monthly_sold_current - monthly_sold_6m_ago) / monthly_sold_6m_ago) * 100
+
+            if short_term_growth > 100:
+                short_score = 10
+            elif short_term_growth > 50:
+                short_score = 8
+            elif short_term_growth > 20:
+                short_score = 6
+            elif short_term_growth > 0:
+                short_score = 4
+            else:
+                short_score = 2
+
+            growth_score += short_score
+
+        # 長期成長（過去24ヶ月→現在、10点）
+        if monthly_sold_24m_ago > 0 and monthly_sold_current > 0:
+            long_term_growth = ((monthly_sold_current - monthly_sold_24m_ago) / monthly_sold_24m_ago) * 100
+
+            if long_term_growth > 200:
+                long_score = 10
+            elif long_term_growth > 100:
+                long_score = 8
+            elif long_term_growth > 50:
+                long_score = 6
+            elif long_term_growth > 20:
+                long_score = 4
+            elif long_term_growth > 0:
+                long_score = 2
+            else:
+                long_score = 0
+
+            growth_score += long_score
+        elif monthly_sold_12m_ago > 0 and monthly_sold_current > 0:
+            # 24ヶ月データがない場合は12ヶ月で代用
+            mid_term_growth = ((monthly_sold_current - monthly_sold_12m_ago) / monthly_sold_12m_ago) * 100
+
+            if mid_term_growth > 100:
+                mid_score = 10
+            elif mid_term_growth > 50:
+                mid_score = 7
+            elif mid_term_growth > 20:
+                mid_score = 5
+            elif mid_term_growth > 0:
+                mid_score = 3
+            else:
+                mid_score = 0
+
+            growth_score += mid_score
+
+        # ========================================
+        # 総合スコア計算（100点満点）
+        # ========================================
+        product_score = profitability_score + market_score + competition_score + growth_score
+
+        # ========================================
+        # 旧スコアリングも保持（比較用）
+        # ========================================
+        # 1. 販売トレンドスコア（40点）- 旧版
+        if sales_growth_rate > 100:
+            trend_score_old = 40
+        elif sales_growth_rate > 50:
+            trend_score_old = 30
+        elif sales_growth_rate > 20:
+            trend_score_old = 20
+        elif sales_growth_rate > 0:
+            trend_score_old = 10
+        else:
+            trend_score_old = 0
+
+        # 2. 市場規模スコア（30点）- 月間販売数（旧版）
+        if monthly_sold_current >= 5000:
+            market_score_old = 30
+        elif monthly_sold_current >= 3000:
+            market_score_old = 25
+        elif monthly_sold_current >= 1000:
+            market_score_old = 20
+        elif monthly_sold_current >= 500:
+            market_score_old = 15
+        elif monthly_sold_current >= 100:
+            market_score_old = 10
+        else:
+            market_score_old = 5
+
+        # 3. 改善余地スコア（20点）- 評価が低いほど改善余地あり（旧版）
+        if 0 < rating < 3.5:
+            improvement_score = 20
+        elif 3.5 <= rating < 4.0:
+            improvement_score = 15
+        elif 4.0 <= rating < 4.3:
+            improvement_score = 10
+        elif 4.3 <= rating < 4.5:
+            improvement_score = 5
+        else:
+            improvement_score = 0
+
+        # 4. 参入難易度スコア（10点）- 新品出品者数（競合の少なさ）（旧版）
+        if 0 < seller_count <= 3:  # 1-3社: ブルーオーシャン
+            entry_score_old = 10
+        elif 4 <= seller_count <= 10:  # 4-10社: 競合少なめ
+            entry_score_old = 7
+        elif 11 <= seller_count <= 30:  # 11-30社: 普通
+            entry_score_old = 5
+        elif 31 <= seller_count <= 50:  # 31-50社: 競合多め
+            entry_score_old = 3
+        elif seller_count > 50:  # 51社以上: レッドオーシャン
+            entry_score_old = 1
+        else:  # データなし
+            entry_score_old = 5  # 中間値
+
+        product_score_old = trend_score_old + market_score_old + improvement_score + entry_score_old
+
+        return {
+            **metrics,
+
+            # 新スコアリング（v2.0）
+            'product_score': product_score,  # 総合スコア（100点）
+            'profitability_score': profitability_score,  # 収益性（35点）
+            'market_score': market_score,  # 市場魅力度（25点）
+            'competition_score': competition_score,  # 競合難易度（20点）
+            'growth_score': growth_score,  # 成長スコア（20点）
+
+            # 収益性の詳細
+            'profit_margin': profit_margin,  # 利益率(%)
+            'roi': roi,  # ROI(%)
+            'net_profit': net_profit,  # 純利益(円)
+            'monthly_market_size': monthly_market_size,  # 月間市場規模(円)
+
+            # 旧スコアリング（v1.0 比較用）
+            'product_score_old': product_score_old,
+            'trend_score': trend_score_old,
+            'market_score_old': market_score_old,
+            'improvement_score': improvement_score,
+            'entry_score': entry_score_old,
+        }
+
+    @staticmethod
+    def _count_live_new_offers(product):
+        """
+        オファー情報から現在出品中の新品出品者数を数える
+
+        Args:
+            product (dict): offers指定で取得したKeepa商品データ
+
+        Returns:
+            int: 新品の出品中オファー数（情報が無い場合は0）
+        """
+        offers = product.get('offers') or []
+        live_order = product.get('liveOffersOrder') or []
+        return sum(
+            1 for i in live_order
+            if 0 <= i < len(offers) and offers[i].get('condition') == 1  # 1 = 新品
+        )
+
+    @staticmethod
+    def _offer_shortlist(rows, filters, top_k):
+        """
+        オファーを取得する上位候補のASIN
+
+        Args:
+            rows (list): _build_rows の戻り値
+            filters (dict): 詳細検索フィルタ（Noneの場合は全件から選定）
+            top_k (int): 件数
+
+        Returns:
+            list: ASINのリスト（商品選定スコア順）
+        """
+        if not rows:
+            return []
+        candidates = pd.DataFrame(rows)
+        if filters:
+            candidates = apply_filters(candidates, filters)
+        return candidates.sort_values('product_score', ascending=False)['asin'].head(top_k).tolist()
+
+    def _refresh_seller_counts(self, rows, filters, top_k, deadline=None, shortlist=None):
+        """
+        上位候補のみオファー情報を取得し、出品者数を更新して再スコアリング（rowsを直接更新）
+
+        Args:
+            rows (list): _build_rows の戻り値
+            filters (dict): 詳細検索フィルタ（Noneの場合は全件から選定）
+            top_k (int): オファーを取得する件数
+            deadline (Deadline): 検索全体の持ち時間（Noneは無制限）
+            shortlist (list): オファーを取得するASIN（省略時は rows から filters・top_k で選定）
+
+        Returns:
+            set: 実際の出品者数で更新したASIN（それ以外の行は履歴ベースの仮の出品者数）
+        """
+        if shortlist is None:
+            shortlist = self._offer_shortlist(rows, filters, top_k)
+
+        if not shortlist:
+            return set()
+
+        try:
+            logger.info("上位%d件のオファー情報を取得中...", len(shortlist))
+            offer_products = self._query_keepa(
+                shortlist,
+                deadline=deadline,
+                domain='JP',
+                history=False,  # 価格履歴はPhase 1で取得済み
+                offers=20
+            )
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            # 取得できなくても仮スコア（COUNT_NEW履歴ベース）で結果を返す
+            logger.warning("オファー情報の取得に失敗したため仮スコアを使用します: %s", e)
+            return set()
+
+        live_counts = {p.get('asin'): self._count_live_new_offers(p) for p in offer_products}
+
+        refreshed = set()
+        for i, row in enumerate(rows):
+            count = live_counts.get(row['asin'], 0)
+            if count > 0:
+                rows[i] = self._score_metrics(dict(row, seller_count=count))
+                refreshed.add(row['asin'])
+        return refreshed
+
+    def _build_rows(self, products):
+        """
+        Keepa商品データのリストをスコア付きの行リストに変換
+
+        Args:
+            products (list): Keepa商品データのリスト
+
+        Returns:
+            list: 行（辞書）のリスト
+        """
+        results = []
+
+        with self._profile_stage('score', products=len(products)):
+            for product in products:
+                try:
+                    metrics = self._extract_metrics(product)
+                    if metrics is None:
+                        continue
+
+                    results.append(self._score_metrics(metrics))
+                    logger.debug("OK %s: %s... 価格: %s円", metrics['asin'], metrics['title'][:30], metrics['price'])
+
+                except Exception as e:
+                    logger.error("商品処理エラー: %s", e)
+                    continue
+
+        return results
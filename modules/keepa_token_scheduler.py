@@ -0,0 +1,360 @@
+"""
+Keepaトークン予算スケジューラー
+トークン残高と回復レートを追跡し、クエリを予算内に収まるよう待機・分割する
+
+- 状態はキャッシュと同じSQLiteファイルに保存し、複数セッション・複数プロセスで共有
+- 待機キューは優先度順（対話操作 > バッチ）で処理
+- 残高不足時は例外にせず、回復見込み時間だけ事前に待機して平準化
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .cache_manager import get_cache_manager
+
+# 優先度（値が小さいほど優先）
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# Keepaのトークン上限は「回復レート × 60分」
+BUCKET_MINUTES = 60
+
+# 待機者のハートビートがこの秒数途絶えたら（プロセス終了など）キューから除去
+STALE_WAITER_SEC = 60
+
+
+class KeepaTokenBudgetError(Exception):
+    """許容待ち時間内にトークンが確保できない場合の例外"""
+
+    def __init__(self, wait_seconds: float):
+        self.wait_seconds = wait_seconds
+        super().__init__(f"Keepa token budget exhausted (約{int(wait_seconds)}秒の待機が必要)")
+
+    def __reduce__(self):
+        # ジョブ結果として保存（pickle）できるように待ち秒数で復元する
+        return (self.__class__, (self.wait_seconds,))
+
+
+def estimate_query_cost(n_asins: int, offers: Optional[int] = None, rating: bool = False) -> int:
+    """
+    Keepa productクエリの消費トークン数を見積もる
+
+    - 基本: 1トークン/商品
+    - offers: 10件ごとに6トークン/商品
+    - rating: 最大1トークン/商品
+
+    Args:
+        n_asins (int): ASIN数
+        offers (int): 取得するオファー数
+        rating (bool): レビュー情報を含めるか
+
+    Returns:
+        int: 見積もりトークン数
+    """
+    per_asin = 1
+    if offers:
+        per_asin += 6 * ((offers + 9) // 10)
+    if rating:
+        per_asin += 1
+    return per_asin * n_asins
+
+
+class KeepaTokenScheduler:
+    """SQLite共有のKeepaトークンバケット"""
+
+    def __init__(
+        self,
+        api_key: str,
+        db_path: Optional[str] = None,
+        interactive_reserve: int = 0,
+        poll_interval: float = 1.0
+    ):
+        """
+        初期化
+
+        Args:
+            api_key (str): Keepa APIキー（状態の識別にのみ使用、保存はハッシュ）
+            db_path (str): SQLiteファイル（省略時はキャッシュと同じDB）
+            interactive_reserve (int): バッチ実行時に対話操作用として残すトークン数
+            poll_interval (float): 待機中の再確認間隔(秒)
+        """
+        self.key_id = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        self.db_path = db_path or get_cache_manager().db_path
+        self.interactive_reserve = interactive_reserve
+        self.poll_interval = poll_interval
+        self._init_db()
+
+    def _connect(self):
+        """短命の接続を作成（BEGIN IMMEDIATEで手動トランザクション管理）"""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        """状態テーブル・待機キューテーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS keepa_token_state (
+                    key_id TEXT PRIMARY KEY,
+                    tokens_left REAL NOT NULL,
+                    refill_rate REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS keepa_token_waiters (
+                    id TEXT PRIMARY KEY,
+                    key_id TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    cost REAL NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    heartbeat REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _load_state(self, conn):
+        row = conn.execute("""
+            SELECT tokens_left, refill_rate, updated_at
+            FROM keepa_token_state
+            WHERE key_id = ?
+        """, (self.key_id,)).fetchone()
+        return row
+
+    @staticmethod
+    def _estimate_balance(tokens_left, refill_rate, updated_at, now):
+        """最終観測時点からの経過時間で回復分を加算した推定残高"""
+        capacity = refill_rate * BUCKET_MINUTES
+        balance = tokens_left + (now - updated_at) / 60.0 * refill_rate
+        return min(balance, capacity) if capacity > 0 else balance
+
+    def sync(self, api, max_age_sec: float = 600):
+        """
+        保存済み状態が古い場合のみKeepaに残高を問い合わせる（tokenエンドポイントは無料）
+
+        Args:
+            api: keepa.Keepa インスタンス
+            max_age_sec (float): この秒数以内に更新済みなら問い合わせない
+        """
+        conn = self._connect()
+        try:
+            state = self._load_state(conn)
+        finally:
+            conn.close()
+
+        if state is None or time.time() - state[2] > max_age_sec:
+            api.update_status()
+            self.observe(api)
+
+    def observe(self, api):
+        """
+        Keepaクライアントが報告した残高・回復レートで状態を更新
+
+        Args:
+            api: keepa.Keepa インスタンス（クエリ直後に呼ぶ）
+        """
+        refill_rate = getattr(api.status, 'refillRate', None)
+        if refill_rate is None:
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO keepa_token_state
+                (key_id, tokens_left, refill_rate, updated_at)
+                VALUES (?, ?, ?, ?)
+            """, (self.key_id, float(api.tokens_left), float(refill_rate), time.time()))
+        finally:
+            conn.close()
+
+    def _try_acquire(self, waiter_id: str, priority: int, cost: float):
+        """
+        1回分の確保判定（排他トランザクション内で実行）
+
+        Returns:
+            tuple: (確保できたか, 次に確認するまでの推定待ち秒数)
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+
+            conn.execute("UPDATE keepa_token_waiters SET heartbeat = ? WHERE id = ?", (now, waiter_id))
+            conn.execute("DELETE FROM keepa_token_waiters WHERE heartbeat < ?", (now - STALE_WAITER_SEC,))
+
+            head = conn.execute("""
+                SELECT id FROM keepa_token_waiters
+                WHERE key_id = ?
+                ORDER BY priority ASC, enqueued_at ASC
+                LIMIT 1
+            """, (self.key_id,)).fetchone()
+            is_head = head is not None and head[0] == waiter_id
+
+            state = self._load_state(conn)
+            if state is None:
+                # 未観測: 初回クエリ後のobserveで状態が作られる
+                conn.execute("COMMIT")
+                return is_head, self.poll_interval
+
+            tokens_left, refill_rate, updated_at = state
+            balance = self._estimate_balance(tokens_left, refill_rate, updated_at, now)
+
+            reserve = self.interactive_reserve if priority != PRIORITY_INTERACTIVE else 0
+            capacity = refill_rate * BUCKET_MINUTES
+            needed = cost + reserve
+            if capacity > 0:
+                # 上限を超えるクエリは満タンになった時点で実行（Keepaは残高のマイナスを許容）
+                needed = min(needed, capacity)
+
+            if is_head and balance >= needed:
+                conn.execute("""
+                    UPDATE keepa_token_state
+                    SET tokens_left = ?, updated_at = ?
+                    WHERE key_id = ?
+                """, (balance - cost, now, self.key_id))
+                conn.execute("COMMIT")
+                return True, 0.0
+
+            conn.execute("COMMIT")
+
+            if not is_head or refill_rate <= 0:
+                return False, self.poll_interval
+            return False, (needed - balance) / refill_rate * 60.0
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(
+        self,
+        cost: float,
+        priority: int = PRIORITY_INTERACTIVE,
+        max_wait: Optional[float] = None,
+        on_wait: Optional[Callable[[float], None]] = None
+    ) -> float:
+        """
+        トークンを確保するまで待機
+
+        Args:
+            cost (float): 消費見込みトークン数
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            max_wait (float): 許容待ち時間(秒)。超える見込みの時点でKeepaTokenBudgetError
+            on_wait (callable): 待機が発生した際に推定待ち秒数を受け取るコールバック
+
+        Returns:
+            float: 実際に待機した秒数
+        """
+        waiter_id = uuid.uuid4().hex
+        started = time.monotonic()
+
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute("""
+                INSERT INTO keepa_token_waiters
+                (id, key_id, priority, cost, enqueued_at, heartbeat)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (waiter_id, self.key_id, priority, cost, now, now))
+        finally:
+            conn.close()
+
+        try:
+            while True:
+                granted, wait_sec = self._try_acquire(waiter_id, priority, cost)
+                if granted:
+                    return time.monotonic() - started
+
+                waited = time.monotonic() - started
+                if max_wait is not None and waited + wait_sec > max_wait:
+                    raise KeepaTokenBudgetError(wait_sec)
+
+                if on_wait:
+                    on_wait(wait_sec)
+                time.sleep(min(max(wait_sec, 0.05), self.poll_interval))
+        finally:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM keepa_token_waiters WHERE id = ?", (waiter_id,))
+            finally:
+                conn.close()
+
+    def chunk_asins(self, asins: List[str], cost_per_asin: int, max_chunk: int = 100) -> List[List[str]]:
+        """
+        ASINリストを予算に収まるチャンクに分割
+
+        チャンクサイズは「現在の推定残高」と「1分あたりの回復量」の大きい方に合わせる。
+        残高が十分なら一括、枯渇時は回復ペースに合わせた小さなチャンクで平準化される
+
+        Args:
+            asins (List[str]): ASINリスト
+            cost_per_asin (int): 1ASINあたりの消費見込みトークン
+            max_chunk (int): 1リクエストの最大ASIN数（Keepaの上限は100）
+
+        Returns:
+            List[List[str]]: 分割済みASINリスト
+        """
+        snapshot = self.snapshot()
+        if snapshot['refill_rate'] is None:
+            chunk_size = max_chunk
+        else:
+            budget = max(snapshot['tokens_left'], snapshot['refill_rate'])
+            chunk_size = max(1, min(max_chunk, int(budget // max(cost_per_asin, 1))))
+
+        return [asins[i:i + chunk_size] for i in range(0, len(asins), chunk_size)]
+
+    def snapshot(self) -> Dict:
+        """
+        現在の推定状態を取得（UI表示用）
+
+        Returns:
+            Dict: 推定残高・回復レート・優先度別の待機数
+        """
+        conn = self._connect()
+        try:
+            state = self._load_state(conn)
+            waiting = dict(conn.execute("""
+                SELECT priority, COUNT(*)
+                FROM keepa_token_waiters
+                WHERE key_id = ? AND heartbeat >= ?
+                GROUP BY priority
+            """, (self.key_id, time.time() - STALE_WAITER_SEC)).fetchall())
+        finally:
+            conn.close()
+
+        if state is None:
+            tokens_left, refill_rate = None, None
+        else:
+            refill_rate = state[1]
+            tokens_left = self._estimate_balance(state[0], state[1], state[2], time.time())
+
+        return {
+            'tokens_left': tokens_left,
+            'refill_rate': refill_rate,
+            'waiting_interactive': waiting.get(PRIORITY_INTERACTIVE, 0),
+            'waiting_batch': waiting.get(PRIORITY_BATCH, 0),
+        }
+
+
+# APIキーごとのスケジューラー（プロセス内で共有）
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_token_scheduler(api_key):
+    """
+    APIキーに対応するスケジューラーを取得
+
+    Args:
+        api_key (str): Keepa APIキー
+
+    Returns:
+        KeepaTokenScheduler インスタンス
+    """
+    with _schedulers_lock:
+        if api_key not in _schedulers:
+            _schedulers[api_key] = KeepaTokenScheduler(api_key)
+        return _schedulers[api_key]
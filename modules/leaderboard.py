@@ -0,0 +1,348 @@
+"""
+横断リーダーボードモジュール
+キーワード・セッション・バッチ実行をまたいでスコアリングした全商品を、商品ごとの最新スコアで1つのランキングに保つ
+
+- 検索・ウォッチリストの再スコアリングのたびに該当商品の行だけ更新（全履歴の再ソートはしない）
+- スコア順のインデックス（全体・カテゴリ別）で、価格帯・カテゴリ・キーワードで絞り込んだ上位K件を数ミリ秒で返す
+- 順位は「自分より高いスコアの件数」をインデックスで数えて求める
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# リーダーボードに保存する列（search_products の列名 → SQLiteの型）
+LEADERBOARD_COLUMNS = {
+    'title': 'TEXT',
+    'category': 'TEXT',
+    'price': 'REAL',
+    'product_score': 'REAL',
+    'profitability_score': 'REAL',
+    'market_score': 'REAL',
+    'competition_score': 'REAL',
+    'growth_score': 'REAL',
+    'monthly_sold_current': 'REAL',
+    'sales_growth_rate': 'REAL',
+    'current_rank': 'REAL',
+    'review_count': 'REAL',
+    'rating': 'REAL',
+    'seller_count': 'REAL',
+    'monthly_market_size': 'REAL',
+}
+
+DEFAULT_TOP_K = 20
+
+# この日数以内にオファーから取得した出品者数は、履歴ベースの仮の値より優先して使う
+LIVE_SELLER_COUNT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def _value(value):
+    """SQLiteに渡せる値に変換（NumPyのスカラーはPythonの値へ）"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class Leaderboard:
+    """キーワードをまたいだ商品ランキング（SQLiteのスコア順インデックスで管理）"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            db_path (str): SQLiteファイル（省略時はキャッシュと同じDB）
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self._init_db()
+
+    def _connect(self):
+        """短命の接続を作成（BEGIN IMMEDIATEで手動トランザクション管理）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        書き込み用のトランザクション
+
+        Yields:
+            sqlite3.Connection: トランザクション中の接続（例外時はロールバック）
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """ランキング・キーワード対応テーブルとインデックス作成"""
+        columns = ''.join(f"{name} {kind},\n" for name, kind in LEADERBOARD_COLUMNS.items())
+        conn = self._connect()
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS leaderboard (
+                    asin TEXT PRIMARY KEY,
+                    {columns}
+                    keyword TEXT,
+                    seller_count_at REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # 出品者数の取得時刻列が無い既存DBには列を追加（NULL=履歴ベースの仮の出品者数）
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(leaderboard)")}
+            if 'seller_count_at' not in existing:
+                conn.execute("ALTER TABLE leaderboard ADD COLUMN seller_count_at REAL")
+            # 上位K件はスコア順インデックスを先頭から辿る（価格などの絞り込みは辿りながら判定）
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard(product_score DESC)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_leaderboard_category ON leaderboard(category, product_score DESC)
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leaderboard_keywords (
+                    keyword TEXT NOT NULL,
+                    asin TEXT NOT NULL,
+                    scored_at REAL NOT NULL,
+                    PRIMARY KEY (keyword, asin)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_leaderboard_keywords_asin ON leaderboard_keywords(asin)
+            """)
+        finally:
+            conn.close()
+
+    def record(self, rows: Iterable[Dict], keyword: Optional[str] = None, now: Optional[float] = None,
+               live_asins: Optional[Iterable[str]] = None) -> int:
+        """
+        スコアリング結果で該当商品の行を更新（同じASINは最新のスコアで置き換え）
+
+        Args:
+            rows (Iterable[Dict]): search_products の行
+            keyword (str): 検索キーワード（ウォッチリストの再取得などはNone）
+            now (float): 更新時刻
+            live_asins (Iterable[str]): 出品者数をオファーから取得した商品（それ以外は仮の出品者数として記録）
+
+        Returns:
+            int: 更新した商品数
+        """
+        now = now or time.time()
+        live_asins = set(live_asins or ())
+        values = []
+        for row in rows:
+            if not row.get('asin') or row.get('product_score') is None:
+                continue
+            seller_count_at = now if row['asin'] in live_asins else None
+            values.append((row['asin'], *(_value(row.get(name)) for name in LEADERBOARD_COLUMNS), keyword,
+                           seller_count_at, now))
+        if not values:
+            return 0
+
+        # 仮の出品者数の行は、最近オファーから取得した出品者数とその取得時刻を上書きしない
+        keep_live = "excluded.seller_count_at IS NULL AND leaderboard.seller_count_at >= ?"
+        names = ['asin', *LEADERBOARD_COLUMNS, 'keyword', 'seller_count_at', 'updated_at']
+        updates = ', '.join(
+            f"{name} = COALESCE(excluded.{name}, leaderboard.{name})" if name == 'keyword'
+            else f"{name} = CASE WHEN {keep_live} THEN leaderboard.{name} ELSE excluded.{name} END"
+            if name in ('seller_count', 'seller_count_at')
+            else f"{name} = excluded.{name}"
+            for name in names[1:]
+        )
+        since = now - LIVE_SELLER_COUNT_MAX_AGE
+        with self._transaction() as conn:
+            conn.executemany(f"""
+                INSERT INTO leaderboard ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})
+                ON CONFLICT(asin) DO UPDATE SET {updates}
+            """, [(*value, since, since) for value in values])
+            if keyword:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO leaderboard_keywords (keyword, asin, scored_at) VALUES (?, ?, ?)
+                """, [(keyword, value[0], now) for value in values])
+        return len(values)
+
+    def live_seller_counts(self, asins: Iterable[str], max_age: float = LIVE_SELLER_COUNT_MAX_AGE,
+                           now: Optional[float] = None) -> Dict[str, float]:
+        """
+        最近オファーから取得した出品者数
+
+        Args:
+            asins (Iterable[str]): ASIN
+            max_age (float): この秒数より古い取得結果は使わない
+            now (float): 現在時刻
+
+        Returns:
+            Dict[str, float]: ASIN → 出品者数（取得していない・古い商品は含まない）
+        """
+        asins = list(dict.fromkeys(asins))
+        if not asins:
+            return {}
+        since = (now or time.time()) - max_age
+        counts = {}
+        conn = self._connect()
+        try:
+            # SQLiteのパラメータ数上限を超えないよう分割して問い合わせ
+            for start in range(0, len(asins), 500):
+                chunk = asins[start:start + 500]
+                for row in conn.execute(f"""
+                    SELECT asin, seller_count FROM leaderboard
+                    WHERE asin IN ({', '.join('?' * len(chunk))})
+                      AND seller_count_at >= ? AND seller_count IS NOT NULL
+                """, (*chunk, since)):
+                    counts[row['asin']] = int(row['seller_count'])
+        finally:
+            conn.close()
+        return counts
+
+    def top(self, k: int = DEFAULT_TOP_K, min_price: Optional[float] = None, max_price: Optional[float] = None,
+            category: Optional[str] = None, keyword: Optional[str] = None, min_monthly_sold: Optional[float] = None,
+            max_seller_count: Optional[float] = None, since: Optional[float] = None) -> pd.DataFrame:
+        """
+        絞り込み条件を満たす上位K件（商品選定スコア順）
+
+        Args:
+            k (int): 件数
+            min_price (float): 最低価格(円)
+            max_price (float): 最高価格(円)
+            category (str): カテゴリ（ルートカテゴリ名）
+            keyword (str): このキーワードの検索で見つかった商品のみ
+            min_monthly_sold (float): 最低月間販売数
+            max_seller_count (float): 最大セラー数
+            since (float): この時刻以降にスコアリングした商品のみ
+
+        Returns:
+            pd.DataFrame: 順位（rank）付きの商品データ
+        """
+        conditions, params = [], []
+        for clause, value in (
+            ("l.price >= ?", min_price),
+            ("l.price <= ?", max_price),
+            ("l.category = ?", category),
+            ("l.monthly_sold_current >= ?", min_monthly_sold),
+            ("l.seller_count <= ?", max_seller_count),
+            ("l.updated_at >= ?", since),
+        ):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        join = ''
+        if keyword is not None:
+            join = "JOIN leaderboard_keywords k ON k.asin = l.asin AND k.keyword = ?"
+            params.insert(0, keyword)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"""
+                SELECT l.* FROM leaderboard l {join} {where}
+                ORDER BY l.product_score DESC LIMIT ?
+            """, (*params, k)).fetchall()
+        finally:
+            conn.close()
+
+        df = pd.DataFrame([dict(row) for row in rows], columns=['asin', *LEADERBOARD_COLUMNS, 'keyword', 'updated_at'])
+        df.insert(0, 'rank', range(1, len(df) + 1))
+        return df
+
+    def rank(self, asin: str) -> Optional[Dict]:
+        """
+        商品の全体順位
+
+        Args:
+            asin (str): ASIN
+
+        Returns:
+            Dict: rank（1始まり）, total, product_score（未登録の場合はNone）
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT product_score FROM leaderboard WHERE asin = ?", (asin,)).fetchone()
+            if row is None:
+                return None
+            higher = conn.execute("SELECT COUNT(*) FROM leaderboard WHERE product_score > ?",
+                                  (row['product_score'],)).fetchone()[0]
+            total = conn.execute("SELECT COUNT(*) FROM leaderboard").fetchone()[0]
+        finally:
+            conn.close()
+        return {'rank': higher + 1, 'total': total, 'product_score': row['product_score']}
+
+    def keywords_for(self, asin: str) -> List[str]:
+        """商品が見つかったキーワード（新しい順）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT keyword FROM leaderboard_keywords WHERE asin = ? ORDER BY scored_at DESC
+            """, (asin,)).fetchall()
+        finally:
+            conn.close()
+        return [row['keyword'] for row in rows]
+
+    def categories(self) -> List[str]:
+        """登録されているカテゴリ"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT DISTINCT category FROM leaderboard WHERE category IS NOT NULL AND category != ''
+                ORDER BY category
+            """).fetchall()
+        finally:
+            conn.close()
+        return [row['category'] for row in rows]
+
+    def keywords(self) -> List[str]:
+        """登録されているキーワード（最近検索した順）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT keyword FROM leaderboard_keywords GROUP BY keyword ORDER BY MAX(scored_at) DESC
+            """).fetchall()
+        finally:
+            conn.close()
+        return [row['keyword'] for row in rows]
+
+    def summary(self) -> Dict:
+        """
+        登録状況
+
+        Returns:
+            Dict: products, keywords, updated_at（最終更新時刻）
+        """
+        conn = self._connect()
+        try:
+            products, updated_at = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM leaderboard").fetchone()
+            keywords = conn.execute("SELECT COUNT(DISTINCT keyword) FROM leaderboard_keywords").fetchone()[0]
+        finally:
+            conn.close()
+        return {'products': products, 'keywords': keywords, 'updated_at': updated_at}
+
+
+# グローバルリーダーボード(シングルトン)
+_leaderboard_instance = None
+_leaderboard_lock = threading.Lock()
+
+def get_leaderboard():
+    """
+    リーダーボードのシングルトンインスタンス取得
+
+    Returns:
+        Leaderboard インスタンス
+    """
+    global _leaderboard_instance
+    with _leaderboard_lock:
+        if _leaderboard_instance is None:
+            _leaderboard_instance = Leaderboard()
+    return _leaderboard_instance
@@ -0,0 +1,633 @@
+"""
+負荷試験モジュール
+ローカルのスタブサーバー（Keepa・RainforestAPI・Claude）に対して、複数セッションの
+検索 → レビュー収集 → AI分析 をジョブランナー経由で同時実行し、並行処理のボトルネックを計測する
+
+- スタブは実APIと同じ形式の応答を返す（Keepa商品は data/synthetic_keepa.py で生成）
+- 応答時間・エラー率はスタブごとに指定でき、本番APIのクレジット・トークンは消費しない
+- 計測: 段階ごとのレイテンシ百分位、ジョブの待ち時間、キャッシュヒット率、
+  SQLite文の実行時間（ロック待ちを含む）とロックエラー、エラー件数
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import keepa
+import numpy as np
+import requests
+
+from data.synthetic_keepa import TITLE_WORDS, generate_product
+from .cache_manager import get_cache_manager
+from .job_runner import STATUS_DONE, get_job_runner
+from .jobs import analysis_job, review_job, search_job
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# keepaライブラリが使う接続先（スタブへ差し替える）
+KEEPA_API_BASE = 'https://api.keepa.com/'
+
+# 既定の検索キーワード（人気に偏りを持たせて選ぶため、先頭ほど選ばれやすい）
+DEFAULT_KEYWORDS = list(TITLE_WORDS)
+
+# フィルタ（スタブの商品がほぼ全件通る条件。app.py の詳細検索と同じキー）
+DEFAULT_FILTERS = {
+    'price': (0, 1000000),
+    'monthly_current': (0, 1000000),
+    'growth_3m': False,
+    'growth_6m': False,
+    'growth_12m': False,
+    'growth_24m': False,
+    'bsr': (1, 10000000),
+    'rating': (0.0, 5.0),
+    'review_min': 0,
+    'seller_max': 1000,
+}
+
+# ロック待ちとみなすSQLite文の実行時間（ミリ秒）
+DEFAULT_LOCK_WAIT_MS = 50
+
+_REVIEW_PROBLEMS = ['すぐに破れた', 'においが強い', 'サイズが表記と違う', '滑りやすい', '梱包が雑だった',
+                    '説明書が分かりにくい', '色が写真と違う', '耐久性が低い', '返品対応が遅い', '価格の割に薄い']
+
+
+class _StubServer(ThreadingHTTPServer):
+    """応答遅延・エラー注入・リクエスト数の集計を持つスタブサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, latency: float, error_rate: float, seed: int):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.counts = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self, endpoint: str) -> bool:
+        """
+        リクエストを数え、遅延させてから応答するか判定
+
+        Returns:
+            bool: 正常に応答する場合True（Falseの場合はエラーを返す）
+        """
+        with self._lock:
+            self.counts[endpoint] += 1
+            delay = self.latency * self._rng.uniform(0.5, 1.5)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.counts['errors_injected'] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return not fail
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """JSONを返すスタブの共通処理"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _query(self) -> Dict[str, str]:
+        return {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+
+
+def _asin_index(asin: str) -> int:
+    """ASINから合成データの番号を求める（B0 + 8桁の番号以外はハッシュ値）"""
+    digits = asin[2:]
+    return int(digits) if digits.isdigit() else zlib.crc32(asin.encode())
+
+
+class _KeepaHandler(_StubHandler):
+    """Keepa API（/product, /token）のスタブ"""
+
+    def do_GET(self):
+        endpoint = urlparse(self.path).path.strip('/')
+        server = self.server
+        if not server.admit(f"keepa_{endpoint}"):
+            self._send_json(500, {'error': {'message': 'stub error'}, **self._status()})
+            return
+
+        if endpoint == 'token':
+            self._send_json(200, self._status())
+            return
+        if endpoint != 'product':
+            self._send_json(404, {'error': {'message': f'unknown endpoint: {endpoint}'}})
+            return
+
+        params = self._query()
+        offers = int(params.get('offers', 0) or 0)
+        products = []
+        for asin in params.get('asin', '').split(','):
+            index = _asin_index(asin)
+            product = generate_product(np.random.default_rng(index), index, server.history_points, parsed=False)
+            product['asin'] = asin
+            if offers:
+                count = index % 15 + 1
+                product['offers'] = [{'condition': 1, 'sellerId': f"S{index}-{i}"} for i in range(count)]
+                product['liveOffersOrder'] = list(range(count))
+            products.append(product)
+        self._send_json(200, {'products': products, **self._status()})
+
+    def _status(self) -> Dict:
+        return {
+            'timestamp': int(time.time() * 1000),
+            'tokensLeft': self.server.tokens_left,
+            'refillIn': 60000,
+            'refillRate': self.server.refill_rate,
+        }
+
+
+class _RainforestHandler(_StubHandler):
+    """RainforestAPI（search / reviews / product）のスタブ"""
+
+    def do_GET(self):
+        params = self._query()
+        request_type = params.get('type', '')
+        server = self.server
+        if not server.admit(f"rainforest_{request_type}"):
+            self._send_json(500, {'request_info': {'success': False, 'message': 'stub error'}})
+            return
+
+        if request_type == 'search':
+            # キーワード・ページごとに固定のASINを共通カタログから選ぶ（キーワード間で商品が重なる）
+            seed = zlib.crc32(f"{params.get('search_term')}|{params.get('page')}|{params.get('sort_by')}".encode())
+            indexes = random.Random(seed).sample(range(server.catalog_size), server.search_results)
+            self._send_json(200, {'search_results': [{'asin': f"B0{i:08d}"} for i in indexes]})
+        elif request_type == 'reviews':
+            count = 10 * int(params.get('max_page', 1))
+            self._send_json(200, {'reviews': _stub_reviews(params.get('asin', ''), count)})
+        elif request_type == 'product':
+            self._send_json(200, {'product': {'top_reviews': _stub_reviews(params.get('asin', ''), 10)}})
+        else:
+            self._send_json(400, {'request_info': {'success': False, 'message': f'unknown type: {request_type}'}})
+
+
+def _stub_reviews(asin: str, count: int) -> List[Dict]:
+    """ASINごとに固定の低評価レビュー（同じASINは同じ内容になり、分析キャッシュが効く）"""
+    rng = random.Random(asin)
+    reviews = []
+    for i in range(count):
+        problem = rng.choice(_REVIEW_PROBLEMS)
+        reviews.append({
+            'id': f"R{asin}{i:03d}",
+            'rating': rng.randint(1, 3),
+            'title': problem,
+            'body': f"{problem}。{rng.choice(_REVIEW_PROBLEMS)}点も気になりました。",
+            'verified_purchase': rng.random() < 0.8,
+            'date': {'raw': f"2024年{rng.randint(1, 12)}月{rng.randint(1, 28)}日に日本でレビュー済み"},
+            'helpful_votes': rng.randint(0, 30),
+            'page': i // 10 + 1,
+            'position': i % 10 + 1,
+        })
+    return reviews
+
+
+class _ClaudeHandler(_StubHandler):
+    """Anthropic Messages API（/v1/messages）のスタブ"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if not self.server.admit('claude_messages'):
+            self._send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'stub error'}})
+            return
+
+        rng = random.Random(zlib.crc32(body))
+        problems = rng.sample(_REVIEW_PROBLEMS, 3)
+        analysis = {
+            'カテゴリ別問題': {
+                '品質・耐久性': [{'問題': p, '頻度': rng.choice(['高', '中', '低']), '具体例': p} for p in problems],
+            },
+            '改善提案': [{'提案': f"{problems[0]}への対策", '解決する問題': problems[0], '実現可能性': '高',
+                       '差別化ポイント': '耐久性', '想定コスト影響': '小'}],
+            '新商品コンセプト': {'商品名案': '改良版', 'ターゲット顧客': '初心者', 'USP': '耐久性',
+                          '想定価格帯': '¥3,000 - ¥5,000', 'マーケティングメッセージ': '長く使える'},
+        }
+        self._send_json(200, {
+            'id': f"msg_stub{rng.randrange(10 ** 8):08d}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': 'stub',
+            'content': [{'type': 'text', 'text': json.dumps(analysis, ensure_ascii=False)}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': len(body) // 4, 'output_tokens': 500},
+        })
+
+
+class StubUpstreams:
+    """Keepa・RainforestAPI・Claude のスタブサーバー一式（ローカルのポートで待ち受け）"""
+
+    def __init__(self, keepa_latency: float = 0.3, rainforest_latency: float = 0.5, claude_latency: float = 2.0,
+                 error_rate: float = 0.0, catalog_size: int = 500, search_results: int = 20,
+                 history_points: int = 200, keepa_tokens: int = 100000, seed: int = 0):
+        """
+        初期化
+
+        Args:
+            keepa_latency (float): Keepaの平均応答時間(秒)（各リクエストで0.5〜1.5倍にばらつく）
+            rainforest_latency (float): RainforestAPIの平均応答時間(秒)
+            claude_latency (float): Claudeの平均応答時間(秒)
+            error_rate (float): 各リクエストをエラーにする確率（0.0〜1.0）
+            catalog_size (int): 検索結果に出る商品の総数（小さいほどキーワード間で商品が重なる）
+            search_results (int): 検索1ページあたりの商品数
+            history_points (int): Keepa商品の各履歴の点数
+            keepa_tokens (int): Keepaが報告するトークン残高（回復レートも同じ値/分）
+            seed (int): 遅延・エラー注入の乱数シード
+        """
+        self.keepa = _StubServer(_KeepaHandler, keepa_latency, error_rate, seed)
+        self.keepa.history_points = history_points
+        self.keepa.tokens_left = keepa_tokens
+        self.keepa.refill_rate = keepa_tokens
+        self.rainforest = _StubServer(_RainforestHandler, rainforest_latency, error_rate, seed + 1)
+        self.rainforest.catalog_size = catalog_size
+        self.rainforest.search_results = min(search_results, catalog_size)
+        self.claude = _StubServer(_ClaudeHandler, claude_latency, error_rate, seed + 2)
+        self._threads = []
+
+    @property
+    def servers(self):
+        return {'keepa': self.keepa, 'rainforest': self.rainforest, 'claude': self.claude}
+
+    def start(self):
+        """各スタブをバックグラウンドスレッドで起動"""
+        for name, server in self.servers.items():
+            thread = threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("スタブ起動: keepa=%s rainforest=%s claude=%s",
+                    self.keepa.url, self.rainforest.url, self.claude.url)
+        return self
+
+    def close(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def environment(self) -> Dict[str, str]:
+        """RainforestAPI・Claude の接続先をスタブに向ける環境変数（Keepaは redirect_keepa で差し替え）"""
+        return {
+            'RAINFOREST_API_URL': f"{self.rainforest.url}/request",
+            'ANTHROPIC_BASE_URL': self.claude.url,
+        }
+
+    def request_counts(self) -> Dict[str, int]:
+        """エンドポイントごとのリクエスト数（errors_injected は注入したエラー数）"""
+        counts = {}
+        for name, server in self.servers.items():
+            for endpoint, count in server.counts.items():
+                key = f"{name}_errors_injected" if endpoint == 'errors_injected' else endpoint
+                counts[key] = count
+        return dict(sorted(counts.items()))
+
+
+class _KeepaRedirect:
+    """keepaライブラリの requests.get の接続先をスタブに置き換える"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/') + '/'
+
+    def get(self, url, *args, **kwargs):
+        return requests.get(url.replace(KEEPA_API_BASE, self.base_url, 1), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+@contextmanager
+def redirect_keepa(base_url: str):
+    """
+    keepaライブラリの接続先を差し替える（api.keepa.com は固定のため、ライブラリ内の requests を置換）
+
+    Args:
+        base_url (str): スタブのURL
+    """
+    module = keepa.keepa_sync
+    original = module.requests
+    module.requests = _KeepaRedirect(base_url)
+    try:
+        yield
+    finally:
+        module.requests = original
+
+
+class LoadTestMetrics:
+    """負荷試験の計測値（スレッドセーフ）"""
+
+    def __init__(self, lock_wait_ms: float = DEFAULT_LOCK_WAIT_MS):
+        self.lock_wait_ms = lock_wait_ms
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.cache = defaultdict(Counter)
+        self.sqlite_seconds = []
+        self.sqlite_errors = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def error(self, stage: str, message: str):
+        with self._lock:
+            self.errors[f"{stage}: {message[:120]}"] += 1
+
+    def cache_access(self, namespace: str, hit: bool):
+        with self._lock:
+            self.cache[namespace]['hits' if hit else 'misses'] += 1
+
+    def sqlite_statement(self, seconds: float, error: Optional[BaseException] = None):
+        with self._lock:
+            self.sqlite_seconds.append(seconds)
+            if error is not None:
+                self.sqlite_errors[f"{type(error).__name__}: {error}"] += 1
+
+    def summary(self) -> Dict:
+        """
+        計測結果の集計
+
+        Returns:
+            Dict: latency（段階ごとの百分位, ms）, cache（名前空間ごとのヒット率）, sqlite, errors
+        """
+        with self._lock:
+            sqlite_ms = np.array(self.sqlite_seconds) * 1000
+            waits = sqlite_ms[sqlite_ms >= self.lock_wait_ms]
+            return {
+                'latency': {stage: _percentiles(values) for stage, values in sorted(self.latencies.items())},
+                'cache': {
+                    namespace: {
+                        'hits': counts['hits'],
+                        'misses': counts['misses'],
+                        'hit_rate': round(counts['hits'] / (counts['hits'] + counts['misses']), 3),
+                    }
+                    for namespace, counts in sorted(self.cache.items())
+                },
+                'sqlite': {
+                    'statements': len(sqlite_ms),
+                    'statement_ms': _percentiles(sqlite_ms / 1000),
+                    'lock_wait_threshold_ms': self.lock_wait_ms,
+                    'lock_waits': len(waits),
+                    'lock_wait_total_sec': round(float(waits.sum()) / 1000, 3),
+                    'errors': dict(self.sqlite_errors),
+                },
+                'errors': dict(self.errors.most_common()),
+            }
+
+
+def _percentiles(seconds) -> Dict:
+    """所要時間（秒）の件数・平均・百分位（ms）"""
+    if len(seconds) == 0:
+        return {'count': 0}
+    ms = np.asarray(seconds, dtype=float) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'count': len(ms),
+        'mean': round(float(ms.mean()), 1),
+        'p50': round(float(p50), 1),
+        'p95': round(float(p95), 1),
+        'p99': round(float(p99), 1),
+        'max': round(float(ms.max()), 1),
+    }
+
+
+@contextmanager
+def instrument_sqlite(metrics: LoadTestMetrics):
+    """
+    以降に開くSQLite接続の execute / commit の所要時間とエラーを計測する
+
+    SQLiteはロック待ちを文の実行時間に含めるため、閾値を超えた文をロック待ちとして数える
+    （キャッシュ・ジョブ・トークン予算・進捗の各テーブルが同じDBファイルを共有している）
+    """
+    original_connect = sqlite3.connect
+
+    class TimedConnection(sqlite3.Connection):
+        def _timed(self, method, *args):
+            started = time.perf_counter()
+            try:
+                result = method(*args)
+            except sqlite3.Error as e:
+                metrics.sqlite_statement(time.perf_counter() - started, e)
+                raise
+            metrics.sqlite_statement(time.perf_counter() - started)
+            return result
+
+        def execute(self, *args):
+            return self._timed(super().execute, *args)
+
+        def executemany(self, *args):
+            return self._timed(super().executemany, *args)
+
+        def commit(self):
+            return self._timed(super().commit)
+
+    def connect(*args, **kwargs):
+        kwargs.setdefault('factory', TimedConnection)
+        return original_connect(*args, **kwargs)
+
+    sqlite3.connect = connect
+    try:
+        yield
+    finally:
+        sqlite3.connect = original_connect
+
+
+@contextmanager
+def instrument_cache(metrics: LoadTestMetrics):
+    """共有キャッシュの get をヒット/ミスを数える版に差し替える"""
+    cache = get_cache_manager()
+    original_get = cache.get
+
+    def get(namespace, *args, **kwargs):
+        value = original_get(namespace, *args, **kwargs)
+        metrics.cache_access(namespace, value is not None)
+        return value
+
+    cache.get = get
+    try:
+        yield
+    finally:
+        del cache.get
+
+
+class LoadTestJobError(Exception):
+    """負荷試験中のジョブ失敗"""
+
+
+class LoadTest:
+    """複数の模擬ユーザーで 検索 → レビュー収集 → AI分析 を同時実行する負荷試験"""
+
+    def __init__(self, upstreams: StubUpstreams, users: int = 20, iterations: int = 1,
+                 keywords: Optional[List[str]] = None, think_time: float = 1.0, ramp_up: float = 0.0,
+                 review_top_k: int = 3, prefetch_top_k: int = 0, poll_interval: float = 0.5,
+                 job_timeout: float = 300, lock_wait_ms: float = DEFAULT_LOCK_WAIT_MS, seed: int = 0):
+        """
+        初期化
+
+        Args:
+            upstreams (StubUpstreams): 起動済みのスタブ
+            users (int): 同時に操作する模擬ユーザー（セッション）数
+            iterations (int): 各ユーザーが 検索 → レビュー → 分析 を繰り返す回数
+            keywords (list): 検索キーワード（先頭ほど選ばれやすい。省略時は DEFAULT_KEYWORDS）
+            think_time (float): 操作間の平均待ち時間(秒)
+            ramp_up (float): 全ユーザーが開始し終えるまでの秒数
+            review_top_k (int): レビューを収集する上位商品数
+            prefetch_top_k (int): 検索直後にレビューを先読みする件数（0で先読みしない）
+            poll_interval (float): ジョブ状態を確認する間隔(秒)（画面の自動更新に相当）
+            job_timeout (float): 1ジョブの完了を待つ最大秒数
+            lock_wait_ms (float): ロック待ちとみなすSQLite文の実行時間(ms)
+            seed (int): キーワード選択・待ち時間の乱数シード
+        """
+        self.upstreams = upstreams
+        self.users = users
+        self.iterations = iterations
+        self.keywords = keywords or DEFAULT_KEYWORDS
+        self.think_time = think_time
+        self.ramp_up = ramp_up
+        self.review_top_k = review_top_k
+        self.prefetch_top_k = prefetch_top_k
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.seed = seed
+        self.metrics = LoadTestMetrics(lock_wait_ms)
+        # 人気に偏りを持たせる（Zipf分布に近い重み）
+        self._keyword_weights = [1.0 / (rank + 1) for rank in range(len(self.keywords))]
+
+    def run(self) -> Dict:
+        """
+        負荷試験を実行
+
+        Returns:
+            Dict: 設定・所要時間・計測結果・スタブへのリクエスト数
+        """
+        os.environ.update(self.upstreams.environment())
+
+        started = time.perf_counter()
+        with instrument_sqlite(self.metrics), redirect_keepa(self.upstreams.keepa.url), \
+                instrument_cache(self.metrics):
+            runner = get_job_runner()
+            threads = [
+                threading.Thread(target=self._user, args=(runner, i), name=f"loadtest-user-{i}", daemon=True)
+                for i in range(self.users)
+            ]
+            for i, thread in enumerate(threads):
+                thread.start()
+                if self.ramp_up > 0 and i < len(threads) - 1:
+                    time.sleep(self.ramp_up / max(1, self.users - 1))
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        summary = self.metrics.summary()
+        completed = summary['latency'].get('session', {}).get('count', 0)
+        return {
+            'config': {
+                'users': self.users,
+                'iterations': self.iterations,
+                'keywords': self.keywords,
+                'think_time': self.think_time,
+                'ramp_up': self.ramp_up,
+                'review_top_k': self.review_top_k,
+                'prefetch_top_k': self.prefetch_top_k,
+                'job_workers': runner.executor._max_workers,
+                'cache_db': get_cache_manager().db_path,
+            },
+            'elapsed_sec': round(elapsed, 2),
+            'sessions_completed': completed,
+            'sessions_per_min': round(completed / elapsed * 60, 2) if elapsed > 0 else None,
+            **summary,
+            'upstream_requests': self.upstreams.request_counts(),
+        }
+
+    def _user(self, runner, index: int):
+        """1ユーザー分の操作（app.py と同じジョブを同じ順に登録し、完了をポーリング）"""
+        rng = random.Random(self.seed * 1000 + index)
+        owner = f"loadtest-{index}"
+        for _ in range(self.iterations):
+            keyword = rng.choices(self.keywords, weights=self._keyword_weights)[0]
+            started = time.perf_counter()
+            try:
+                search = self._run_job(runner, 'search', search_job, keyword, 'loadtest', 'loadtest',
+                                       DEFAULT_FILTERS, owner=owner, label=keyword,
+                                       prefetch_top_k=self.prefetch_top_k)
+                asins = search['filtered']['asin'].head(self.review_top_k).tolist()
+                self._think(rng)
+
+                # 上位商品のレビュー収集を並行して登録（画面で複数商品を選んだ場合と同じ）
+                review_jobs = {asin: runner.submit('reviews', review_job, asin, 'loadtest', owner=owner, label=asin)
+                               for asin in asins}
+                reviews_by_asin = {asin: self._wait(runner, 'reviews', job_id) for asin, job_id in review_jobs.items()}
+                self._think(rng)
+
+                self._run_job(runner, 'analysis', analysis_job, 'loadtest', reviews_by_asin,
+                              owner=owner, label=keyword)
+                self.metrics.observe('session', time.perf_counter() - started)
+            except LoadTestJobError:
+                pass  # 失敗は _wait で記録済み。次の繰り返しへ
+            except Exception as e:
+                self.metrics.error('session', str(e))
+            self._think(rng)
+
+    def _think(self, rng: random.Random):
+        if self.think_time > 0:
+            time.sleep(rng.uniform(0.5, 1.5) * self.think_time)
+
+    def _run_job(self, runner, kind: str, func, *args, owner: str, label: str, **kwargs):
+        job_id = runner.submit(kind, func, *args, owner=owner, label=label, **kwargs)
+        return self._wait(runner, kind, job_id)
+
+    def _wait(self, runner, kind: str, job_id: str):
+        """
+        ジョブの完了をポーリングで待ち、所要時間（登録から完了まで）とキュー待ち時間を記録
+        （ジョブテーブルの時刻から求めるため、ポーリング間隔の影響を受けない）
+
+        Returns:
+            ジョブの結果（失敗・タイムアウト時は LoadTestJobError）
+        """
+        waited = time.perf_counter()
+        while True:
+            job = runner.get(job_id)
+            if job is not None and not job['active']:
+                break
+            if time.perf_counter() - waited > self.job_timeout:
+                runner.cancel(job_id)
+                self.metrics.error(kind, f"{self.job_timeout:.0f}秒以内に完了しませんでした")
+                raise LoadTestJobError(kind)
+            time.sleep(self.poll_interval)
+
+        if job['finished_at']:
+            self.metrics.observe(kind, job['finished_at'] - job['created_at'])
+        if job['started_at']:
+            self.metrics.observe(f"{kind}_queue", job['started_at'] - job['created_at'])
+        if job['status'] != STATUS_DONE:
+            self.metrics.error(kind, job['error'] or job['status'])
+            raise LoadTestJobError(kind)
+        return runner.result(job_id)
@@ -0,0 +1,172 @@
+"""
+ログ設定モジュール
+print() の代わりにレベル付きの構造化ログを出力する
+
+- モジュールごとのロガー（get_logger(__name__)）。レベルは LOG_LEVEL 環境変数で切替（既定: INFO）
+- 出力形式は LOG_FORMAT 環境変数で text（既定、従来の "[INFO] ..." 形式）/ json（1行1イベント）を切替
+- 出力はキュー経由で専用スレッドが行い、呼び出し側はキューに積むだけ（標準出力のI/Oで処理を待たない）
+- log_event() は ASIN・エンドポイント・レイテンシ・キャッシュヒット・トークン消費などの項目を付けて記録し、
+  同じログを簡易テレメトリとして集計できる
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Optional
+
+# パッケージ共通の親ロガー名（モジュールのロガーはこの配下）
+ROOT_LOGGER_NAME = 'modules'
+
+# 標準のLogRecord属性（これ以外の extra 項目を構造化フィールドとして出力）
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class StructuredFormatter(logging.Formatter):
+    """extra で渡された項目を key=value（text）またはJSONの項目として出力するフォーマッター"""
+
+    def __init__(self, json_format: bool = False):
+        super().__init__()
+        self.json_format = json_format
+
+    @staticmethod
+    def _fields(record: logging.LogRecord) -> dict:
+        return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = self._fields(record)
+
+        if self.json_format:
+            event = {
+                'ts': round(record.created, 3),
+                'level': record.levelname,
+                'logger': record.name,
+                'msg': message,
+            }
+            event.update(fields)
+            if record.exc_info:
+                event['exc'] = self.formatException(record.exc_info)
+            return json.dumps(event, ensure_ascii=False, default=str)
+
+        text = f"[{record.levelname}] {message}"
+        if fields:
+            text += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+def setup_logging(level: Optional[str] = None, json_format: Optional[bool] = None, stream=None):
+    """
+    パッケージのロガーを設定（設定済みの場合は置き換える。CLIの引数で上書きする場合など）
+
+    Args:
+        level (str): ログレベル（省略時は LOG_LEVEL 環境変数、既定 INFO）
+        json_format (bool): JSON Lines形式で出力するか（省略時は LOG_FORMAT=json の場合True）
+        stream: 出力先（省略時は標準出力）
+    """
+    shutdown_logging()
+    _configure(level, json_format, stream)
+
+
+def _configure(level: Optional[str] = None, json_format: Optional[bool] = None, stream=None):
+    """未設定の場合のみ設定"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        level = (level or os.getenv('LOG_LEVEL') or 'INFO').upper()
+        if json_format is None:
+            json_format = os.getenv('LOG_FORMAT', 'text').lower() == 'json'
+
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(StructuredFormatter(json_format=json_format))
+
+        # 呼び出し側はキューに積むだけで、書き込みはリスナースレッドが行う
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(level)
+        root.addHandler(_PassthroughQueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+
+
+@atexit.register
+def shutdown_logging():
+    """キューに残ったログを出力してリスナーを停止"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            root = logging.getLogger(ROOT_LOGGER_NAME)
+            for handler in list(root.handlers):
+                if isinstance(handler, _PassthroughQueueHandler):
+                    root.removeHandler(handler)
+
+
+class _PassthroughQueueHandler(logging.handlers.QueueHandler):
+    """
+    レコードを整形せずにキューへ積むハンドラー
+
+    標準の QueueHandler は積む前にメッセージを整形するが、整形はリスナースレッドで行う
+    （呼び出し側のコストはキューへの追加のみ。引数には呼び出し後に変更されない値を渡すこと）
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    モジュール用のロガーを取得（初回呼び出し時にログ設定を行う）
+
+    Args:
+        name (str): モジュール名（__name__）
+
+    Returns:
+        logging.Logger: ロガー
+    """
+    _configure()
+    if not name.startswith(ROOT_LOGGER_NAME):
+        name = f"{ROOT_LOGGER_NAME}.{name}"
+    return logging.getLogger(name)
+
+
+def log_event(logger: logging.Logger, level: int, message: str, *args, **fields):
+    """
+    構造化フィールド付きでログを記録（レベルが無効な場合は何もしない）
+
+    Args:
+        logger (logging.Logger): ロガー
+        level (int): ログレベル（logging.INFO など）
+        message (str): メッセージ（%形式、整形は出力時に行う）
+        *args: メッセージの引数
+        **fields: 構造化フィールド（asin, endpoint, latency_ms, cache_hit, tokens など）
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, *args, extra=fields, stacklevel=2)
+
+
+class Timer:
+    """レイテンシ計測用（with文で囲んだ区間のミリ秒を latency_ms に保持）"""
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        self.latency_ms = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.latency_ms = round((time.monotonic() - self._started) * 1000, 1)
+        return False
@@ -0,0 +1,366 @@
+"""
+プロファイリングモジュール
+検索・レビュー収集・AI分析の各ステージをプロファイラで計測し、リクエスト単位で保存する（既定では無効）
+
+- RESEARCH_PROFILE=1 で全リクエストを計測。画面のサイドバーからセッション単位でも有効化できる
+- 決定的プロファイラ（cProfile、.prof）とサンプリング（折りたたみスタック、.folded）を保存
+  - .prof は pstats / snakeviz で、.folded は flamegraph.pl / speedscope でそのまま開ける
+- ステージはスレッド単位で計測する（同じスレッドで入れ子になったステージは外側にまとめる）
+- 保存先の合計サイズが上限を超えたら古いリクエストから削除
+"""
+import cProfile
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 有効化する環境変数と、計測方法（'cprofile' / 'sample' / 'all'）
+PROFILE_ENV = 'RESEARCH_PROFILE'
+PROFILE_MODE_ENV = 'RESEARCH_PROFILE_MODE'
+PROFILE_MODES = ('cprofile', 'sample', 'all')
+
+# サンプリング間隔(秒)
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# 保存先ディレクトリの合計サイズ上限（バイト）
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# リクエストのメタ情報ファイル
+META_FILE = 'request.json'
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_depth(frame) -> int:
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+class _StackSampler:
+    """計測中のスレッドのスタックを一定間隔で採取する（全ステージで1スレッドを共有）"""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._targets: Dict[int, tuple] = {}  # スレッドID → (折りたたみスタックのCounter, 採取を始める深さ)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int, stacks: Counter, base_depth: int):
+        with self._lock:
+            self._targets[thread_id] = (stacks, base_depth)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='profile-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, thread_id: int):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _loop(self):
+        while True:
+            # remove() の後に採取結果が書き換わらないよう、採取はロック内で行う
+            with self._lock:
+                if not self._targets:
+                    self._wakeup.clear()
+                else:
+                    frames = sys._current_frames()
+                    for thread_id, (stacks, base_depth) in self._targets.items():
+                        frame = frames.get(thread_id)
+                        labels = []
+                        while frame is not None:
+                            labels.append(_frame_label(frame))
+                            frame = frame.f_back
+                        # ステージに入る前の呼び出し元（共通の外側のフレーム）は除く
+                        labels = labels[:max(len(labels) - base_depth, 1)]
+                        stacks[';'.join(reversed(labels))] += 1
+            if not self._wakeup.is_set():
+                self._wakeup.wait()
+                continue
+            time.sleep(self.interval)
+
+
+class ProfileRecorder:
+    """ステージ単位のプロファイルをリクエストごとのディレクトリに保存するクラス"""
+
+    def __init__(self, directory: Optional[str] = None, enabled: Optional[bool] = None, mode: Optional[str] = None,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        初期化
+
+        Args:
+            directory (str): 保存先（省略時はキャッシュDBと同じディレクトリの profiles/）
+            enabled (bool): 全リクエストを計測するか（省略時は RESEARCH_PROFILE 環境変数）
+            mode (str): 'cprofile'（関数ごとの累計）/ 'sample'（スタックの採取）/ 'all'（省略時は RESEARCH_PROFILE_MODE）
+            sample_interval (float): サンプリング間隔(秒)
+            max_bytes (int): 保存先の合計サイズ上限
+        """
+        if enabled is None:
+            enabled = os.getenv(PROFILE_ENV, '') not in ('', '0', 'false')
+        mode = mode or os.getenv(PROFILE_MODE_ENV) or 'all'
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode は {PROFILE_MODES} のいずれか: {mode}")
+        self.enabled = enabled
+        self.mode = mode
+        self.directory = Path(directory) if directory else Path(get_cache_manager().db_path).parent / 'profiles'
+        self.max_bytes = max_bytes
+        self._sampler = _StackSampler(sample_interval)
+        self._active = threading.local()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_request_id(kind: str) -> str:
+        """
+        リクエストIDを発行（検索以外のレビュー収集・分析用）
+
+        Args:
+            kind (str): 'reviews', 'analysis' など
+
+        Returns:
+            str: リクエストID
+        """
+        return f"{kind}-{uuid.uuid4().hex[:12]}"
+
+    def should_profile(self, requested: Optional[bool] = None) -> bool:
+        """
+        計測するか判定
+
+        Args:
+            requested (bool): 呼び出し側の指定（Noneの場合は環境変数の設定に従う）
+        """
+        return self.enabled if requested is None else (requested or self.enabled)
+
+    @contextmanager
+    def stage(self, request_id: Optional[str], stage: str, enabled: Optional[bool] = None,
+              kind: str = 'search', label: str = '', **attrs):
+        """
+        ステージを計測（無効時・同じスレッドで計測中の場合は何もしない）
+
+        Args:
+            request_id (str): リクエストID（保存単位）
+            stage (str): ステージ名（'keepa_query', 'score' など）
+            enabled (bool): 計測するか（Noneの場合は環境変数の設定に従う）
+            kind (str): リクエストの種類（一覧の表示用）
+            label (str): キーワード・ASINなど（一覧の表示用）
+            **attrs: ステージの属性（件数など）
+        """
+        if not self.should_profile(enabled) or getattr(self._active, 'stage', None) is not None:
+            yield
+            return
+
+        self._active.stage = stage
+        profiler = None
+        if self.mode in ('cprofile', 'all'):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 別のプロファイラが動作中（Python 3.12以降はプロセスで1つのみ）
+                profiler = None
+
+        stacks = Counter()
+        thread_id = threading.get_ident()
+        if self.mode in ('sample', 'all'):
+            # with文を書いた関数より外側のフレームを除く（0: このジェネレータ, 1: contextmanager, 2: with文の関数）
+            self._sampler.add(thread_id, stacks, _stack_depth(sys._getframe(2)) - 1)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            self._sampler.remove(thread_id)
+            self._active.stage = None
+            try:
+                self._save(request_id or 'unknown', stage, kind, label, attrs, started_at, wall, profiler, stacks)
+            except Exception as e:
+                # プロファイルの保存失敗で本処理に影響させない
+                logger.warning("プロファイルの保存に失敗: %s", e)
+
+    def _save(self, request_id: str, stage: str, kind: str, label: str, attrs: Dict, started_at: float,
+              wall: float, profiler: Optional[cProfile.Profile], stacks: Counter):
+        request_dir = self.directory / request_id
+        request_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._seq += 1
+            name = f"{self._seq:06d}_{stage}"
+
+        record = {
+            'stage': stage,
+            'name': name,
+            'started_at': started_at,
+            'wall_ms': round(wall * 1000, 1),
+            'thread': threading.current_thread().name,
+            'attrs': attrs,
+        }
+        if profiler is not None:
+            profiler.dump_stats(str(request_dir / f"{name}.prof"))
+            record['prof'] = f"{name}.prof"
+        if stacks:
+            with open(request_dir / f"{name}.folded", 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+            record['folded'] = f"{name}.folded"
+            record['samples'] = sum(stacks.values())
+
+        # 同じリクエストのステージは並行して終わるため、メタ情報の更新はロック内で行う
+        with self._lock:
+            meta_path = request_dir / META_FILE
+            if meta_path.exists():
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            else:
+                meta = {'request_id': request_id, 'kind': kind, 'label': label, 'created_at': started_at,
+                        'stages': []}
+            meta['stages'].append(record)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            self._rotate(keep=request_dir)
+
+    def _rotate(self, keep: Path):
+        """合計サイズが上限を超えた場合、古いリクエストのディレクトリから削除"""
+        request_dirs = []
+        total = 0
+        for request_dir in self.directory.iterdir():
+            if not request_dir.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in request_dir.iterdir())
+            request_dirs.append((request_dir.stat().st_mtime, size, request_dir))
+            total += size
+
+        for mtime, size, request_dir in sorted(request_dirs):
+            if total <= self.max_bytes:
+                break
+            if request_dir == keep:  # 書き込み中のリクエストは削除しない
+                continue
+            shutil.rmtree(request_dir, ignore_errors=True)
+            total -= size
+
+    def list_requests(self) -> List[Dict]:
+        """保存済みリクエストのメタ情報（新しい順）"""
+        if not self.directory.exists():
+            return []
+        metas = []
+        for meta_path in self.directory.glob(f"*/{META_FILE}"):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    metas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(metas, key=lambda m: m['created_at'], reverse=True)
+
+    def load_request(self, request_id: str) -> Optional[Dict]:
+        """
+        リクエストのメタ情報を読み込む
+
+        Returns:
+            Dict: request_id, kind, label, created_at, stages（保存されていない場合はNone）
+        """
+        meta_path = self.directory / request_id / META_FILE
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_stats(self, request_id: str, stage: Optional[str] = None) -> Optional[pstats.Stats]:
+        """
+        cProfile の結果を読み込む（同じステージが複数回ある場合は合算）
+
+        Args:
+            request_id (str): リクエストID
+            stage (str): ステージ名（省略時は全ステージ）
+
+        Returns:
+            pstats.Stats: 合算した統計（保存されていない場合はNone）
+        """
+        paths = [str(self.directory / request_id / record['prof'])
+                 for record in self._records(request_id, stage) if 'prof' in record]
+        if not paths:
+            return None
+        return pstats.Stats(*paths)
+
+    def load_folded(self, request_id: str, stage: Optional[str] = None) -> Counter:
+        """
+        折りたたみスタックを読み込む（同じステージが複数回ある場合は合算）
+
+        Returns:
+            Counter: 折りたたみスタック（'呼び出し元;...;関数'）→ サンプル数
+        """
+        stacks = Counter()
+        for record in self._records(request_id, stage):
+            if 'folded' not in record:
+                continue
+            with open(self.directory / request_id / record['folded'], 'r', encoding='utf-8') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stacks[stack] += int(count)
+        return stacks
+
+    def _records(self, request_id: str, stage: Optional[str]) -> List[Dict]:
+        meta = self.load_request(request_id) or {'stages': []}
+        return [record for record in meta['stages'] if stage is None or record['stage'] == stage]
+
+
+def stats_rows(stats: pstats.Stats, limit: int = 30, sort: str = 'cumulative') -> List[Dict]:
+    """
+    pstats の統計を表示用の行に変換
+
+    Args:
+        stats (pstats.Stats): load_stats() の戻り値
+        limit (int): 最大行数
+        sort (str): 'cumulative'（呼び出し先を含む時間）/ 'tottime'（関数自身の時間）
+
+    Returns:
+        List[Dict]: function, calls, tottime_ms, cumtime_ms
+    """
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    key = 'cumtime_ms' if sort == 'cumulative' else 'tottime_ms'
+    return sorted(rows, key=lambda row: row[key], reverse=True)[:limit]
+
+
+# グローバルプロファイラ(シングルトン)
+_profiler_instance = None
+_profiler_lock = threading.Lock()
+
+def get_profiler():
+    """
+    プロファイル記録のシングルトンインスタンス取得
+
+    Returns:
+        ProfileRecorder インスタンス
+    """
+    global _profiler_instance
+    with _profiler_lock:
+        if _profiler_instance is None:
+            _profiler_instance = ProfileRecorder()
+    return _profiler_instance
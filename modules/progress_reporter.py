@@ -0,0 +1,176 @@
+"""
+進捗レポーター
+ループ内の細かい進捗報告を間引いて表示先（シンク）へ送る
+
+- advance() はカウンタを進めるだけで、表示先への送信は min_interval 秒に1回まで
+- 並行するワーカーは task() で個別の進捗を持ち、全体の進捗は合計で表示
+- 表示先はログ出力・任意のコールバック（ジョブの状態更新など）から選択し、省略時は何もしない
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 表示先へ送る最小間隔(秒)
+DEFAULT_MIN_INTERVAL = 0.5
+
+
+class NullProgressSink:
+    """何も表示しないシンク（表示先を省略した場合の既定値）"""
+
+    def emit(self, progress: Optional[float], message: str):
+        pass
+
+    def flush(self):
+        pass
+
+
+class LoggingProgressSink:
+    """進捗をログ出力するシンク（バッチ・CLI用）"""
+
+    def __init__(self, label: str = "進捗", level: int = logging.INFO):
+        """
+        初期化
+
+        Args:
+            label (str): ログの先頭に付ける名前
+            level (int): ログレベル
+        """
+        self.label = label
+        self.level = level
+
+    def emit(self, progress: Optional[float], message: str):
+        if progress is None:
+            logger.log(self.level, "%s: %s", self.label, message)
+        else:
+            logger.log(self.level, "%s: %s (%d%%)", self.label, message, int(progress * 100))
+
+    def flush(self):
+        pass
+
+
+class CallbackProgressSink:
+    """進捗を (進捗率, メッセージ) のコールバックへ渡すシンク（ジョブの状態更新など）"""
+
+    def __init__(self, callback: Callable[[Optional[float], str], None]):
+        self.callback = callback
+
+    def emit(self, progress: Optional[float], message: str):
+        self.callback(progress, message)
+
+    def flush(self):
+        pass
+
+
+class ProgressTask:
+    """並行ワーカー1つ分の進捗（全体の進捗は ProgressReporter が合計）"""
+
+    def __init__(self, reporter: 'ProgressReporter', total: int):
+        self.reporter = reporter
+        self.total = total
+        self.done = 0
+
+    def advance(self, n: int = 1, message: Optional[str] = None):
+        """
+        進捗を進める（このタスクの総数を超えた分は数えない）
+
+        Args:
+            n (int): 完了した件数
+            message (str): 表示するメッセージ（Noneの場合は据え置き）
+        """
+        n = min(n, self.total - self.done)
+        if n <= 0:
+            return
+        self.done += n
+        self.reporter.advance(n, message)
+
+    def finish(self, message: Optional[str] = None):
+        """タスクを完了扱いにする（件数が目標に届かなかった場合も残りを消化）"""
+        self.advance(self.total - self.done, message)
+
+
+class ProgressReporter:
+    """間引き付きのスレッドセーフな進捗レポーター"""
+
+    def __init__(self, sink=None, total: int = 0, message: str = "",
+                 min_interval: float = DEFAULT_MIN_INTERVAL):
+        """
+        初期化
+
+        Args:
+            sink: 表示先（省略時は何もしない）
+            total (int): 総件数（0の場合は件数のみ表示。task() で後から加算される）
+            message (str): 初期メッセージ
+            min_interval (float): 表示先へ送る最小間隔(秒)
+        """
+        self.sink = sink or NullProgressSink()
+        self.total = total
+        self.done = 0
+        self.message = message
+        self.min_interval = min_interval
+        self._next_emit = 0.0
+        self._lock = threading.Lock()
+
+    def task(self, total: int) -> ProgressTask:
+        """
+        並行ワーカー用のタスクを追加（総件数に加算）
+
+        Args:
+            total (int): このタスクの総件数
+
+        Returns:
+            ProgressTask: ワーカーが advance() するハンドル
+        """
+        with self._lock:
+            self.total += total
+        return ProgressTask(self, total)
+
+    def advance(self, n: int = 1, message: Optional[str] = None):
+        """
+        進捗を進める（前回の表示から min_interval 秒経っていない場合はカウンタのみ更新）
+
+        Args:
+            n (int): 完了した件数
+            message (str): 表示するメッセージ（Noneの場合は据え置き）
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.done += n
+            if message is not None:
+                self.message = message
+            if now < self._next_emit:
+                return
+            self._next_emit = now + self.min_interval
+            progress, text = self._snapshot()
+        self.sink.emit(progress, text)
+
+    def _snapshot(self):
+        """現在の進捗率と表示テキスト（ロック内で呼ぶ）"""
+        if self.total > 0:
+            progress = min(self.done / self.total, 1.0)
+            return progress, f"{self.message}（{min(self.done, self.total)}/{self.total}）"
+        return None, f"{self.message}（{self.done}件）"
+
+    def flush(self):
+        """間引かれていた最新の進捗を表示先へ送る"""
+        with self._lock:
+            self._next_emit = time.monotonic() + self.min_interval
+            progress, text = self._snapshot()
+        self.sink.emit(progress, text)
+        self.sink.flush()
+
+    def close(self, message: Optional[str] = None):
+        """
+        最終状態を表示（間引きに関わらず必ず送信）
+
+        Args:
+            message (str): 完了メッセージ（Noneの場合は据え置き）
+        """
+        if message is not None:
+            with self._lock:
+                self.message = message
+        self.flush()
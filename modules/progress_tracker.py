@@ -1,29 +1,207 @@
 """
 進捗トラッカー
-API呼び出しやデータ処理の進捗を視覚化
+API呼び出しやデータ処理の進捗を視覚化し、ステージごとの所要時間を計測する
+
+- stage() で名前付きステージの実時間を計測（並行するステージも可）
+- span() でステージ内のサブステップ（ページ・バッチ・商品単位の取得）を計測
+- 計測結果はSQLiteに保存し、過去の所要時間の中央値から残り時間（ETA）を表示
 """
+import json
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
 import streamlit as st
-from typing import Optional
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class StageMetricsStore:
+    """ステージ計測結果（スパン）の保存先"""
+
+    def __init__(self, db_path: Optional[str] = None, log_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            db_path (str): SQLiteファイル（省略時はキャッシュと同じDB）
+            log_path (str): 指定した場合、スパンをJSON Lines形式でも追記
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self.log_path = log_path
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """スパンテーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_spans (
+                    trace_id TEXT NOT NULL,
+                    kind TEXT,
+                    span_id TEXT NOT NULL,
+                    parent_id TEXT,
+                    name TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    attrs TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_stage_spans_kind ON stage_spans(kind, name, started_at)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def write(self, spans: List[Dict]):
+        """
+        スパンを保存
+
+        Args:
+            spans (List[Dict]): ProgressTracker が記録したスパン
+        """
+        if not spans:
+            return
+
+        conn = self._connect()
+        try:
+            conn.executemany("""
+                INSERT INTO stage_spans (trace_id, kind, span_id, parent_id, name, started_at, duration, attrs)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (s['trace_id'], s['kind'], s['span_id'], s['parent_id'], s['name'],
+                 s['started_at'], s['duration'], json.dumps(s['attrs'], ensure_ascii=False))
+                for s in spans
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                for span in spans:
+                    f.write(json.dumps(span, ensure_ascii=False) + '\n')
+
+    def stage_durations(self, kind: str, recent: int = 50) -> Dict[str, float]:
+        """
+        ステージごとの所要時間の中央値（ETA計算用）
+
+        Args:
+            kind (str): 計測の種類（'search' など）
+            recent (int): ステージごとに直近何件を使うか
+
+        Returns:
+            Dict[str, float]: ステージ名 → 中央値(秒)
+        """
+        return {name: stats['p50'] for name, stats in self.summary(kind, recent, top_level=True).items()}
+
+    def summary(self, kind: str, recent: int = 200, top_level: bool = False) -> Dict[str, Dict]:
+        """
+        スパン名ごとの所要時間の統計（どこに時間がかかっているかの確認用）
+
+        Args:
+            kind (str): 計測の種類
+            recent (int): スパン名ごとに直近何件を使うか
+            top_level (bool): Trueの場合はステージ（親の無いスパン）のみ
+
+        Returns:
+            Dict[str, Dict]: スパン名 → {'count', 'p50', 'p95', 'total'}
+        """
+        query = """
+            SELECT name, duration FROM (
+                SELECT name, duration,
+                       ROW_NUMBER() OVER (PARTITION BY name ORDER BY started_at DESC) AS rn
+                FROM stage_spans
+                WHERE kind = ? {parent_filter}
+            )
+            WHERE rn <= ?
+        """.format(parent_filter="AND parent_id IS NULL" if top_level else "")
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, (kind, recent)).fetchall()
+        finally:
+            conn.close()
+
+        durations: Dict[str, List[float]] = {}
+        for name, duration in rows:
+            durations.setdefault(name, []).append(duration)
+
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            result[name] = {
+                'count': len(values),
+                'p50': statistics.median(values),
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'total': sum(values),
+            }
+        return result
+
 
 class ProgressTracker:
-    """リアルタイムプログレスバー"""
+    """リアルタイムプログレスバー（ステージ計測・ETA表示付き）"""
+
+    def __init__(
+        self,
+        kind: Optional[str] = None,
+        on_update: Optional[Callable[[float, str], None]] = None,
+        store: Optional[StageMetricsStore] = None
+    ):
+        """
+        初期化
 
-    def __init__(self):
+        Args:
+            kind: 計測の種類（'search' など）。指定時は完了時にスパンを保存し、過去の実績からETAを表示
+            on_update: 進捗の表示先（Streamlitの代わりに (進捗率, メッセージ) を受け取る。バックグラウンドジョブ用）
+            store: スパンの保存先（省略時は共有ストア）
+        """
         self.progress_bar: Optional[st.delta_generator.DeltaGenerator] = None
         self.status_text: Optional[st.delta_generator.DeltaGenerator] = None
         self.current_step: int = 0
         self.total_steps: int = 0
 
-    def start(self, total_steps: int, container=None):
+        self.kind = kind
+        self.on_update = on_update
+        self.store = store
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Dict] = []
+        self._open_stages: Dict[str, float] = {}  # 実行中ステージ名 → 開始時刻
+        self._done_stages = set()
+        self._expected: Dict[str, float] = {}     # ステージ名 → 過去の所要時間の中央値
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self, total_steps: int, container=None, stages: Optional[List[str]] = None):
         """
         進捗追跡を開始
 
         Args:
             total_steps: 総ステップ数
             container: Streamlitコンテナ（オプション）
+            stages: ETA計算に使うステージ名（過去の計測がある場合のみ有効）
         """
         self.total_steps = total_steps
         self.current_step = 0
+        self._started_at = time.monotonic()
+
+        if self.kind and stages:
+            history = self._get_store().stage_durations(self.kind)
+            self._expected = {name: history[name] for name in stages if name in history}
+
+        if self.on_update is not None:
+            return
 
         if container:
             self.progress_bar = container.progress(0)
@@ -32,6 +210,34 @@ class ProgressTracker:
             self.progress_bar = st.progress(0)
             self.status_text = st.empty()
 
+    def _get_store(self) -> StageMetricsStore:
+        if self.store is None:
+            self.store = get_stage_metrics_store()
+        return self.store
+
+    def _render(self, progress: float, message: str, text: str):
+        """
+        進捗を表示先へ反映
+
+        コールバックにはメッセージのみ（表示側で進捗率を付ける）、Streamlitには整形済みテキストを渡す
+        """
+        if self.on_update is not None:
+            self.on_update(progress, message)
+            return
+
+        if self.progress_bar:
+            self.progress_bar.progress(progress)
+
+        if self.status_text:
+            self.status_text.text(text)
+
+    def _with_eta(self, message: str) -> str:
+        """過去の実績がある場合はメッセージに残り時間を付ける"""
+        eta = self.eta()
+        if eta is None:
+            return message
+        return f"{message}（残り約{int(eta) + 1}秒）"
+
     def update(self, message: str, increment: int = 1):
         """
         進捗を更新
@@ -41,14 +247,134 @@ class ProgressTracker:
             increment: 増加ステップ数（デフォルト: 1）
         """
         self.current_step += increment
-        progress = min(self.current_step / self.total_steps, 1.0)
+        progress = min(self.current_step / self.total_steps, 1.0) if self.total_steps else 0.0
 
-        if self.progress_bar:
-            self.progress_bar.progress(progress)
+        message = self._with_eta(message)
+        percentage = int(progress * 100)
+        self._render(progress, message, f"⏳ {message} ({self.current_step}/{self.total_steps}) - {percentage}%")
 
-        if self.status_text:
-            percentage = int(progress * 100)
-            self.status_text.text(f"⏳ {message} ({self.current_step}/{self.total_steps}) - {percentage}%")
+    def show(self, progress: float, message: str):
+        """
+        進捗率を直接指定して表示（バックグラウンドジョブのポーリング表示用）
+
+        Args:
+            progress: 進捗率（0.0〜1.0）
+            message: 表示するメッセージ
+        """
+        progress = min(max(progress, 0.0), 1.0)
+        self._render(progress, message, f"⏳ {message} - {int(progress * 100)}%")
+
+    @contextmanager
+    def stage(self, name: str, **attrs):
+        """
+        名前付きステージの実時間を計測
+
+        Args:
+            name: ステージ名
+            **attrs: スパンに保存する属性（件数など）
+
+        Yields:
+            Dict: スパン（サブステップの親として span() に渡す）
+        """
+        with self._lock:
+            self._open_stages[name] = time.monotonic()
+        try:
+            with self.span(name, **attrs) as span:
+                yield span
+        finally:
+            with self._lock:
+                self._open_stages.pop(name, None)
+                self._done_stages.add(name)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Dict] = None, **attrs):
+        """
+        サブステップの実時間を計測（スレッドセーフ、ワーカースレッドから呼んでよい）
+
+        Args:
+            name: サブステップ名（'keepa_batch' など）
+            parent: 親スパン（stage() の戻り値）
+            **attrs: スパンに保存する属性
+
+        Yields:
+            Dict: スパン（attrsに結果を追記できる）
+        """
+        span = {
+            'trace_id': self.trace_id,
+            'kind': self.kind,
+            'span_id': uuid.uuid4().hex[:16],
+            'parent_id': parent['span_id'] if parent else None,
+            'name': name,
+            'started_at': time.time(),
+            'duration': 0.0,
+            'attrs': dict(attrs),
+        }
+        started = time.monotonic()
+        try:
+            yield span
+        except BaseException as e:
+            span['attrs']['error'] = type(e).__name__
+            raise
+        finally:
+            span['duration'] = time.monotonic() - started
+            with self._lock:
+                self.spans.append(span)
+
+    def eta(self) -> Optional[float]:
+        """
+        過去の所要時間の中央値から残り時間を推定
+
+        Returns:
+            float: 推定残り秒数（過去の計測が無い場合はNone）
+        """
+        if not self._expected:
+            return None
+
+        now = time.monotonic()
+        running = 0.0  # 実行中のステージは並行し得るため最長のもの
+        pending = 0.0  # 未開始のステージは順に実行される前提で合計
+        with self._lock:
+            for name, expected in self._expected.items():
+                if name in self._done_stages:
+                    continue
+                started = self._open_stages.get(name)
+                if started is None:
+                    pending += expected
+                else:
+                    running = max(running, expected - (now - started))
+        return max(running, 0.0) + pending
+
+    def export(self, status: str = 'ok'):
+        """
+        記録したスパンを保存（全体の所要時間も 'total' として記録）
+
+        Args:
+            status: 完了状態（'ok' / 'error'）
+        """
+        if not self.kind:
+            return
+
+        with self._lock:
+            spans = list(self.spans)
+            self.spans = []
+
+        if self._started_at is not None:
+            spans.append({
+                'trace_id': self.trace_id,
+                'kind': self.kind,
+                'span_id': uuid.uuid4().hex[:16],
+                'parent_id': None,
+                'name': 'total',
+                'started_at': time.time() - (time.monotonic() - self._started_at),
+                'duration': time.monotonic() - self._started_at,
+                'attrs': {'status': status},
+            })
+
+        try:
+            self._get_store().write(spans)
+        except Exception as e:
+            # 計測の保存失敗で本処理を失敗させない
+            logger.warning("ステージ計測の保存に失敗: %s", e)
 
     def complete(self, message: str = "✅ 完了！"):
         """
@@ -57,6 +383,12 @@ class ProgressTracker:
         Args:
             message: 完了メッセージ
         """
+        self.export('ok')
+
+        if self.on_update is not None:
+            self.on_update(1.0, message)
+            return
+
         if self.progress_bar:
             self.progress_bar.progress(1.0)
 
@@ -70,6 +402,12 @@ class ProgressTracker:
         Args:
             message: エラーメッセージ
         """
+        self.export('error')
+
+        if self.on_update is not None:
+            self.on_update(None, f"❌ {message}")
+            return
+
         if self.status_text:
             self.status_text.error(f"❌ {message}")
 
@@ -89,3 +427,21 @@ def create_progress_container():
         Streamlitコンテナ
     """
     return st.container()
+
+
+# グローバル計測ストア(シングルトン)
+_metrics_store_instance = None
+_metrics_store_lock = threading.Lock()
+
+def get_stage_metrics_store():
+    """
+    ステージ計測ストアのシングルトンインスタンス取得
+
+    Returns:
+        StageMetricsStore インスタンス
+    """
+    global _metrics_store_instance
+    with _metrics_store_lock:
+        if _metrics_store_instance is None:
+            _metrics_store_instance = StageMetricsStore()
+    return _metrics_store_instance
@@ -6,51 +6,424 @@ RainforestAPIを使用してAmazonレビューを取得するモジュール
 - 低評価優先ソート対応
 - レビュー全文取得対応
 """
+import logging
+import os
 import requests
+import threading
 import time
-from typing import List, Dict, Callable, Optional
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional
+from .cache_manager import get_cache_manager
+from .deadline import Deadline, DeadlineExceeded, OperationCancelled, ensure_deadline
+from .fixtures import wrap_session
+from .logging_config import Timer, get_logger, log_event
+from .profiling import get_profiler
+from .progress_reporter import ProgressReporter
+
+logger = get_logger(__name__)
+
+# 接続先（RAINFOREST_API_URL 環境変数で負荷試験用のスタブなどに切り替え可能）
+RAINFOREST_API_URL = 'https://api.rainforestapi.com/request'
+
+# 収集済みレビューのキャッシュ有効期限（時間）
+REVIEW_CACHE_TTL_HOURS = 24
+
+# ヘッジ（reviewsエンドポイントが遅い場合にproductエンドポイントを並行実行）の設定
+HEDGE_PERCENTILE = 95        # この百分位の応答時間を超えたらヘッジを開始
+HEDGE_MIN_SAMPLES = 20       # 百分位を信頼するのに必要な観測数
+HEDGE_DEFAULT_DELAY = 20.0   # 観測が少ない間のヘッジ開始秒数
+HEDGE_BUDGET_RATIO = 0.1     # ヘッジはリクエスト数の最大10%まで（+バースト1回）
+
+
+class LatencyTracker:
+    """直近の応答時間とヘッジ予算を管理するクラス（スレッドセーフ）"""
+
+    def __init__(self, window: int = 200, budget_ratio: float = HEDGE_BUDGET_RATIO):
+        """
+        初期化
+
+        Args:
+            window (int): 百分位の計算に使う直近の観測数
+            budget_ratio (float): リクエスト数に対するヘッジ数の上限比率
+        """
+        self.budget_ratio = budget_ratio
+        self._samples = deque(maxlen=window)
+        self._requests = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """成功したリクエストの応答時間を記録"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        応答時間の百分位を取得
+
+        Returns:
+            float: 百分位の秒数（観測数が HEDGE_MIN_SAMPLES 未満の場合はNone）
+        """
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+    def hedge_delay(self, p: float = HEDGE_PERCENTILE) -> float:
+        """ヘッジを開始するまでの待ち秒数"""
+        delay = self.percentile(p)
+        return delay if delay is not None else HEDGE_DEFAULT_DELAY
+
+    def record_request(self):
+        """リクエスト1回を計上（ヘッジ予算の分母）"""
+        with self._lock:
+            self._requests += 1
+
+    def try_acquire_hedge(self) -> bool:
+        """ヘッジ予算が残っていれば1回分を消費してTrue"""
+        with self._lock:
+            if self._hedges + 1 > self._requests * self.budget_ratio + 1:
+                return False
+            self._hedges += 1
+            return True
+
+    def snapshot(self) -> Dict:
+        """現在の統計（表示・調整用）"""
+        with self._lock:
+            requests_count, hedges = self._requests, self._hedges
+        return {
+            'requests': requests_count,
+            'hedges': hedges,
+            'hedge_delay': self.hedge_delay(),
+        }
+
+
+# reviewsエンドポイントの応答時間（プロセス内の全コレクターで共有）
+review_latency = LatencyTracker()
+
+# 同時に実行する本リクエスト数の既定値（ヘッジも同数まで）
+DEFAULT_REVIEW_CONCURRENCY = 8
+
+# 本リクエスト・ヘッジのスレッドプール（同時実行数ごとにプロセス内で共有）
+# 負けた側は送信中のリクエストを中断できずスレッドを保持するため、本リクエストとヘッジでプールを分ける
+_executors: Dict[int, tuple] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executors(concurrency: int) -> tuple:
+    """
+    同時実行数に応じたスレッドプールを取得
+
+    Args:
+        concurrency (int): 同時に実行する本リクエスト数
+
+    Returns:
+        tuple: (本リクエスト用, ヘッジ用)のThreadPoolExecutor
+    """
+    with _executors_lock:
+        if concurrency not in _executors:
+            _executors[concurrency] = (
+                ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='review-primary'),
+                ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='review-hedge'),
+            )
+        return _executors[concurrency]
+
+
+def _run_started(started: threading.Event, fn, *args):
+    """実行開始を通知してから fn を実行（キュー待ちの時間をヘッジの待ち時間に含めない）"""
+    started.set()
+    return fn(*args)
 
 
 class ReviewCollector:
     """RainforestAPI レビュー取得クラス（reviewsエンドポイント）"""
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, hedge: bool = True, hedge_percentile: float = HEDGE_PERCENTILE,
+                 profile: Optional[bool] = None, max_concurrency: int = DEFAULT_REVIEW_CONCURRENCY):
         """
         初期化
 
         Args:
             api_key (str): RainforestAPI APIキー
+            hedge (bool): reviewsエンドポイントが遅い場合にproductエンドポイントを並行実行するか
+            hedge_percentile (float): ヘッジを開始する応答時間の百分位
+            profile (bool): レビュー収集のプロファイルを記録するか（Noneは RESEARCH_PROFILE 環境変数に従う）
+            max_concurrency (int): 同時に実行する本リクエスト数（同じ値のコレクター間でスレッドプールを共有）
         """
         self.api_key = api_key
-        self.base_url = 'https://api.rainforestapi.com/request'
+        self.base_url = os.getenv('RAINFOREST_API_URL') or RAINFOREST_API_URL
+        self.cache = get_cache_manager()  # キャッシュマネージャー
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.profile = profile
+        self.profiler = get_profiler()
+        self._primary_executor, self._hedge_executor = _get_executors(max_concurrency)
+
+    def _profile_stage(self, profile_id: Optional[str], stage: str, asin: str):
+        """レビュー収集のステージをプロファイル（profile_id が None の場合は何もしない）"""
+        if profile_id is None:
+            return nullcontext()
+        return self.profiler.stage(profile_id, stage, enabled=True, kind='reviews', label=asin)
+
+    def get_cached_reviews(self, asin: str, target_count: int = 50, sort_by: str = 'recent') -> Optional[List[Dict]]:
+        """
+        キャッシュ済みのレビューを取得（APIは呼ばない）
+
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+            target_count (int): 取得目標件数
+            sort_by (str): ソート順
+
+        Returns:
+            List[Dict]: キャッシュ済みレビュー（未取得の場合はNone）
+        """
+        return self.cache.get('rainforest_reviews', ttl_hours=REVIEW_CACHE_TTL_HOURS,
+                              asin=asin, target_count=target_count, sort_by=sort_by)
 
     def collect_reviews(
         self,
         asin: str,
         target_count: int = 50,
-        progress_callback: Optional[Callable] = None,
-        sort_by: str = 'recent'
+        progress: Optional[ProgressReporter] = None,
+        sort_by: str = 'recent',
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
     ) -> List[Dict]:
         """
-        指定ASINのレビューを取得（reviewsエンドポイント）
+        指定ASINのレビューを取得（reviewsエンドポイント、キャッシュ対応）
 
         Args:
             asin (str): Amazon商品ID (ASIN)
             target_count (int): 取得目標件数（デフォルト50件、最大50件）
-            progress_callback (callable): プログレスバー更新用コールバック関数
+            progress (ProgressReporter): 進捗の報告先（複数商品の並行収集では共有して合計を表示）
             sort_by (str): ソート順（'recent': 最新順、'helpful': 役立つ順）
+            use_cache (bool): Falseの場合キャッシュを無視して再取得
+            deadline (Deadline): 持ち時間（超過時はDeadlineExceeded、Noneは無制限）
 
         Returns:
             List[Dict]: レビューデータのリスト
         """
-        print(f"[INFO] レビュー収集開始（reviewsエンドポイント）: ASIN={asin}")
-        reviews = []
+        if use_cache:
+            cached = self.get_cached_reviews(asin, target_count, sort_by)
+            if cached is not None:
+                log_event(logger, logging.INFO, "キャッシュからレビューを取得", endpoint='rainforest_reviews',
+                          asin=asin, cache_hit=True, reviews=len(cached))
+                return cached
+
+        task = progress.task(target_count) if progress is not None else None
+        profile_id = self.profiler.new_request_id('reviews') if self.profiler.should_profile(self.profile) else None
+        with self._profile_stage(profile_id, 'collect_reviews', asin):
+            reviews, source = self._collect_reviews_uncached(asin, target_count, sort_by, deadline, profile_id)
+        if task is not None:
+            task.finish(f"ASIN={asin}: {len(reviews)}件のレビューを取得")
+
+        # 空の結果はキャッシュしない（一時的な失敗の可能性があるため）
+        # productエンドポイントの結果は上位数件のみ（指定したソート順・件数ではない）ため、キャッシュせず次回は再取得する
+        if len(reviews) > 0 and source == 'reviews':
+            self.cache.set(reviews, 'rainforest_reviews', ttl_hours=REVIEW_CACHE_TTL_HOURS,
+                           asin=asin, target_count=target_count, sort_by=sort_by)
+        elif source == 'product':
+            log_event(logger, logging.INFO, "productエンドポイントの結果のためキャッシュしません",
+                      endpoint='rainforest_product', asin=asin, reviews=len(reviews))
+        return reviews
+
+    def _collect_reviews_uncached(
+        self,
+        asin: str,
+        target_count: int,
+        sort_by: str,
+        deadline: Optional[Deadline] = None,
+        profile_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        reviewsエンドポイントからレビューを取得（ヘッジ付き）
+
+        reviewsエンドポイントが過去の応答時間の百分位を超えても返らない場合、
+        productエンドポイントを並行実行し、先に成功した方を採用する。
+        reviewsエンドポイントが失敗した場合は従来どおりproductエンドポイントへフォールバック
 
-        # プログレスバー初期化
-        if progress_callback:
-            progress_bar = progress_callback(0)
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+            target_count (int): 取得目標件数
+            sort_by (str): ソート順
+            deadline (Deadline): 持ち時間（Noneは無制限）
+            profile_id (str): プロファイルの保存単位（Noneは記録しない）
+
+        Returns:
+            tuple: (レビューデータのリスト, 採用したエンドポイント 'reviews' / 'product')
+        """
+        logger.debug("レビュー収集開始（reviewsエンドポイント）: ASIN=%s", asin)
+        deadline = ensure_deadline(deadline)
+        deadline.check()
+
+        review_latency.record_request()
+        primary_session = wrap_session(requests.Session())
+        started = threading.Event()
+        primary = self._primary_executor.submit(
+            _run_started, started, self._fetch_from_reviews_endpoint,
+            asin, target_count, sort_by, primary_session, deadline, profile_id
+        )
+        # ヘッジまでの待ち時間は、プールの空きを待った後の実際の送信開始から数える
+        hedge_delay = review_latency.hedge_delay(self.hedge_percentile)
+        try:
+            self._wait_started(started, primary, deadline)
+            done = self._wait_until(primary, hedge_delay if self.hedge else 0, deadline)
+        except OperationCancelled:
+            primary.cancel()
+            primary_session.close()
+            raise
+
+        if not done and self.hedge and not deadline.expired() and review_latency.try_acquire_hedge():
+            # 本リクエストが遅い: productエンドポイントを並行実行して先着を採用
+            log_event(logger, logging.INFO, "reviewsエンドポイントが%.1f秒以内に応答しないため、productエンドポイントを並行実行します",
+                      hedge_delay, asin=asin, hedge=True)
+            hedge_session = wrap_session(requests.Session())
+            hedge = self._hedge_executor.submit(self._fallback_collect_from_product, asin, hedge_session, deadline,
+                                                profile_id)
+            return self._first_success(primary, primary_session, hedge, hedge_session, deadline)
 
         try:
+            return self._result_within(primary, primary_session, deadline), 'reviews'
+        except (DeadlineExceeded, OperationCancelled):
+            raise
+        except Exception as e:
+            # フォールバック: productエンドポイントを試す
+            logger.warning("reviewsエンドポイント失敗、productエンドポイントを試します: %s", e)
+            return self._fallback_collect_from_product(asin, deadline=deadline, profile_id=profile_id), 'product'
+        finally:
+            primary_session.close()
+
+    @staticmethod
+    def _wait_timeout(deadline: Deadline, timeout: Optional[float]) -> float:
+        """待機時間を持ち時間の残りで打ち切る（キャンセル確認のため最大1秒ずつ待つ）"""
+        remaining = deadline.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return 1.0 if timeout is None else min(timeout, 1.0)
+
+    def _wait_started(self, started: threading.Event, future, deadline: Deadline):
+        """本リクエストが実行を開始する（または終了する）まで待つ。持ち時間切れで打ち切り、キャンセル時は例外"""
+        while not started.wait(self._wait_timeout(deadline, None)):
+            if future.done() or deadline.expired():
+                return
+            deadline.cancel_token.raise_if_cancelled()
+
+    def _wait_until(self, future, seconds: float, deadline: Deadline) -> bool:
+        """最大seconds秒（持ち時間の残りまで）完了を待つ。キャンセル時は例外"""
+        until = time.monotonic() + seconds
+        while not future.done():
+            remaining = until - time.monotonic()
+            if remaining <= 0 or deadline.expired():
+                break
+            wait([future], timeout=self._wait_timeout(deadline, remaining))
+            deadline.cancel_token.raise_if_cancelled()
+        return future.done()
+
+    def _result_within(self, future, session: requests.Session, deadline: Deadline) -> List[Dict]:
+        """持ち時間・キャンセルを確認しながら結果を待つ（超過時はセッションを閉じて例外）"""
+        while True:
+            done, _ = wait([future], timeout=self._wait_timeout(deadline, None))
+            if done:
+                return future.result()
+            try:
+                deadline.check()
+            except (DeadlineExceeded, OperationCancelled):
+                future.cancel()
+                session.close()
+                raise
+
+    def _first_success(self, primary, primary_session, hedge, hedge_session, deadline: Deadline):
+        """
+        本リクエストとヘッジのうち先に成功した結果を返し、負けた側を中断する
+
+        空の結果は失敗と同様に扱ってもう一方を待ち、両方とも空・失敗の場合のみ空リストを返す
+
+        Returns:
+            tuple: (レビューデータのリスト, 採用したエンドポイント 'reviews' / 'product')
+
+        requestsの送信中リクエストは中断できないため、負けた側はセッションを閉じて
+        結果を破棄する（以降のリトライ・接続再利用は行われない）
+        """
+        sessions = {primary: primary_session, hedge: hedge_session}
+        pending = {primary, hedge}
+        errors = []
+        empty_sources = []
+
+        while pending:
+            done, pending = wait(pending, timeout=self._wait_timeout(deadline, None), return_when=FIRST_COMPLETED)
+            if not done:
+                try:
+                    deadline.check()
+                except (DeadlineExceeded, OperationCancelled):
+                    for future in pending:
+                        future.cancel()
+                        sessions[future].close()
+                    raise
+                continue
+
+            for future in done:
+                sessions[future].close()
+                try:
+                    reviews = future.result()
+                except (DeadlineExceeded, OperationCancelled):
+                    for loser in pending:
+                        loser.cancel()
+                        sessions[loser].close()
+                    raise
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+
+                source = 'reviews' if future is primary else 'product'
+                if not reviews:
+                    empty_sources.append(source)
+                    continue
+
+                for loser in pending:
+                    loser.cancel()
+                    sessions[loser].close()
+                log_event(logger, logging.INFO, "ヘッジ結果: %sエンドポイントを採用", source,
+                          hedge_winner=source, reviews=len(reviews))
+                return reviews, source
+
+        if empty_sources:
+            # 片方でも空の結果を返した場合は「レビューなし」（失敗ではない）
+            source = 'reviews' if 'reviews' in empty_sources else 'product'
+            log_event(logger, logging.INFO, "ヘッジ結果: どちらのエンドポイントもレビューなし",
+                      hedge_winner=source, reviews=0)
+            return [], source
+
+        logger.error("フォールバックも失敗: %s", ' / '.join(errors))
+        raise Exception(f"レビュー取得エラー（両方失敗）: {' / '.join(errors)}")
+
+    def _fetch_from_reviews_endpoint(
+        self,
+        asin: str,
+        target_count: int,
+        sort_by: str,
+        session: Optional[requests.Session] = None,
+        deadline: Optional[Deadline] = None,
+        profile_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        reviewsエンドポイントからレビューを取得（失敗時は例外）
+
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+            target_count (int): 取得目標件数
+            sort_by (str): ソート順
+            session (requests.Session): 使用するセッション（ヘッジ時の中断用）
+            deadline (Deadline): 持ち時間（Noneは無制限）
+            profile_id (str): プロファイルの保存単位（Noneは記録しない）
+
+        Returns:
+            List[Dict]: レビューデータのリスト
+        """
+        with self._profile_stage(profile_id, 'reviews_endpoint', asin):
             # ページネーションで複数ページ取得
             # 各ページ約10件 → 5ページで最大50件
             max_page = min(5, (target_count + 9) // 10)  # 10件/ページで計算
@@ -66,29 +439,38 @@ class ReviewCollector:
                 'star_rating': 'critical'  # ★1〜3のみ取得
             }
 
-            print(f"[INFO] レビューを取得中... (最大{max_page}ページ)")
-            response = requests.get(self.base_url, params=params, timeout=60)
-            print(f"[INFO] RainforestAPI レスポンス status={response.status_code}")
+            logger.debug("レビューを取得中... (最大%dページ)", max_page)
+            started = time.monotonic()
+            timeout = ensure_deadline(deadline).timeout(60)
+            with Timer() as timer:
+                response = (session or wrap_session(requests)).get(self.base_url, params=params, timeout=timeout)
 
             if response.status_code != 200:
-                print(f"[ERROR] 取得失敗 (Status: {response.status_code})")
+                log_event(logger, logging.ERROR, "レビュー取得失敗", endpoint='rainforest_reviews', asin=asin,
+                          status=response.status_code, latency_ms=timer.latency_ms)
                 data = response.json()
                 error_msg = data.get('request_info', {}).get('message', 'Unknown error')
                 raise Exception(f"API Error: {error_msg}")
 
+            review_latency.observe(time.monotonic() - started)
+
             data = response.json()
-            print(f"[DEBUG] レスポンスキー: {list(data.keys())}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("レスポンスキー: %s", list(data.keys()))
 
             # reviewsデータを取得
             reviews_data = data.get('reviews', [])
 
-            print(f"[INFO] {len(reviews_data)}件のレビューを取得しました")
+            log_event(logger, logging.INFO, "レビュー取得", endpoint='rainforest_reviews', asin=asin, cache_hit=False,
+                      status=response.status_code, latency_ms=timer.latency_ms, reviews=len(reviews_data),
+                      credits=max_page)
 
             if len(reviews_data) == 0:
-                print(f"[WARNING] レビューが見つかりませんでした")
+                logger.warning("レビューが見つかりませんでした: ASIN=%s", asin)
                 return []
 
             # レビューデータを抽出
+            reviews = []
             for review in reviews_data:
                 reviews.append({
                     'asin': asin,
@@ -104,84 +486,78 @@ class ReviewCollector:
                     'position': review.get('position', 0)
                 })
 
-                # プログレス更新
-                if progress_callback:
-                    progress = min(len(reviews) / target_count, 1.0)
-                    progress_bar.progress(progress)
-
             # 低評価レビュー優先でソート（rating昇順、次にhelpful_votes降順）
             # Claude分析では★3以下のレビューから問題点を抽出するため
             reviews.sort(key=lambda x: (x['rating'], -x.get('helpful_votes', 0)))
 
-            print(f"[SUCCESS] レビュー収集完了: 合計{len(reviews)}件")
-            print(f"[INFO] 低評価レビュー優先でソート済み（AI分析用）")
+            logger.debug("レビュー収集完了: 合計%d件（低評価優先でソート済み）", len(reviews))
             return reviews
 
-        except Exception as e:
-            print(f"[ERROR] エラー詳細: {str(e)}")
-            # フォールバック: productエンドポイントを試す
-            print(f"[INFO] フォールバック: productエンドポイントを試します...")
-            return self._fallback_collect_from_product(asin, progress_callback)
-
     def _fallback_collect_from_product(
         self,
         asin: str,
-        progress_callback: Optional[Callable] = None
+        session: Optional[requests.Session] = None,
+        deadline: Optional[Deadline] = None,
+        profile_id: Optional[str] = None
     ) -> List[Dict]:
         """
         フォールバック: productエンドポイントからtop_reviewsを取得
 
         Args:
             asin (str): Amazon商品ID (ASIN)
-            progress_callback (callable): プログレスバー更新用コールバック関数
+            session (requests.Session): 使用するセッション（ヘッジ時の中断用）
+            deadline (Deadline): 持ち時間（Noneは無制限）
+            profile_id (str): プロファイルの保存単位（Noneは記録しない）
 
         Returns:
             List[Dict]: レビューデータのリスト
         """
-        try:
-            params = {
-                'api_key': self.api_key,
-                'type': 'product',
-                'amazon_domain': 'amazon.co.jp',
-                'asin': asin
-            }
-
-            print(f"[INFO] 商品情報を取得中（フォールバック）...")
-            response = requests.get(self.base_url, params=params, timeout=30)
-
-            if response.status_code != 200:
-                raise Exception(f"フォールバックも失敗 (Status: {response.status_code})")
-
-            data = response.json()
-            product = data.get('product', {})
-            top_reviews = product.get('top_reviews', [])
-
-            print(f"[INFO] top_reviewsから{len(top_reviews)}件のレビューを取得")
-
-            reviews = []
-            for review in top_reviews:
-                reviews.append({
-                    'asin': asin,
-                    'review_id': review.get('id', ''),
-                    'rating': review.get('rating', 0),
-                    'title': review.get('title', ''),
-                    'body': review.get('body', ''),
-                    'verified_purchase': review.get('verified_purchase', False),
-                    'date': review.get('date', {}).get('raw', '') if isinstance(review.get('date'), dict) else '',
-                    'helpful_votes': review.get('helpful_votes', 0),
-                    'images': len(review.get('images', []))
-                })
-
-                if progress_callback:
-                    progress = min(len(reviews) / 20, 1.0)
-                    progress_callback(0).progress(progress)
+        with self._profile_stage(profile_id, 'product_endpoint', asin):
+            try:
+                params = {
+                    'api_key': self.api_key,
+                    'type': 'product',
+                    'amazon_domain': 'amazon.co.jp',
+                    'asin': asin
+                }
+
+                logger.debug("商品情報を取得中（フォールバック）: ASIN=%s", asin)
+                timeout = ensure_deadline(deadline).timeout(30)
+                with Timer() as timer:
+                    response = (session or wrap_session(requests)).get(self.base_url, params=params, timeout=timeout)
+
+                if response.status_code != 200:
+                    raise Exception(f"フォールバックも失敗 (Status: {response.status_code})")
 
-            # 低評価優先ソート
-            reviews.sort(key=lambda x: (x['rating'], -x.get('helpful_votes', 0)))
-
-            print(f"[SUCCESS] フォールバック成功: {len(reviews)}件")
-            return reviews
-
-        except Exception as e:
-            print(f"[ERROR] フォールバックも失敗: {str(e)}")
-            raise Exception(f"レビュー取得エラー（両方失敗）: {str(e)}")
+                data = response.json()
+                product = data.get('product', {})
+                top_reviews = product.get('top_reviews', [])
+
+                log_event(logger, logging.INFO, "top_reviewsからレビューを取得", endpoint='rainforest_product', asin=asin,
+                          cache_hit=False, status=response.status_code, latency_ms=timer.latency_ms,
+                          reviews=len(top_reviews), credits=1)
+
+                reviews = []
+                for review in top_reviews:
+                    reviews.append({
+                        'asin': asin,
+                        'review_id': review.get('id', ''),
+                        'rating': review.get('rating', 0),
+                        'title': review.get('title', ''),
+                        'body': review.get('body', ''),
+                        'verified_purchase': review.get('verified_purchase', False),
+                        'date': review.get('date', {}).get('raw', '') if isinstance(review.get('date'), dict) else '',
+                        'helpful_votes': review.get('helpful_votes', 0),
+                        'images': len(review.get('images', []))
+                    })
+
+                # 低評価優先ソート
+                reviews.sort(key=lambda x: (x['rating'], -x.get('helpful_votes', 0)))
+
+                return reviews
+
+            except (DeadlineExceeded, OperationCancelled):
+                raise
+            except Exception as e:
+                logger.error("フォールバックも失敗: %s", e)
+                raise Exception(f"レビュー取得エラー（両方失敗）: {str(e)}")
@@ -0,0 +1,338 @@
+"""
+レビュー先読みモジュール
+検索直後にTOP候補のレビュー収集をバックグラウンドで開始し、キャッシュに保存する
+
+- クレジット予算の範囲内で上位K件のみ先読み（検索中の閾値先読みと検索後の上位K件先読みで予算を共有）
+- 先読みしたレビューが実際に使われたか（ヒット/ミス/無駄）をSQLiteに記録し、Kの調整に使う
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+from .progress_reporter import LoggingProgressSink, ProgressReporter
+
+logger = get_logger(__name__)
+
+# 先読みしてから使われないまま、この秒数が経過したものを「無駄」と判定
+WASTE_AFTER_SEC = 60 * 60
+
+
+def estimate_review_credits(target_count: int = 50) -> int:
+    """
+    レビュー収集の消費クレジットを見積もる（reviewsエンドポイントは1ページ=1クレジット、最大5ページ）
+
+    Args:
+        target_count (int): 取得目標件数
+
+    Returns:
+        int: 見積もりクレジット数
+    """
+    return min(5, (target_count + 9) // 10)
+
+
+class PrefetchBudget:
+    """1回の検索で先読みに使ってよい件数・クレジット（検索中の閾値先読みと検索後の上位K件先読みで共有）"""
+
+    def __init__(self, top_k: int = 3, credit_budget: int = 15):
+        """
+        初期化
+
+        Args:
+            top_k (int): 先読みする最大件数
+            credit_budget (int): 消費してよいクレジット上限
+        """
+        self.top_k = top_k
+        self.credit_budget = credit_budget
+        self.started = 0
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, credits: int) -> bool:
+        """1件分の件数・クレジットを確保（予算を超える場合はFalse）"""
+        with self._lock:
+            if self.started >= self.top_k or self.spent + credits > self.credit_budget:
+                return False
+            self.started += 1
+            self.spent += credits
+            return True
+
+    def refund(self, credits: int):
+        """確保した1件分を戻す（キャッシュ済み・実行中で先読みしなかった場合）"""
+        with self._lock:
+            self.started -= 1
+            self.spent -= credits
+
+
+class ReviewPrefetcher:
+    """バックグラウンドでレビューを先読みするクラス"""
+
+    def __init__(self, db_path: Optional[str] = None, max_workers: int = 2):
+        """
+        初期化
+
+        Args:
+            db_path (str): 統計を保存するSQLiteファイル（省略時はキャッシュと同じDB）
+            max_workers (int): 同時に先読みする商品数
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='review-prefetch')
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """先読み履歴テーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS review_prefetch_log (
+                    asin TEXT NOT NULL,
+                    rank INTEGER,
+                    credits INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    prefetched_at REAL NOT NULL,
+                    used_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_prefetch_asin ON review_prefetch_log(asin)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, collector, asin: str, target_count: int = 50, rank: Optional[int] = None,
+               progress: Optional[ProgressReporter] = None) -> Optional[Future]:
+        """
+        1商品の先読みを開始（キャッシュ済み・実行中の場合は何もしない）
+
+        Args:
+            collector (ReviewCollector): レビューコレクター
+            asin (str): Amazon商品ID (ASIN)
+            target_count (int): 取得目標件数
+            rank (int): 検索結果での順位（統計用）
+            progress (ProgressReporter): 進捗の報告先（複数商品で共有可）
+
+        Returns:
+            Future: 開始した場合はFuture、スキップした場合はNone
+        """
+        if collector.get_cached_reviews(asin, target_count) is not None:
+            return None
+
+        with self._lock:
+            if asin in self._in_flight:
+                return None
+            future = self.executor.submit(
+                self._run, collector, asin, target_count, rank, estimate_review_credits(target_count), progress
+            )
+            self._in_flight[asin] = future
+        return future
+
+    def prefetch(self, collector, asins: List[str], top_k: int = 3, credit_budget: int = 15,
+                 target_count: int = 50, budget: Optional[PrefetchBudget] = None,
+                 record_rank: bool = True) -> List[str]:
+        """
+        検索結果の上位K件をクレジット予算内で先読み
+
+        Args:
+            collector (ReviewCollector): レビューコレクター
+            asins (List[str]): 検索結果のASIN（スコア順）
+            top_k (int): 先読みする上位件数
+            credit_budget (int): この呼び出しで消費してよいクレジット上限
+            target_count (int): 取得目標件数
+            budget (PrefetchBudget): 検索全体で共有する予算（指定時は top_k・credit_budget より優先）
+            record_rank (bool): asins の並び順を順位として統計に記録するか（途中結果の候補はFalse）
+
+        Returns:
+            List[str]: 先読みを開始したASIN
+        """
+        budget = budget or PrefetchBudget(top_k, credit_budget)
+        credits = estimate_review_credits(target_count)
+        started = []
+        futures = []
+        # 並行する先読みの進捗はまとめて間引きログ出力
+        progress = ProgressReporter(LoggingProgressSink("レビュー先読み"), message="レビュー先読み中", min_interval=5.0)
+
+        for rank, asin in enumerate(asins[:budget.top_k], 1):
+            if not budget.reserve(credits):
+                break
+            future = self.submit(collector, asin, target_count, rank=rank if record_rank else None, progress=progress)
+            if future is None:
+                budget.refund(credits)
+                continue
+            started.append(asin)
+            futures.append(future)
+
+        if started:
+            logger.info("レビュー先読み開始: %s（見積もり%dクレジット、この検索で計%dクレジット）",
+                        started, credits * len(started), budget.spent)
+            _close_when_done(futures, progress, "レビュー先読み完了")
+        return started
+
+    def _run(self, collector, asin: str, target_count: int, rank: Optional[int], credits: int,
+             progress: Optional[ProgressReporter] = None) -> List[Dict]:
+        """
+        ワーカースレッドで先読みを実行し、履歴を記録
+
+        履歴の記録までをFuture内で行うため、wait_for() の直後に record_use() しても取りこぼさない
+        """
+        reviews = []
+        try:
+            reviews = collector.collect_reviews(asin, target_count, progress=progress)
+            status = 'done' if len(reviews) > 0 else 'empty'
+        except Exception as e:
+            logger.warning("レビュー先読み失敗: ASIN=%s: %s", asin, e)
+            status = 'failed'
+
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("""
+                    INSERT INTO review_prefetch_log (asin, rank, credits, status, prefetched_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (asin, rank, credits, status, time.time()))
+                conn.commit()
+            finally:
+                conn.close()
+        finally:
+            with self._lock:
+                self._in_flight.pop(asin, None)
+        return reviews
+
+    def wait_for(self, asin: str, timeout: Optional[float] = None):
+        """
+        先読み中の商品があれば完了を待つ（二重取得を防ぐ）
+
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+            timeout (float): 最大待ち秒数
+        """
+        with self._lock:
+            future = self._in_flight.get(asin)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass  # タイムアウト時は呼び出し側で通常どおり収集する
+
+    def record_use(self, asin: str) -> bool:
+        """
+        ユーザーがレビューを使用したことを記録
+
+        Args:
+            asin (str): Amazon商品ID (ASIN)
+
+        Returns:
+            bool: 先読み済みだった場合True（ヒット）
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute("""
+                UPDATE review_prefetch_log
+                SET used_at = ?
+                WHERE rowid = (
+                    SELECT rowid FROM review_prefetch_log
+                    WHERE asin = ? AND status = 'done' AND used_at IS NULL
+                    ORDER BY prefetched_at DESC
+                    LIMIT 1
+                )
+            """, (now, asin))
+            hit = cursor.rowcount > 0
+
+            if not hit:
+                conn.execute("""
+                    INSERT INTO review_prefetch_log (asin, rank, credits, status, prefetched_at, used_at)
+                    VALUES (?, NULL, 0, 'miss', ?, ?)
+                """, (asin, now, now))
+            conn.commit()
+        finally:
+            conn.close()
+        return hit
+
+    def stats(self) -> Dict:
+        """
+        先読みのヒット/ミス統計を取得
+
+        Returns:
+            Dict: 全体の件数・ヒット率・無駄クレジット、順位別のヒット率
+        """
+        waste_before = time.time() - WASTE_AFTER_SEC
+        conn = self._connect()
+        try:
+            prefetched, hits, wasted, wasted_credits, spent_credits = conn.execute("""
+                SELECT
+                    COUNT(*),
+                    SUM(used_at IS NOT NULL),
+                    SUM(used_at IS NULL AND prefetched_at < ?),
+                    SUM(CASE WHEN used_at IS NULL AND prefetched_at < ? THEN credits ELSE 0 END),
+                    SUM(credits)
+                FROM review_prefetch_log
+                WHERE status != 'miss'
+            """, (waste_before, waste_before)).fetchone()
+            misses = conn.execute(
+                "SELECT COUNT(*) FROM review_prefetch_log WHERE status = 'miss'"
+            ).fetchone()[0]
+            by_rank = conn.execute("""
+                SELECT rank, COUNT(*), SUM(used_at IS NOT NULL)
+                FROM review_prefetch_log
+                WHERE status != 'miss' AND rank IS NOT NULL
+                GROUP BY rank
+                ORDER BY rank
+            """).fetchall()
+        finally:
+            conn.close()
+
+        hits = hits or 0
+        return {
+            'prefetched': prefetched or 0,
+            'hits': hits,
+            'misses': misses,
+            'wasted': wasted or 0,
+            'credits_spent': spent_credits or 0,
+            'wasted_credits': wasted_credits or 0,
+            'hit_rate': hits / (hits + misses) if hits + misses > 0 else None,  # 使用時に先読み済みだった割合
+            'used_rate': hits / prefetched if prefetched else None,  # 先読みが使われた割合
+            'hit_rate_by_rank': {rank: (used or 0) / count for rank, count, used in by_rank},
+        }
+
+
+def _close_when_done(futures: List[Future], progress: ProgressReporter, message: str):
+    """全てのFutureが完了した時点で進捗の最終状態を出力"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_future):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            progress.close(message)
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+
+# グローバル先読みインスタンス(シングルトン)
+_prefetcher_instance = None
+_prefetcher_lock = threading.Lock()
+
+def get_review_prefetcher():
+    """
+    レビュー先読みのシングルトンインスタンス取得（全セッションで共有）
+
+    Returns:
+        ReviewPrefetcher インスタンス
+    """
+    global _prefetcher_instance
+    with _prefetcher_lock:
+        if _prefetcher_instance is None:
+            _prefetcher_instance = ReviewPrefetcher()
+    return _prefetcher_instance
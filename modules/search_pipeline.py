@@ -0,0 +1,298 @@
+"""
+非同期検索パイプライン
+検索 → Keepa取得 → スコアリング →（任意）レビュー先読み の各ステージを重ねて実行する
+
+- 検索ページが届いた順にASINをKeepaのバッチへ流す（全ページの完了を待たない）
+- スコアリング済みの行はバッチごとにコールバックでUIへ渡す
+- スコアが閾値を超えた商品はレビュー収集をバックグラウンドで開始（キャッシュに保存）
+- 持ち時間（Deadline）を超えた場合はそれまでの途中結果を返し、キャンセル時は即座に中断する
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from .deadline import Deadline, ensure_deadline
+from .keepa_analyzer_simple import KeepaAnalyzerSimple, SEARCH_MAX_WORKERS
+from .logging_config import get_logger
+from .progress_tracker import ProgressTracker
+from .review_prefetcher import PrefetchBudget, get_review_prefetcher
+
+logger = get_logger(__name__)
+
+# ASINキューの終端マーカー
+_DONE = object()
+
+# キャンセルトークンの確認間隔(秒)
+CANCEL_POLL_INTERVAL = 0.2
+
+
+class SearchPipeline:
+    """ステージを重ねて実行する検索パイプライン"""
+
+    def __init__(
+        self,
+        analyzer: KeepaAnalyzerSimple,
+        review_collector=None,
+        prefetch_threshold: Optional[float] = None,
+        prefetch_budget: Optional[PrefetchBudget] = None,
+        keepa_batch_size: int = 20,
+        batch_linger: float = 0.3,
+        offers_top_k: int = 5,
+        tracker: Optional[ProgressTracker] = None
+    ):
+        """
+        初期化
+
+        Args:
+            analyzer (KeepaAnalyzerSimple): 検索・Keepa取得・スコアリングに使うアナライザー
+            review_collector (ReviewCollector): レビュー先読みに使うコレクター
+            prefetch_threshold (float): この商品スコア以上でレビューを先読み（Noneで無効）
+            prefetch_budget (PrefetchBudget): 先読みの件数・クレジット上限（検索後の上位K件先読みと共有、省略時は既定値）
+            keepa_batch_size (int): Keepaへ1回で問い合わせるASIN数
+            batch_linger (float): バッチが埋まるのを待つ最大秒数
+            offers_top_k (int): オファーを取得する上位件数（0で取得しない）
+            tracker (ProgressTracker): ステージ・サブステップの所要時間の記録先
+        """
+        self.analyzer = analyzer
+        self.review_collector = review_collector
+        self.prefetch_threshold = prefetch_threshold
+        self.prefetch_budget = prefetch_budget or PrefetchBudget()
+        self.keepa_batch_size = keepa_batch_size
+        self.batch_linger = batch_linger
+        self.offers_top_k = offers_top_k
+        self.tracker = tracker or ProgressTracker()
+        self._prefetched = set()
+
+    @staticmethod
+    def _to_frame(rows: List[Dict]) -> pd.DataFrame:
+        """行リストを商品選定スコア順のデータフレームに変換"""
+        df = pd.DataFrame(rows)
+        if len(df) > 0 and 'product_score' in df.columns:
+            df = df.sort_values('product_score', ascending=False).reset_index(drop=True)
+        return df
+
+    async def _search_stage(self, keyword: str, asin_queue: asyncio.Queue, executor, deadline: Deadline):
+        """検索ページを並列取得し、届いた順に未出のASINをキューへ流す"""
+        loop = asyncio.get_running_loop()
+        analyzer = self.analyzer
+        seen = set()
+
+        with self.tracker.stage('search') as stage_span:
+            if analyzer.rainforest_api_key:
+                sort_orders = analyzer.search_sort_orders or [None]
+                pages = [
+                    loop.run_in_executor(
+                        executor,
+                        functools.partial(self._fetch_page_timed, stage_span, keyword, page, sort_by, deadline)
+                    )
+                    for sort_by in sort_orders
+                    for page in range(1, analyzer.search_pages + 1)
+                ]
+
+                for page_future in asyncio.as_completed(pages):
+                    page_asins, from_cache = await page_future
+                    if from_cache:
+                        analyzer._add_usage(rainforest_cache_hits=1)
+                    elif page_asins is not None:
+                        analyzer._add_usage(rainforest_requests=1)
+
+                    for asin in page_asins or []:
+                        if asin not in seen:
+                            seen.add(asin)
+                            await asin_queue.put(asin)
+
+            # RainforestAPIが使えない・結果が無い場合は固定リストにフォールバック
+            if not seen:
+                for asin in analyzer._fallback_asins(keyword):
+                    await asin_queue.put(asin)
+            stage_span['attrs']['asins'] = len(seen)
+
+        await asin_queue.put(_DONE)
+
+    def _fetch_page_timed(self, stage_span: Dict, keyword: str, page: int, sort_by, deadline: Deadline):
+        """検索ページを1ページ取得（サブステップとして計測）"""
+        with self.tracker.span('search_page', parent=stage_span, page=page, sort_by=sort_by) as span:
+            page_asins, from_cache = self.analyzer._fetch_search_page(keyword, page, sort_by, deadline=deadline)
+            span['attrs'].update(cached=from_cache, asins=len(page_asins or []))
+        return page_asins, from_cache
+
+    async def _process_batch(self, asins: List[str], on_batch: Callable, executor, deadline: Deadline,
+                             stage_span: Dict):
+        """1バッチ分をKeepaで取得してスコアリング"""
+        loop = asyncio.get_running_loop()
+        with self.tracker.span('keepa_batch', parent=stage_span, asins=len(asins)) as span:
+            query = functools.partial(
+                self.analyzer._query_keepa,
+                asins,
+                deadline=deadline,
+                domain='JP',
+                stats=90,      # 過去90日の統計情報
+                rating=True    # レビュー情報を含める
+            )
+            with self.tracker.span('keepa_query', parent=span, asins=len(asins)):
+                products = await loop.run_in_executor(executor, query)
+            with self.tracker.span('score', parent=span, products=len(products)):
+                rows = await loop.run_in_executor(executor, self.analyzer._build_rows, products)
+            span['attrs']['rows'] = len(rows)
+        on_batch(rows)
+
+    async def _keepa_stage(self, asin_queue: asyncio.Queue, on_batch: Callable, executor, deadline: Deadline):
+        """キューからASINを集めてバッチ化し、埋まるか一定時間経過した時点でKeepaへ送る"""
+        with self.tracker.stage('keepa') as stage_span:
+            await self._collect_batches(asin_queue, on_batch, executor, deadline, stage_span)
+
+    async def _collect_batches(self, asin_queue: asyncio.Queue, on_batch: Callable, executor,
+                               deadline: Deadline, stage_span: Dict):
+        """キューのASINをバッチにまとめて並行実行"""
+        in_flight = []
+        batch = []
+        done = False
+
+        while not done:
+            try:
+                timeout = self.batch_linger if batch else None
+                item = await asyncio.wait_for(asin_queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                batch.append(item)
+
+            if batch and (done or item is None or len(batch) >= self.keepa_batch_size):
+                in_flight.append(asyncio.ensure_future(
+                    self._process_batch(batch, on_batch, executor, deadline, stage_span)
+                ))
+                batch = []
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    def _prefetch_reviews(self, rows: List[Dict]):
+        """スコアが閾値以上の商品のレビュー収集を予算の範囲でバックグラウンド開始（パイプライン終了後も継続）"""
+        candidates = sorted(
+            (row for row in rows
+             if row['product_score'] >= self.prefetch_threshold and row['asin'] not in self._prefetched),
+            key=lambda row: row['product_score'], reverse=True
+        )
+        if not candidates:
+            return
+        started = get_review_prefetcher().prefetch(
+            self.review_collector, [row['asin'] for row in candidates],
+            budget=self.prefetch_budget, record_rank=False
+        )
+        self._prefetched.update(started)
+
+    @staticmethod
+    async def _wait_cancel(deadline: Deadline):
+        """キャンセルされるまで待機"""
+        while not deadline.cancel_token.cancelled:
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+    async def _run_within(self, coro, deadline: Deadline) -> bool:
+        """
+        持ち時間の範囲でコルーチンを実行
+
+        Returns:
+            bool: 完了した場合True、持ち時間切れの場合False（実行中のスレッドは次のチェックで停止する）
+
+        Raises:
+            OperationCancelled: キャンセルされた場合
+        """
+        task = asyncio.ensure_future(coro)
+        watcher = asyncio.ensure_future(self._wait_cancel(deadline))
+        try:
+            await asyncio.wait({task, watcher}, timeout=deadline.remaining(),
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+
+        if task.done():
+            task.result()
+            return True
+
+        task.cancel()
+        task.add_done_callback(_discard_result)
+        deadline.cancel_token.raise_if_cancelled()
+        return False
+
+    async def run(self, keyword: str, filters: Optional[Dict] = None,
+                  on_rows: Optional[Callable[[pd.DataFrame], None]] = None,
+                  deadline: Optional[Deadline] = None) -> pd.DataFrame:
+        """
+        パイプラインを実行
+
+        Args:
+            keyword (str): 検索キーワード
+            filters (dict): 詳細検索フィルタ（オファー取得対象の選定に使用）
+            on_rows (callable): バッチごとに途中結果（スコア順のデータフレーム）を受け取るコールバック
+            deadline (Deadline): 検索全体の持ち時間（超過時は途中結果を返し、analyzer.partial_reasonに理由を記録）
+
+        Returns:
+            pd.DataFrame: 商品データフレーム（商品選定スコア順）
+
+        Raises:
+            OperationCancelled: キャンセルトークンで中断された場合
+        """
+        loop = asyncio.get_running_loop()
+        deadline = ensure_deadline(deadline)
+        self.analyzer._begin_request(keyword)
+        rows = []
+        asin_queue = asyncio.Queue()
+        executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS + 2)
+
+        def on_batch(batch_rows):
+            rows.extend(batch_rows)
+            if self.prefetch_threshold is not None and self.review_collector is not None:
+                self._prefetch_reviews(batch_rows)
+            if on_rows:
+                on_rows(self._to_frame(rows))
+
+        try:
+            completed = await self._run_within(asyncio.gather(
+                self._search_stage(keyword, asin_queue, executor, deadline),
+                self._keepa_stage(asin_queue, on_batch, executor, deadline)
+            ), deadline)
+            if not completed:
+                self.analyzer._mark_partial(f"持ち時間切れのため、{len(rows)}件の途中結果を返します")
+
+            # 上位候補のみオファー情報を取得して出品者数を更新（rowsを直接更新するためコピーに対して実行）
+            live_asins = set()
+            if self.offers_top_k and len(rows) > 0 and completed:
+                refreshed = list(rows)
+                refresh = loop.run_in_executor(
+                    executor,
+                    functools.partial(self.analyzer._refresh_seller_counts, refreshed, filters,
+                                      self.offers_top_k, deadline=deadline)
+                )
+                with self.tracker.stage('offers', asins=self.offers_top_k):
+                    refreshed_in_time = await self._run_within(refresh, deadline)
+                if refreshed_in_time:
+                    rows = refreshed
+                    live_asins = refresh.result()
+                else:
+                    self.analyzer._mark_partial("持ち時間切れのため、出品者数は仮の値（履歴ベース）です")
+        finally:
+            executor.shutdown(wait=False)
+
+        self.analyzer.record_leaderboard(rows, keyword, live_asins=live_asins)
+        with self.analyzer._profile_stage('dataframe', rows=len(rows)):
+            df = self._to_frame(rows)
+        logger.info("取得完了: %d件（商品選定スコア順にソート済み）", len(df))
+        return df
+
+    def run_sync(self, keyword: str, filters: Optional[Dict] = None,
+                 on_rows: Optional[Callable[[pd.DataFrame], None]] = None,
+                 deadline: Optional[Deadline] = None) -> pd.DataFrame:
+        """run() を同期的に実行（Streamlitスクリプト・CLI用）"""
+        return asyncio.run(self.run(keyword, filters=filters, on_rows=on_rows, deadline=deadline))
+
+
+def _discard_result(future):
+    """打ち切ったタスクの結果（キャンセル・例外）を破棄（未取得の警告を出さない）"""
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,359 @@
+"""
+ASIN時系列ストア
+Keepaから取得した履歴（価格・ランキング・レビュー数・月間販売数など）をASIN・系列ごとにローカルへ保存し、
+後の分析・グラフで Keepa に再問い合わせせずに読めるようにする
+
+- 保存形式: <保存先>/<ASIN>/<系列名>/<最初の時刻>-<最後の時刻>.npy（Keepa分・生の整数値の2列）
+  - 取得のたびに、保存済みの最後の時刻より新しい点だけを新しいチャンクとして追記する
+  - チャンクが増えたら1ファイルにまとめる（読み込みはメモリマップで行う）
+- 値は Keepa の生データ（JPの価格は円、RATING は 0〜50、-1 はデータなし・在庫切れ）
+  - *_SHIPPING 系列は keepa.parse_csv と同じく送料込みの価格
+- RESEARCH_TIMESERIES=0 で無効化
+"""
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import keepa
+import numpy as np
+import pandas as pd
+
+from .cache_manager import get_cache_manager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 無効化する環境変数
+TIMESERIES_ENV = 'RESEARCH_TIMESERIES'
+
+# 保存する系列（csv のインデックス → 名前）と月間販売数の系列名
+CSV_SERIES = {index: name for index, name, _ in keepa.csv_indices}
+MONTHLY_SOLD = 'MONTHLY_SOLD'
+
+# 1行 = (Keepa分, 値)
+POINT_DTYPE = np.dtype([('t', '<i4'), ('v', '<i4')])
+
+# この数を超えたら1チャンクにまとめる
+MAX_CHUNKS = 8
+
+# Keepa分の基準（2011-01-01 00:00 UTC）からのUNIX秒オフセット
+KEEPA_EPOCH_SEC = 1293840000
+
+# 書き込みロックの分割数（ASINのハッシュで選ぶ）
+LOCK_STRIPES = 16
+
+
+def keepa_history_points(product: Dict) -> Dict[str, np.ndarray]:
+    """
+    Keepa商品データから系列ごとの履歴を取り出す
+
+    Args:
+        product (dict): Keepa商品データ（csv / monthlySoldHistory）
+
+    Returns:
+        Dict[str, np.ndarray]: 系列名 → POINT_DTYPE の配列（時刻順）
+    """
+    series = {}
+    for index, values in enumerate(product.get('csv') or []):
+        if not values or index not in CSV_SERIES:
+            continue
+        name = CSV_SERIES[index]
+        raw = np.asarray(values, dtype=np.int64)
+        if 'SHIPPING' in name:
+            # [時刻, 価格, 送料, ...]。どちらかがデータなし(-1)の場合は -1 のまま
+            raw = raw[:len(raw) // 3 * 3].reshape(-1, 3)
+            times, prices, shipping = raw[:, 0], raw[:, 1], raw[:, 2]
+            values = np.where((prices < 0) | (shipping < 0), -1, prices + np.maximum(shipping, 0))
+        else:
+            raw = raw[:len(raw) // 2 * 2].reshape(-1, 2)
+            times, values = raw[:, 0], raw[:, 1]
+        series[name] = _points(times, values)
+
+    history = product.get('monthlySoldHistory')
+    if history:
+        raw = np.asarray(history, dtype=np.int64)
+        raw = raw[:len(raw) // 2 * 2].reshape(-1, 2)
+        series[MONTHLY_SOLD] = _points(raw[:, 0], raw[:, 1])
+    return series
+
+
+def _points(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    points = np.empty(len(times), dtype=POINT_DTYPE)
+    points['t'] = times
+    points['v'] = values
+    # Keepaの履歴は時刻順だが、念のため並べ替えて同時刻は最後の値を残す
+    points = points[np.argsort(points['t'], kind='stable')]
+    if len(points) > 1:
+        keep = np.append(points['t'][1:] != points['t'][:-1], True)
+        points = points[keep]
+    return points
+
+
+def _chunk_range(path: Path):
+    first, _, last = path.stem.partition('-')
+    return int(first), int(last)
+
+
+class TimeSeriesStore:
+    """ASIN・系列ごとの追記型チャンクに履歴を保存するクラス"""
+
+    def __init__(self, directory: Optional[str] = None, enabled: Optional[bool] = None,
+                 max_chunks: int = MAX_CHUNKS):
+        """
+        初期化
+
+        Args:
+            directory (str): 保存先（省略時はキャッシュDBと同じディレクトリの timeseries/）
+            enabled (bool): 保存するか（省略時は RESEARCH_TIMESERIES 環境変数、既定で有効）
+            max_chunks (int): この数を超えたら1チャンクにまとめる
+        """
+        if enabled is None:
+            enabled = os.getenv(TIMESERIES_ENV, '1') not in ('0', 'false')
+        self.enabled = enabled
+        self.directory = Path(directory) if directory else Path(get_cache_manager().db_path).parent / 'timeseries'
+        self.max_chunks = max_chunks
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def _lock(self, asin: str) -> threading.Lock:
+        return self._locks[zlib.crc32(asin.encode()) % LOCK_STRIPES]
+
+    def _series_dir(self, asin: str, series: str) -> Path:
+        return self.directory / asin / series
+
+    def _chunks(self, asin: str, series: str) -> List[Path]:
+        """チャンクファイル（最初の時刻順）"""
+        series_dir = self._series_dir(asin, series)
+        if not series_dir.exists():
+            return []
+        return sorted(series_dir.glob('*.npy'), key=_chunk_range)
+
+    def last_time(self, asin: str, series: str) -> Optional[int]:
+        """
+        保存済みの最後の時刻
+
+        Returns:
+            int: Keepa分（未保存の場合はNone）
+        """
+        chunks = self._chunks(asin, series)
+        return max(_chunk_range(path)[1] for path in chunks) if chunks else None
+
+    def append_product(self, product: Dict) -> int:
+        """
+        Keepa商品データの履歴のうち、未保存の新しい点だけを追記
+
+        Args:
+            product (dict): Keepa商品データ
+
+        Returns:
+            int: 追記した点の数
+        """
+        asin = product.get('asin')
+        if not self.enabled or not asin:
+            return 0
+
+        appended = 0
+        with self._lock(asin):
+            for series, points in keepa_history_points(product).items():
+                last = self.last_time(asin, series)
+                if last is not None:
+                    points = points[points['t'] > last]
+                if len(points) == 0:
+                    continue
+                self._write_chunk(asin, series, points)
+                appended += len(points)
+                if len(self._chunks(asin, series)) > self.max_chunks:
+                    self.compact(asin, series)
+        return appended
+
+    def append_products(self, products: Iterable[Dict]) -> int:
+        """
+        複数商品の履歴を追記（保存の失敗で呼び出し側の処理を止めない）
+
+        Returns:
+            int: 追記した点の数
+        """
+        if not self.enabled:
+            return 0
+        appended = 0
+        for product in products:
+            try:
+                appended += self.append_product(product)
+            except Exception as e:
+                logger.warning("時系列の保存に失敗 %s: %s", product.get('asin'), e)
+        return appended
+
+    def _write_chunk(self, asin: str, series: str, points: np.ndarray) -> Path:
+        """一時ファイルに書いてから置き換える（読み込み中のプロセスに書きかけのファイルを見せない）"""
+        series_dir = self._series_dir(asin, series)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        path = series_dir / f"{int(points['t'][0]):010d}-{int(points['t'][-1]):010d}.npy"
+        tmp_path = series_dir / f".{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, points)
+        os.replace(tmp_path, path)
+        return path
+
+    def compact(self, asin: str, series: str):
+        """系列のチャンクを1ファイルにまとめる"""
+        chunks = self._chunks(asin, series)
+        if len(chunks) <= 1:
+            return
+        merged = self._load(chunks)
+        path = self._write_chunk(asin, series, merged)
+        for chunk in chunks:
+            if chunk != path:
+                chunk.unlink(missing_ok=True)
+        logger.debug("時系列のチャンクを統合: %s/%s (%dファイル → 1)", asin, series, len(chunks))
+
+    @staticmethod
+    def _load(chunks: List[Path]) -> np.ndarray:
+        arrays = []
+        for path in chunks:
+            try:
+                arrays.append(np.load(path, mmap_mode='r'))
+            except FileNotFoundError:  # 統合で削除された（統合後のファイルに同じ点がある）
+                continue
+        if not arrays:
+            return np.empty(0, dtype=POINT_DTYPE)
+        if len(arrays) == 1:
+            return arrays[0]
+        points = np.concatenate(arrays)
+        return _points(points['t'], points['v'])
+
+    def read_points(self, asin: str, series: str, start: Optional[int] = None,
+                    end: Optional[int] = None) -> np.ndarray:
+        """
+        保存済みの生データを読み込む
+
+        Args:
+            asin (str): ASIN
+            series (str): 系列名（'NEW', 'SALES', 'COUNT_REVIEWS', 'MONTHLY_SOLD' など）
+            start (int): この時刻（Keepa分）以降のみ
+            end (int): この時刻（Keepa分）以前のみ
+
+        Returns:
+            np.ndarray: POINT_DTYPE の配列（時刻順。1チャンクの場合は読み取り専用のメモリマップ）
+        """
+        points = self._load(self._chunks(asin, series))
+        if start is not None or end is not None:
+            lo = 0 if start is None else np.searchsorted(points['t'], start, side='left')
+            hi = len(points) if end is None else np.searchsorted(points['t'], end, side='right')
+            points = points[lo:hi]
+        return points
+
+    def read(self, asin: str, series: str, start: Optional[pd.Timestamp] = None,
+             end: Optional[pd.Timestamp] = None) -> pd.Series:
+        """
+        履歴を時刻インデックスの Series として読み込む
+
+        Args:
+            asin (str): ASIN
+            series (str): 系列名
+            start (pd.Timestamp): この時刻以降のみ（UTC）
+            end (pd.Timestamp): この時刻以前のみ（UTC）
+
+        Returns:
+            pd.Series: 値（データなし・在庫切れはNaN、RATINGは星の数 4.5 など）
+        """
+        points = self.read_points(
+            asin, series,
+            start=None if start is None else to_keepa_minutes(start),
+            end=None if end is None else to_keepa_minutes(end),
+        )
+        values = points['v'].astype(float)
+        values[values < 0] = np.nan
+        if series == 'RATING':
+            values /= 10
+        return pd.Series(values, index=from_keepa_minutes(points['t']), name=series)
+
+    def read_frame(self, asin: str, series: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        複数系列を列にした DataFrame として読み込む（時刻が合わない箇所は直前の値で補完）
+
+        Args:
+            asin (str): ASIN
+            series (list): 系列名のリスト（省略時は保存済みの全系列）
+
+        Returns:
+            pd.DataFrame: 時刻インデックス × 系列
+        """
+        columns = [self.read(asin, name) for name in (series or self.series(asin))]
+        columns = [column for column in columns if len(column) > 0]
+        if not columns:
+            return pd.DataFrame()
+        return pd.concat(columns, axis=1).sort_index().ffill()
+
+    def restore_history(self, product: Dict) -> Dict:
+        """
+        差分取得（Keepaの days 指定）した商品データの履歴を、保存済みの全履歴に置き換える
+
+        append_product() の後に呼ぶ。*_SHIPPING 系列は送料を分けて保存していないため置き換えない
+
+        Args:
+            product (dict): Keepa商品データ（csv / monthlySoldHistory を書き換え、data は呼び出し側で再生成）
+
+        Returns:
+            dict: 同じ商品データ
+        """
+        asin = product.get('asin')
+        if not asin:
+            return product
+        csv = list(product.get('csv') or [])
+        csv += [None] * (len(keepa.csv_indices) - len(csv))
+        names = {name: index for index, name in CSV_SERIES.items()}
+        for name in self.series(asin):
+            points = self.read_points(asin, name)
+            if len(points) == 0:
+                continue
+            flat = np.empty(len(points) * 2, dtype=np.int64)
+            flat[0::2] = points['t']
+            flat[1::2] = points['v']
+            if name == MONTHLY_SOLD:
+                product['monthlySoldHistory'] = flat.tolist()
+            elif name in names and 'SHIPPING' not in name:
+                csv[names[name]] = flat.tolist()
+        product['csv'] = csv
+        return product
+
+    def series(self, asin: str) -> List[str]:
+        """保存済みの系列名"""
+        asin_dir = self.directory / asin
+        if not asin_dir.exists():
+            return []
+        return sorted(path.name for path in asin_dir.iterdir() if path.is_dir() and any(path.glob('*.npy')))
+
+    def asins(self) -> List[str]:
+        """履歴を保存済みのASIN"""
+        if not self.directory.exists():
+            return []
+        return sorted(path.name for path in self.directory.iterdir() if path.is_dir())
+
+
+def to_keepa_minutes(timestamp) -> int:
+    """時刻（UTC）を Keepa分に変換"""
+    return int((pd.Timestamp(timestamp).timestamp() - KEEPA_EPOCH_SEC) // 60)
+
+
+def from_keepa_minutes(minutes) -> pd.DatetimeIndex:
+    """Keepa分（配列）を時刻（UTC）に変換"""
+    return pd.to_datetime(np.asarray(minutes, dtype=np.int64) * 60 + KEEPA_EPOCH_SEC, unit='s')
+
+
+# グローバル時系列ストア(シングルトン)
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_timeseries_store():
+    """
+    時系列ストアのシングルトンインスタンス取得
+
+    Returns:
+        TimeSeriesStore インスタンス
+    """
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            _store_instance = TimeSeriesStore()
+    return _store_instance
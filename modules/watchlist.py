@@ -0,0 +1,620 @@
+"""
+ウォッチリストモジュール
+追跡するASIN・キーワードをSQLiteに保存し、変化の大きい商品ほど短い間隔で再取得・再スコアリングする
+
+- 次回取得時刻（next_due）のテーブルがジョブキューを兼ねる。取得前に一定時間リースし、複数プロセスで二重取得しない
+- 間隔は変化量に応じて調整（大きく動いたら半分、ほぼ変化なしなら1.5倍。MIN_INTERVAL_SEC〜MAX_INTERVAL_SEC）
+- Keepaは前回取得以降の日数だけ取得（days）し、時系列ストアの全履歴と合わせてスコアリング
+- レビュー数が増えた商品のみレビューを再収集（オプション）
+- 再スコアリングした指標はアラートのルールで評価（変化した指標のみ）
+- Keepaのトークンはバッチ優先度で確保し、1回の巡回は残高と回復量で賄える件数までに抑える
+"""
+import math
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import keepa
+
+from .alerts import AlertEngine, get_alert_engine
+from .cache_manager import get_cache_manager
+from .deadline import DeadlineExceeded, ensure_deadline
+from .keepa_analyzer_simple import KeepaAnalyzerSimple
+from .keepa_token_scheduler import PRIORITY_BATCH, KeepaTokenBudgetError, estimate_query_cost
+from .logging_config import get_logger
+from .review_collector import ReviewCollector
+from .timeseries_store import get_timeseries_store
+
+logger = get_logger(__name__)
+
+# 取得間隔（秒）
+DEFAULT_INTERVAL_SEC = 24 * 3600
+MIN_INTERVAL_SEC = 3 * 3600
+MAX_INTERVAL_SEC = 7 * 24 * 3600
+
+# キーワード検索の間隔（週次で新しい競合を追加）と、追加する上位件数
+KEYWORD_INTERVAL_SEC = 7 * 24 * 3600
+DEFAULT_KEYWORD_TOP_K = 20
+
+# 変化量（価格・ランキング・月間販売数の相対変化、スコアの変化/100 の最大値）の閾値
+FAST_CHANGE = 0.05   # これ以上動いたら間隔を半分に
+SLOW_CHANGE = 0.01   # これ未満なら間隔を1.5倍に
+
+# 間隔のゆらぎ（多数のASINの取得時刻を分散させる）
+INTERVAL_JITTER = 0.1
+
+# 取得中のリース（この秒数内に結果が記録されなければ再び取得対象になる）
+LEASE_SEC = 15 * 60
+
+# 取得失敗時の再試行間隔（失敗が続くと倍々で延ばす）
+FAILURE_RETRY_SEC = 3600
+
+# 1回の巡回で取得する最大ASIN数
+DEFAULT_MAX_ASINS_PER_POLL = 500
+
+# Keepaの取得パラメータ（search_products のPhase 1と同じ）
+KEEPA_QUERY_PARAMS = {'domain': 'JP', 'stats': 90, 'rating': True}
+
+
+def measure_change(previous: Dict, row: Dict) -> float:
+    """
+    前回からの変化量
+
+    Args:
+        previous (dict): 前回の記録（last_price, last_rank, last_monthly_sold, last_score）
+        row (dict): 今回のスコアリング結果
+
+    Returns:
+        float: 価格・ランキング・月間販売数の相対変化と、スコアの変化/100 のうち最大のもの
+    """
+    changes = []
+    for before, after in ((previous.get('last_price'), row.get('price')),
+                          (previous.get('last_rank'), row.get('current_rank')),
+                          (previous.get('last_monthly_sold'), row.get('monthly_sold_current'))):
+        if before and after:
+            changes.append(abs(after - before) / before)
+    if previous.get('last_score') is not None and row.get('product_score') is not None:
+        changes.append(abs(row['product_score'] - previous['last_score']) / 100)
+    return max(changes, default=0.0)
+
+
+def next_interval(interval_sec: float, change: float) -> float:
+    """
+    変化量から次回の取得間隔を決める
+
+    Args:
+        interval_sec (float): 現在の間隔
+        change (float): measure_change() の戻り値
+
+    Returns:
+        float: 次回の間隔（秒）
+    """
+    if change >= FAST_CHANGE:
+        interval_sec /= 2
+    elif change < SLOW_CHANGE:
+        interval_sec *= 1.5
+    return min(max(interval_sec, MIN_INTERVAL_SEC), MAX_INTERVAL_SEC)
+
+
+def _jitter(seconds: float) -> float:
+    return seconds * random.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+
+
+class Watchlist:
+    """追跡対象のASIN・キーワードとスコア履歴を保存するクラス"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            db_path (str): SQLiteファイル（省略時はキャッシュと同じDB）
+        """
+        self.db_path = db_path or get_cache_manager().db_path
+        self._init_db()
+
+    def _connect(self):
+        """短命の接続を作成（BEGIN IMMEDIATEで手動トランザクション管理）"""
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        書き込み用のトランザクション（多数の行をまとめて1回でコミット）
+
+        Yields:
+            sqlite3.Connection: トランザクション中の接続（例外時はロールバック）
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """ウォッチリスト・スコア履歴テーブル作成"""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS watch_asins (
+                    asin TEXT PRIMARY KEY,
+                    label TEXT,
+                    source TEXT,
+                    added_at REAL NOT NULL,
+                    interval_sec REAL NOT NULL,
+                    next_due REAL NOT NULL,
+                    last_polled REAL,
+                    last_score REAL,
+                    last_price REAL,
+                    last_rank REAL,
+                    last_monthly_sold REAL,
+                    last_review_count INTEGER,
+                    failures INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_watch_asins_due ON watch_asins(next_due)
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS watch_keywords (
+                    keyword TEXT PRIMARY KEY,
+                    added_at REAL NOT NULL,
+                    interval_sec REAL NOT NULL,
+                    next_due REAL NOT NULL,
+                    last_polled REAL,
+                    top_k INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS watch_scores (
+                    asin TEXT NOT NULL,
+                    polled_at REAL NOT NULL,
+                    product_score REAL,
+                    price REAL,
+                    current_rank REAL,
+                    monthly_sold REAL,
+                    review_count INTEGER,
+                    seller_count INTEGER,
+                    rating REAL,
+                    new_reviews INTEGER,
+                    interval_sec REAL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_watch_scores_asin ON watch_scores(asin, polled_at)
+            """)
+        finally:
+            conn.close()
+
+    def add_asins(self, asins: Iterable[str], label: str = '', source: str = 'manual',
+                  interval_sec: float = DEFAULT_INTERVAL_SEC) -> int:
+        """
+        ASINを追加（追加済みのASINはそのまま）
+
+        Args:
+            asins (Iterable[str]): ASIN
+            label (str): 表示名（商品名など）
+            source (str): 追加元（'manual' またはキーワード）
+            interval_sec (float): 初期の取得間隔
+
+        Returns:
+            int: 新しく追加した件数
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO watch_asins (asin, label, source, added_at, interval_sec, next_due)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(asin, label, source, now, interval_sec, now) for asin in dict.fromkeys(asins)])
+            return conn.total_changes - before
+
+    def remove_asins(self, asins: Iterable[str]):
+        """ASINを削除（スコア履歴は残す）"""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM watch_asins WHERE asin = ?", [(asin,) for asin in asins])
+
+    def add_keyword(self, keyword: str, top_k: int = DEFAULT_KEYWORD_TOP_K,
+                    interval_sec: float = KEYWORD_INTERVAL_SEC):
+        """
+        キーワードを追加（定期的に検索し、上位 top_k 件をASINとして追加）
+
+        Args:
+            keyword (str): 検索キーワード
+            top_k (int): 追加する上位件数
+            interval_sec (float): 検索の間隔
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO watch_keywords (keyword, added_at, interval_sec, next_due, top_k)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(keyword) DO UPDATE SET top_k = excluded.top_k, interval_sec = excluded.interval_sec
+            """, (keyword, now, interval_sec, now, top_k))
+        finally:
+            conn.close()
+
+    def remove_keyword(self, keyword: str):
+        """キーワードを削除（追加済みのASINは残す）"""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM watch_keywords WHERE keyword = ?", (keyword,))
+        finally:
+            conn.close()
+
+    def list_asins(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        追跡中のASIN（次回取得の早い順）
+
+        Returns:
+            List[Dict]: watch_asins の行
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT * FROM watch_asins ORDER BY next_due" + (" LIMIT ?" if limit else ""),
+                (limit,) if limit else ()
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def list_keywords(self) -> List[Dict]:
+        """追跡中のキーワード"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute("SELECT * FROM watch_keywords ORDER BY keyword").fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def _claim(self, table: str, key: str, limit: Optional[int], now: float, lease_sec: float) -> List[Dict]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {table} WHERE next_due <= ? ORDER BY next_due" + (" LIMIT ?" if limit else ""),
+                (now, limit) if limit else (now,)
+            ).fetchall()
+            conn.executemany(f"UPDATE {table} SET next_due = ? WHERE {key} = ?",
+                             [(now + lease_sec, row[key]) for row in rows])
+        return [dict(row) for row in rows]
+
+    def claim_due_asins(self, limit: Optional[int] = None, now: Optional[float] = None,
+                        lease_sec: float = LEASE_SEC) -> List[Dict]:
+        """
+        取得時刻を過ぎたASINをリースして返す（他のプロセスはリース中のASINを取得しない）
+
+        Args:
+            limit (int): 最大件数（期限の古い順）
+            now (float): 現在時刻
+            lease_sec (float): リース秒数
+
+        Returns:
+            List[Dict]: watch_asins の行
+        """
+        return self._claim('watch_asins', 'asin', limit, now or time.time(), lease_sec)
+
+    def claim_due_keywords(self, now: Optional[float] = None, lease_sec: float = LEASE_SEC) -> List[Dict]:
+        """検索時刻を過ぎたキーワードをリースして返す"""
+        return self._claim('watch_keywords', 'keyword', None, now or time.time(), lease_sec)
+
+    def release(self, asins: Iterable[str], now: Optional[float] = None):
+        """リースしたが取得しなかったASINを、すぐに取得対象へ戻す（トークン不足で打ち切った場合など）"""
+        now = now or time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE watch_asins SET next_due = ? WHERE asin = ?", [(now, asin) for asin in asins])
+
+    def record_polls(self, results: List[Dict], now: Optional[float] = None):
+        """
+        取得結果を記録し、変化量に応じて次回の取得時刻を決める
+
+        Args:
+            results (list): {'watch': claim_due_asins() の行, 'row': スコアリング結果, 'new_reviews': int} のリスト
+            now (float): 取得時刻
+        """
+        now = now or time.time()
+        updates = []
+        history = []
+        for result in results:
+            watch, row = result['watch'], result['row']
+            first_poll = watch['last_polled'] is None
+            interval = watch['interval_sec'] if first_poll else next_interval(watch['interval_sec'],
+                                                                              measure_change(watch, row))
+            updates.append((
+                interval, now + _jitter(interval), now, row.get('product_score'), row.get('price'),
+                row.get('current_rank'), row.get('monthly_sold_current'), row.get('review_count'),
+                row.get('title') or watch['label'], watch['asin'],
+            ))
+            history.append((
+                watch['asin'], now, row.get('product_score'), row.get('price'), row.get('current_rank'),
+                row.get('monthly_sold_current'), row.get('review_count'), row.get('seller_count'),
+                row.get('rating'), result.get('new_reviews'), interval,
+            ))
+
+        with self._transaction() as conn:
+            conn.executemany("""
+                UPDATE watch_asins
+                SET interval_sec = ?, next_due = ?, last_polled = ?, last_score = ?, last_price = ?,
+                    last_rank = ?, last_monthly_sold = ?, last_review_count = ?, label = ?, failures = 0
+                WHERE asin = ?
+            """, updates)
+            conn.executemany("""
+                INSERT INTO watch_scores
+                (asin, polled_at, product_score, price, current_rank, monthly_sold, review_count, seller_count,
+                 rating, new_reviews, interval_sec)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, history)
+
+    def record_failures(self, asins: Iterable[str], now: Optional[float] = None):
+        """取得できなかったASINの再試行を、失敗回数に応じて遅らせる"""
+        now = now or time.time()
+        with self._transaction() as conn:
+            conn.executemany("""
+                UPDATE watch_asins
+                SET failures = failures + 1,
+                    next_due = ? + MIN(? * (1 << MIN(failures, 10)), ?)
+                WHERE asin = ?
+            """, [(now, FAILURE_RETRY_SEC, MAX_INTERVAL_SEC, asin) for asin in asins])
+
+    def record_keyword(self, keyword: str, now: Optional[float] = None):
+        """キーワードの検索完了を記録"""
+        now = now or time.time()
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE watch_keywords SET last_polled = ?, next_due = ? + interval_sec WHERE keyword = ?
+            """, (now, now, keyword))
+        finally:
+            conn.close()
+
+    def score_history(self, asin: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        スコア履歴（古い順）
+
+        Args:
+            asin (str): ASIN
+            limit (int): 直近の件数
+
+        Returns:
+            List[Dict]: watch_scores の行
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT * FROM watch_scores WHERE asin = ? ORDER BY polled_at DESC" + (" LIMIT ?" if limit else ""),
+                (asin, limit) if limit else (asin,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in reversed(rows)]
+
+    def summary(self, now: Optional[float] = None) -> Dict:
+        """
+        件数・取得待ちの集計（UI表示用）
+
+        Returns:
+            Dict: asins, keywords, due（取得時刻を過ぎた件数）, next_due（次の取得時刻）
+        """
+        now = now or time.time()
+        conn = self._connect()
+        try:
+            asins, due, next_due = conn.execute("""
+                SELECT COUNT(*), SUM(next_due <= ?), MIN(next_due) FROM watch_asins
+            """, (now,)).fetchone()
+            keywords = conn.execute("SELECT COUNT(*) FROM watch_keywords").fetchone()[0]
+        finally:
+            conn.close()
+        return {'asins': asins, 'keywords': keywords, 'due': due or 0, 'next_due': next_due}
+
+
+class WatchlistPoller:
+    """ウォッチリストの取得時刻を過ぎた商品を差分取得・再スコアリングするクラス"""
+
+    def __init__(self, keepa_key: str, rainforest_key: Optional[str] = None, watchlist: Optional[Watchlist] = None,
+                 refresh_reviews: bool = False, max_token_wait: float = 120, alerts: Optional[AlertEngine] = None):
+        """
+        初期化
+
+        Args:
+            keepa_key (str): Keepa APIキー
+            rainforest_key (str): RainforestAPI キー（キーワード検索・レビュー再収集用）
+            watchlist (Watchlist): 追跡対象（省略時はキャッシュと同じDB）
+            refresh_reviews (bool): レビュー数が増えた商品のレビューを再収集するか
+            max_token_wait (float): 1回のKeepa問い合わせでトークン回復を待つ最大秒数
+            alerts (AlertEngine): 再スコアリング結果を評価するアラート（省略時はキャッシュと同じDB）
+        """
+        self.watchlist = watchlist or Watchlist()
+        self.analyzer = KeepaAnalyzerSimple(keepa_key, rainforest_api_key=rainforest_key, priority=PRIORITY_BATCH,
+                                            max_token_wait=max_token_wait)
+        self.review_collector = ReviewCollector(rainforest_key) if rainforest_key and refresh_reviews else None
+        self.timeseries = get_timeseries_store()
+        self.max_token_wait = max_token_wait
+        self.alerts = alerts or get_alert_engine()
+
+    def _affordable_asins(self, cost_per_asin: int) -> Optional[int]:
+        """現在の残高と待ち時間内の回復量で取得できるASIN数（残高が未取得の場合はNone）"""
+        snapshot = self.analyzer.token_scheduler.snapshot()
+        if snapshot['refill_rate'] is None:
+            return None
+        budget = max(snapshot['tokens_left'], 0) + snapshot['refill_rate'] * self.max_token_wait / 60
+        return int(budget // cost_per_asin)
+
+    def _poll_keywords(self, now: float, deadline) -> int:
+        """検索時刻を過ぎたキーワードを検索し、上位のASINをウォッチリストに追加"""
+        added = 0
+        for watch in self.watchlist.claim_due_keywords(now):
+            try:
+                asins = self.analyzer._search_asins_with_rainforest(watch['keyword'], deadline=deadline)
+            except Exception as e:
+                logger.warning("ウォッチリストのキーワード検索に失敗 %s: %s", watch['keyword'], e)
+                continue
+            if asins:
+                added += self.watchlist.add_asins(asins[:watch['top_k']], source=watch['keyword'])
+            self.watchlist.record_keyword(watch['keyword'])
+        return added
+
+    def _fetch(self, watches: List[Dict], now: float, deadline) -> List[Dict]:
+        """
+        前回取得からの日数だけKeepaから取得し、保存済みの履歴と合わせた商品データを返す
+        （履歴の保存が無効な場合は全履歴を取得）
+        """
+        groups: Dict[Optional[int], List[str]] = {}
+        for watch in watches:
+            days = None
+            if watch['last_polled'] is not None and self.timeseries.enabled:
+                days = math.ceil((now - watch['last_polled']) / 86400) + 1
+            groups.setdefault(days, []).append(watch['asin'])
+
+        products = []
+        for days, asins in groups.items():
+            params = dict(KEEPA_QUERY_PARAMS)
+            if days is not None:
+                params['days'] = days
+            # 取得した履歴は _query_keepa 内で時系列ストアに追記される
+            products.extend(self.analyzer._query_keepa(asins, deadline=deadline, **params))
+
+        if self.timeseries.enabled:
+            for product in products:
+                self.timeseries.restore_history(product)
+                product['data'] = keepa.parse_csv(product['csv'])
+        return products
+
+    def _refresh_reviews(self, asin: str, deadline) -> Optional[int]:
+        """レビューを再収集し、新しいレビューの件数を返す"""
+        before = {r['review_id'] for r in self.review_collector.get_cached_reviews(asin) or []}
+        try:
+            reviews = self.review_collector.collect_reviews(asin, use_cache=False, deadline=deadline)
+        except Exception as e:
+            logger.warning("ウォッチリストのレビュー再収集に失敗 %s: %s", asin, e)
+            return None
+        return sum(1 for r in reviews if r['review_id'] not in before)
+
+    def poll_once(self, max_asins: int = DEFAULT_MAX_ASINS_PER_POLL, deadline=None) -> Dict:
+        """
+        取得時刻を過ぎたキーワード・ASINを1回分処理
+
+        Args:
+            max_asins (int): 取得する最大ASIN数
+            deadline (Deadline): 持ち時間（Noneは無制限）
+
+        Returns:
+            Dict: keywords_added, polled, failed, released, new_reviews, alerts, tokens_estimated
+        """
+        deadline = ensure_deadline(deadline)
+        now = time.time()
+        self.analyzer._begin_request('watchlist')
+        tokens_before = self.analyzer.usage['keepa_tokens_estimated']
+        summary = {'keywords_added': 0, 'polled': 0, 'failed': 0, 'released': 0, 'new_reviews': 0, 'alerts': 0}
+
+        if self.analyzer.rainforest_api_key:
+            summary['keywords_added'] = self._poll_keywords(now, deadline)
+
+        # トークン残高で賄える件数までに抑える（残りは次回の巡回へ）
+        cost_per_asin = estimate_query_cost(1, rating=KEEPA_QUERY_PARAMS['rating'])
+        affordable = self._affordable_asins(cost_per_asin)
+        limit = max_asins if affordable is None else min(max_asins, affordable)
+        if limit <= 0:
+            logger.info("Keepaトークン不足のため、ウォッチリストの取得を見送ります")
+            return dict(summary, tokens_estimated=0)
+
+        # キーワード検索で追加したASINも今回の対象に含める
+        now = time.time()
+        watches = self.watchlist.claim_due_asins(limit, now)
+        if not watches:
+            return dict(summary, tokens_estimated=0)
+
+        try:
+            products = self._fetch(watches, now, deadline)
+        except (KeepaTokenBudgetError, DeadlineExceeded) as e:
+            logger.info("ウォッチリストの取得を中断しました: %s", e)
+            products = []
+        except Exception:
+            # 取得できたかどうか不明なため、失敗として間隔を空けて再試行
+            self.watchlist.record_failures([watch['asin'] for watch in watches])
+            raise
+
+        rows = {row['asin']: row for row in self.analyzer._build_rows(products)}
+        fetched = {product.get('asin') for product in products}
+        results = []
+        failed = []
+        for watch in watches:
+            row = rows.get(watch['asin'])
+            if row is None:
+                if watch['asin'] in fetched:
+                    failed.append(watch['asin'])  # Keepaにデータが無い商品
+                continue
+            result = {'watch': watch, 'row': row, 'new_reviews': None}
+            grew = watch['last_review_count'] is not None and row['review_count'] > watch['last_review_count']
+            if self.review_collector is not None and grew and not deadline.expired():
+                result['new_reviews'] = self._refresh_reviews(watch['asin'], deadline)
+                summary['new_reviews'] += result['new_reviews'] or 0
+            results.append(result)
+
+        self.watchlist.record_polls(results)
+        self.watchlist.record_failures(failed)
+        # オファーは取得しないため出品者数は仮の値（リーダーボードに最近の実際の値があればそちらを使う）
+        self.analyzer.record_leaderboard([result['row'] for result in results])
+        try:
+            summary['alerts'] = len(self.alerts.evaluate([result['row'] for result in results]))
+        except Exception as e:
+            logger.warning("アラートの評価に失敗: %s", e)
+        # トークン不足・持ち時間切れで取得できなかった分はすぐに次回の対象へ
+        unpolled = [watch['asin'] for watch in watches if watch['asin'] not in fetched]
+        self.watchlist.release(unpolled)
+
+        summary.update(polled=len(results), failed=len(failed), released=len(unpolled),
+                       tokens_estimated=self.analyzer.usage['keepa_tokens_estimated'] - tokens_before)
+        logger.info("ウォッチリスト巡回: %s", summary)
+        return summary
+
+    def run(self, interval_sec: float = 60, max_asins: int = DEFAULT_MAX_ASINS_PER_POLL,
+            stop_event: Optional[threading.Event] = None):
+        """
+        停止されるまで一定間隔で巡回
+
+        Args:
+            interval_sec (float): 巡回の間隔（取得待ちが残っている場合はすぐ次の巡回へ）
+            max_asins (int): 1回の巡回で取得する最大ASIN数
+            stop_event (threading.Event): セットされたら終了
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                summary = self.poll_once(max_asins)
+            except Exception as e:
+                logger.exception("ウォッチリスト巡回エラー: %s", e)
+                summary = {'polled': 0}
+            backlog = self.watchlist.summary()['due']
+            if summary['polled'] == 0 or backlog == 0:
+                stop_event.wait(interval_sec)
+
+
+# グローバルウォッチリスト(シングルトン)
+_watchlist_instance = None
+_watchlist_lock = threading.Lock()
+
+def get_watchlist():
+    """
+    ウォッチリストのシングルトンインスタンス取得
+
+    Returns:
+        Watchlist インスタンス
+    """
+    global _watchlist_instance
+    with _watchlist_lock:
+        if _watchlist_instance is None:
+            _watchlist_instance = Watchlist()
+    return _watchlist_instance
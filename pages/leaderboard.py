@@ -0,0 +1,79 @@
+"""
+リーダーボード表示ページ
+キーワード・セッション・バッチ実行をまたいでスコアリングした全商品から、条件で絞り込んだ上位商品を表示
+"""
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from modules.leaderboard import get_leaderboard
+
+st.set_page_config(
+    page_title="リーダーボード - Amazon競合分析ツール",
+    page_icon="🏆",
+    layout="wide"
+)
+
+st.title("🏆 リーダーボード")
+leaderboard = get_leaderboard()
+summary = leaderboard.summary()
+if not summary['products']:
+    st.info("スコアリング済みの商品はありません。メイン画面・batch_search.py で検索すると、結果がここに集計されます。")
+    st.stop()
+
+updated = datetime.fromtimestamp(summary['updated_at']).strftime('%Y-%m-%d %H:%M')
+st.caption(f"{summary['products']:,}商品 / {summary['keywords']:,}キーワード（最終更新 {updated}、商品ごとに最新のスコア）")
+
+# 絞り込み条件
+col1, col2, col3 = st.columns(3)
+with col1:
+    price_range = st.slider("価格帯(円)", 0, 50000, (0, 50000), step=500)
+    top_k = st.slider("表示件数", 10, 200, 50, step=10)
+with col2:
+    category = st.selectbox("カテゴリ", ['すべて'] + leaderboard.categories())
+    keyword = st.selectbox("キーワード", ['すべて'] + leaderboard.keywords())
+with col3:
+    min_monthly_sold = st.number_input("最低月間販売数", min_value=0, value=0, step=50)
+    max_seller_count = st.number_input("最大セラー数（0は指定なし）", min_value=0, value=0, step=1)
+
+started = time.perf_counter()
+df = leaderboard.top(
+    top_k,
+    min_price=price_range[0] or None,
+    max_price=price_range[1] if price_range[1] < 50000 else None,
+    category=None if category == 'すべて' else category,
+    keyword=None if keyword == 'すべて' else keyword,
+    min_monthly_sold=min_monthly_sold or None,
+    max_seller_count=max_seller_count or None,
+)
+elapsed_ms = (time.perf_counter() - started) * 1000
+st.caption(f"{len(df)}件（{elapsed_ms:.1f}ms）")
+
+if len(df) == 0:
+    st.info("条件に合う商品はありません")
+    st.stop()
+
+df['updated_at'] = df['updated_at'].map(lambda t: datetime.fromtimestamp(t).strftime('%m/%d %H:%M'))
+df['url'] = 'https://www.amazon.co.jp/dp/' + df['asin']
+st.dataframe(
+    df[['rank', 'product_score', 'title', 'category', 'price', 'monthly_sold_current', 'sales_growth_rate',
+        'seller_count', 'review_count', 'rating', 'keyword', 'updated_at', 'url']],
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        'rank': st.column_config.NumberColumn("順位"),
+        'product_score': st.column_config.ProgressColumn("スコア", min_value=0, max_value=100, format="%.0f"),
+        'title': "商品名",
+        'category': "カテゴリ",
+        'price': st.column_config.NumberColumn("価格(円)", format="%d"),
+        'monthly_sold_current': st.column_config.NumberColumn("月間販売数", format="%d"),
+        'sales_growth_rate': st.column_config.NumberColumn("成長率(%)", format="%.1f"),
+        'seller_count': st.column_config.NumberColumn("セラー数", format="%d"),
+        'review_count': st.column_config.NumberColumn("レビュー数", format="%d"),
+        'rating': st.column_config.NumberColumn("評価", format="%.1f"),
+        'keyword': "キーワード",
+        'updated_at': "更新",
+        'url': st.column_config.LinkColumn("Amazon", display_text="開く"),
+    }
+)
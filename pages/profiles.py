@@ -0,0 +1,123 @@
+"""
+プロファイル表示ページ
+サイドバーの「プロファイルを記録」または RESEARCH_PROFILE=1 で保存したリクエスト単位のプロファイルを表示
+"""
+from datetime import datetime
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from modules.profiling import get_profiler, stats_rows
+
+# フレームグラフに表示する最大スタック数（サンプル数の多い順）
+MAX_FLAME_STACKS = 300
+
+st.set_page_config(
+    page_title="プロファイル - Amazon競合分析ツール",
+    page_icon="🔬",
+    layout="wide"
+)
+
+
+def folded_to_icicle(stacks, max_stacks=MAX_FLAME_STACKS):
+    """
+    折りたたみスタックをアイシクル図（上から下へのフレームグラフ）用の表に変換
+
+    Args:
+        stacks (Counter): 折りたたみスタック → サンプル数
+        max_stacks (int): 表示するスタック数の上限
+
+    Returns:
+        pd.DataFrame: id, parent, name, samples
+    """
+    nodes = {}
+    for stack, count in stacks.most_common(max_stacks):
+        path = ''
+        for frame in stack.split(';'):
+            parent, path = path, f"{path};{frame}" if path else frame
+            node = nodes.setdefault(path, {'id': path, 'parent': parent, 'name': frame, 'samples': 0})
+            node['samples'] += count
+    return pd.DataFrame(list(nodes.values()))
+
+
+st.title("🔬 プロファイル")
+profiler = get_profiler()
+st.caption(f"保存先: {profiler.directory}（合計{profiler.max_bytes // (1024 * 1024)}MBを超えると古いものから削除）")
+
+requests = profiler.list_requests()
+if not requests:
+    st.info("保存されたプロファイルはありません。メイン画面のサイドバーで「🔬 プロファイルを記録」を有効にするか、"
+            "環境変数 RESEARCH_PROFILE=1 を設定して検索・レビュー収集・AI分析を実行してください。")
+    st.stop()
+
+kind_labels = {'search': '検索', 'reviews': 'レビュー収集', 'analysis': 'AI分析'}
+
+
+def request_label(meta):
+    created = datetime.fromtimestamp(meta['created_at']).strftime('%m/%d %H:%M:%S')
+    total_ms = sum(record['wall_ms'] for record in meta['stages'])
+    return f"{created} {kind_labels.get(meta['kind'], meta['kind'])}: {meta['label'] or '-'}（{total_ms / 1000:.1f}秒）"
+
+
+meta = st.selectbox("リクエスト", requests, format_func=request_label)
+request_id = meta['request_id']
+
+# ステージごとの所要時間
+st.subheader("ステージ")
+stage_rows = [
+    {
+        'ステージ': record['stage'],
+        '開始': datetime.fromtimestamp(record['started_at']).strftime('%H:%M:%S.%f')[:-3],
+        '所要時間(ms)': record['wall_ms'],
+        'スレッド': record['thread'],
+        'サンプル数': record.get('samples', 0),
+        '属性': ', '.join(f"{k}={v}" for k, v in record['attrs'].items()),
+    }
+    for record in sorted(meta['stages'], key=lambda r: r['started_at'])
+]
+st.dataframe(pd.DataFrame(stage_rows), hide_index=True, use_container_width=True)
+
+stage_names = sorted({record['stage'] for record in meta['stages']})
+stage = st.radio("表示するステージ", ['すべて'] + stage_names, horizontal=True)
+stage = None if stage == 'すべて' else stage
+
+col1, col2 = st.columns(2)
+
+# cProfile（関数ごとの累計）
+with col1:
+    st.subheader("関数ごとの時間（cProfile）")
+    stats = profiler.load_stats(request_id, stage)
+    if stats is None:
+        st.info("cProfileの結果はありません（RESEARCH_PROFILE_MODE=sample で記録したか、別のプロファイラが動作中でした）")
+    else:
+        sort = st.radio("並び順", ['cumulative', 'tottime'], horizontal=True,
+                        format_func=lambda s: '累計（呼び出し先を含む）' if s == 'cumulative' else '関数自身')
+        st.dataframe(pd.DataFrame(stats_rows(stats, limit=50, sort=sort)), hide_index=True, use_container_width=True)
+
+# サンプリング（フレームグラフ）
+with col2:
+    st.subheader("フレームグラフ（サンプリング）")
+    stacks = profiler.load_folded(request_id, stage)
+    if not stacks:
+        st.info("サンプルはありません（ステージが短すぎるか、RESEARCH_PROFILE_MODE=cprofile で記録しました）")
+    else:
+        fig = px.icicle(folded_to_icicle(stacks), ids='id', parents='parent', names='name', values='samples',
+                        branchvalues='total')
+        fig.update_traces(root_color='lightgrey', tiling_orientation='v')
+        fig.update_layout(margin=dict(t=10, l=0, r=0, b=0), height=600)
+        st.plotly_chart(fig, use_container_width=True)
+
+# ダウンロード（pstats / snakeviz、flamegraph.pl / speedscope 用）
+st.subheader("ダウンロード")
+for record in sorted(meta['stages'], key=lambda r: r['started_at']):
+    if stage is not None and record['stage'] != stage:
+        continue
+    cols = st.columns([2, 1, 1])
+    cols[0].write(f"{record['stage']}（{record['wall_ms']}ms）")
+    for col, key, mime in ((cols[1], 'prof', 'application/octet-stream'), (cols[2], 'folded', 'text/plain')):
+        if key in record:
+            path = profiler.directory / request_id / record[key]
+            if path.exists():
+                col.download_button(f".{key}", path.read_bytes(), file_name=f"{request_id}_{record[key]}",
+                                    mime=mime, key=f"{record['name']}_{key}")
@@ -0,0 +1,149 @@
+"""
+ウォッチリスト CLI
+競合商品（ASIN）・キーワードを登録し、変化の大きい商品ほど短い間隔で再取得・再スコアリングする（常駐・cron向け）
+
+使い方:
+    python watchlist.py add B0XXXXXXXX B0YYYYYYYY          # ASINを追加
+    python watchlist.py add-keyword "ヨガマット" --top 20     # 週次で検索し、上位20件を追加
+    python watchlist.py list
+    python watchlist.py history B0XXXXXXXX
+    python watchlist.py run --once                          # 取得時刻を過ぎた分を1回処理（cron向け）
+    python watchlist.py run --interval 60 --reviews         # 常駐して巡回（レビュー数が増えた商品はレビューも再収集）
+    python watchlist.py rule-add product_score ">=" 80      # スコアが80点以上になったら通知
+    python watchlist.py rule-add price change_pct 10 --asin B0XXXXXXXX   # 価格が10%以上動いたら通知
+    python watchlist.py alerts --ack                        # 未確認の通知を表示して確認済みにする
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from modules.alerts import CHANGE_PCT, DEFAULT_COOLDOWN_SEC, OPERATORS, describe_rule, get_alert_engine
+from modules.logging_config import setup_logging
+from modules.watchlist import DEFAULT_KEYWORD_TOP_K, DEFAULT_MAX_ASINS_PER_POLL, WatchlistPoller, get_watchlist
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') if timestamp else '-'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="競合商品のウォッチリスト")
+    parser.add_argument('--log-level', help="ログレベル（DEBUG/INFO/WARNING/ERROR、省略時は LOG_LEVEL 環境変数）")
+    parser.add_argument('--log-json', action='store_true', help="ログをJSON Lines形式で出力")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="ASINを追加")
+    add.add_argument('asins', nargs='+', help="ASIN")
+    add.add_argument('--label', default='', help="表示名")
+
+    remove = commands.add_parser('remove', help="ASINを削除")
+    remove.add_argument('asins', nargs='+', help="ASIN")
+
+    add_keyword = commands.add_parser('add-keyword', help="キーワードを追加（定期的に検索して上位を追加）")
+    add_keyword.add_argument('keyword', help="検索キーワード")
+    add_keyword.add_argument('--top', type=int, default=DEFAULT_KEYWORD_TOP_K, help="追加する上位件数")
+
+    remove_keyword = commands.add_parser('remove-keyword', help="キーワードを削除")
+    remove_keyword.add_argument('keyword', help="検索キーワード")
+
+    commands.add_parser('list', help="追跡中のASIN・キーワードを表示")
+
+    history = commands.add_parser('history', help="スコア履歴を表示")
+    history.add_argument('asin', help="ASIN")
+    history.add_argument('--limit', type=int, default=20, help="直近の件数")
+
+    run = commands.add_parser('run', help="巡回を実行")
+    run.add_argument('--once', action='store_true', help="1回だけ処理して終了")
+    run.add_argument('--interval', type=float, default=60, help="巡回の間隔(秒)")
+    run.add_argument('--max-asins', type=int, default=DEFAULT_MAX_ASINS_PER_POLL, help="1回の巡回で取得する最大ASIN数")
+    run.add_argument('--reviews', action='store_true', help="レビュー数が増えた商品のレビューを再収集")
+
+    rule_add = commands.add_parser('rule-add', help="アラートのルールを追加")
+    rule_add.add_argument('metric', help="指標（product_score, price, seller_count, sales_growth_rate など）")
+    rule_add.add_argument('op', choices=list(OPERATORS) + [CHANGE_PCT], help="演算子（change_pct は変化率%%）")
+    rule_add.add_argument('threshold', type=float, help="しきい値")
+    rule_add.add_argument('--asin', help="対象ASIN（省略時は全商品）")
+    rule_add.add_argument('--name', default='', help="表示名")
+    rule_add.add_argument('--cooldown', type=float, default=DEFAULT_COOLDOWN_SEC / 3600,
+                          help="同じ商品を再通知しない時間(時間)")
+
+    rule_remove = commands.add_parser('rule-remove', help="アラートのルールを削除")
+    rule_remove.add_argument('rule_id', type=int, help="ルールID")
+
+    commands.add_parser('rules', help="アラートのルールを表示")
+
+    alerts = commands.add_parser('alerts', help="アラートの通知を表示")
+    alerts.add_argument('--all', action='store_true', help="確認済みも表示")
+    alerts.add_argument('--limit', type=int, default=50, help="最大件数")
+    alerts.add_argument('--ack', action='store_true', help="表示した通知を確認済みにする")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    setup_logging(level=args.log_level, json_format=args.log_json or None, stream=sys.stderr)
+    watchlist = get_watchlist()
+
+    if args.command == 'add':
+        added = watchlist.add_asins(args.asins, label=args.label)
+        print(f"{added}件追加しました（追跡中 {watchlist.summary()['asins']}件）")
+    elif args.command == 'remove':
+        watchlist.remove_asins(args.asins)
+    elif args.command == 'add-keyword':
+        watchlist.add_keyword(args.keyword, top_k=args.top)
+    elif args.command == 'remove-keyword':
+        watchlist.remove_keyword(args.keyword)
+    elif args.command == 'list':
+        summary = watchlist.summary()
+        print(f"ASIN {summary['asins']}件（取得待ち {summary['due']}件）, キーワード {summary['keywords']}件")
+        for watch in watchlist.list_keywords():
+            print(f"  [KW] {watch['keyword']}  上位{watch['top_k']}件  次回 {_format_time(watch['next_due'])}")
+        for watch in watchlist.list_asins():
+            score = f"{watch['last_score']:.0f}点" if watch['last_score'] is not None else '-'
+            print(f"  {watch['asin']}  {score:>5}  間隔 {watch['interval_sec'] / 3600:.0f}h  "
+                  f"次回 {_format_time(watch['next_due'])}  {(watch['label'] or '')[:30]}")
+    elif args.command == 'history':
+        for row in watchlist.score_history(args.asin, limit=args.limit):
+            print(f"  {_format_time(row['polled_at'])}  スコア {row['product_score']}  価格 {row['price']}  "
+                  f"BSR {row['current_rank']}  月販 {row['monthly_sold']}  レビュー {row['review_count']}")
+    elif args.command == 'rule-add':
+        rule_id = get_alert_engine().add_rule(args.metric, args.op, args.threshold, asin=args.asin, name=args.name,
+                                              cooldown_sec=args.cooldown * 3600)
+        print(f"ルール {rule_id} を追加しました")
+    elif args.command == 'rule-remove':
+        get_alert_engine().remove_rule(args.rule_id)
+    elif args.command == 'rules':
+        for rule in get_alert_engine().list_rules():
+            print(f"  {rule['id']:>3}  {describe_rule(rule)}  cool-down {rule['cooldown_sec'] / 3600:g}h  {rule['name']}")
+    elif args.command == 'alerts':
+        engine = get_alert_engine()
+        alerts = engine.outbox(unread_only=not args.all, limit=args.limit)
+        for alert in alerts:
+            mark = ' ' if alert['acknowledged'] else '*'
+            print(f" {mark}{_format_time(alert['created_at'])}  {alert['message']}")
+        if args.ack and alerts:
+            engine.acknowledge([alert['id'] for alert in alerts])
+    elif args.command == 'run':
+        keepa_key = os.getenv('KEEPA_API_KEY', '')
+        if not keepa_key:
+            print("[ERROR] KEEPA_API_KEY が設定されていません", file=sys.stderr)
+            return 1
+        poller = WatchlistPoller(keepa_key, rainforest_key=os.getenv('RAINFOREST_API_KEY') or None,
+                                 watchlist=watchlist, refresh_reviews=args.reviews)
+        if args.once:
+            print(json.dumps(poller.poll_once(args.max_asins), ensure_ascii=False, indent=2))
+        else:
+            try:
+                poller.run(interval_sec=args.interval, max_asins=args.max_asins)
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())